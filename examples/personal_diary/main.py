@@ -8,16 +8,66 @@
 
 import hivedb
 import getpass
+import hashlib
+import hmac
 import json
 import os
+import re
 import sys
 import datetime
 import uuid
+from collections import Counter
+from operator import itemgetter
 from tabulate import tabulate
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 # تكوين المسارات
 CONFIG_DIR = os.path.expanduser("~/.hivedb_diary")
 CONFIG_FILE = os.path.join(CONFIG_DIR, "config.json")
+INDEX_FILE = os.path.join(CONFIG_DIR, "index.json")
+
+# حجم المخزن المؤقت لقراءة ملفات الاستيراد الكبيرة
+IMPORT_BUFFER_SIZE = 1 << 20
+
+def json_loads(data):
+    """تحليل JSON من بايتات باستخدام orjson إن كان متاحًا"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode('utf-8'))
+
+def json_dumps_pretty(obj):
+    """ترميز JSON منسق إلى بايتات باستخدام orjson إن كان متاحًا"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+
+def json_dumps(obj):
+    """ترميز JSON مضغوط إلى بايتات باستخدام orjson إن كان متاحًا"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+def write_file_atomic(path, data):
+    """
+    كتابة ملف بشكل ذري: الكتابة إلى ملف مؤقت ثم استبداله بالأصلي
+    
+    يمنع ذلك ترك ملف مبتور إذا توقف التطبيق أثناء الكتابة.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
 
 def setup_config_dir():
     """إنشاء مجلد التكوين إذا لم يكن موجودًا"""
@@ -27,16 +77,145 @@ def setup_config_dir():
 def save_config(cell_key):
     """حفظ مفتاح الخلية في ملف التكوين"""
     setup_config_dir()
-    with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-        json.dump({"cell_key": cell_key}, f)
+    write_file_atomic(CONFIG_FILE, json_dumps({"cell_key": cell_key}))
 
 def load_config():
     """تحميل مفتاح الخلية من ملف التكوين"""
     if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f).get("cell_key")
+        try:
+            with open(CONFIG_FILE, 'rb') as f:
+                return json_loads(f.read()).get("cell_key")
+        except ValueError:
+            return None
     return None
 
+# أقل طول لجزء الكلمة في فهرس البحث
+MIN_TOKEN_LENGTH = 2
+
+# إصدار تنسيق الفهرس، ويُعاد بناء الفهرس المحفوظ بإصدار مختلف
+INDEX_VERSION = 2
+
+WORD_RE = re.compile(r"\w+")
+
+class SearchIndex:
+    """
+    فهرس بحث محلي للمذكرات المشفرة من طرف إلى طرف
+    
+    يربط كل كلمة (وكل أجزائها المتصلة) من العنوان والمحتوى بمفاتيح المذكرات التي تحتويها،
+    حتى يجد البحث المصطلحات التي تقع في وسط الكلمة أو نهايتها وليس بداياتها فقط،
+    مع تخزين الكلمات كبصمات HMAC مشتقة من كلمة المرور حتى لا يكشف الملف نص المذكرات.
+    """
+    
+    def __init__(self, cell_key, password):
+        self.path = INDEX_FILE
+        self._secret = hashlib.pbkdf2_hmac(
+            'sha256', password.encode('utf-8'), f"diary-index:{cell_key}".encode('utf-8'), 100000
+        )
+        self.cell_key = cell_key
+        self.tokens = {}
+        self.entries = {}
+        self._load()
+    
+    def _load(self):
+        """تحميل الفهرس من القرص إذا كان يخص نفس الخلية وكلمة المرور"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                data = json_loads(f.read())
+        except (OSError, ValueError):
+            return
+        if (data.get("version") != INDEX_VERSION or data.get("cell_key") != self.cell_key
+                or data.get("check") != self._token("\0")):
+            return
+        self.entries = {key: set(tokens) for key, tokens in data.get("entries", {}).items()}
+        for key, tokens in self.entries.items():
+            for token in tokens:
+                self.tokens.setdefault(token, set()).add(key)
+    
+    def save(self):
+        """حفظ الفهرس في ملف التكوين"""
+        setup_config_dir()
+        data = {
+            "version": INDEX_VERSION,
+            "cell_key": self.cell_key,
+            "check": self._token("\0"),
+            "entries": {key: sorted(tokens) for key, tokens in self.entries.items()}
+        }
+        write_file_atomic(self.path, json_dumps(data))
+    
+    def _token(self, word):
+        """بصمة HMAC لكلمة واحدة"""
+        return hmac.new(self._secret, word.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+    
+    def _entry_tokens(self, entry):
+        """استخراج بصمات الكلمات وأجزائها المتصلة من عنوان المذكرة ومحتواها"""
+        text = f"{entry.get('title', '')} {entry.get('content', '')}".lower()
+        words = set()
+        for word in set(WORD_RE.findall(text)):
+            if len(word) < MIN_TOKEN_LENGTH:
+                words.add(word)
+                continue
+            for start in range(len(word) - MIN_TOKEN_LENGTH + 1):
+                for end in range(start + MIN_TOKEN_LENGTH, len(word) + 1):
+                    words.add(word[start:end])
+        return {self._token(word) for word in words}
+    
+    def add(self, entry_id, entry):
+        """إضافة مذكرة إلى الفهرس أو تحديثها"""
+        self.remove(entry_id)
+        tokens = self._entry_tokens(entry)
+        self.entries[entry_id] = tokens
+        for token in tokens:
+            self.tokens.setdefault(token, set()).add(entry_id)
+    
+    def remove(self, entry_id):
+        """حذف مذكرة من الفهرس"""
+        for token in self.entries.pop(entry_id, ()):
+            keys = self.tokens.get(token)
+            if keys is not None:
+                keys.discard(entry_id)
+                if not keys:
+                    del self.tokens[token]
+    
+    def candidates(self, search_terms, entry_keys):
+        """
+        تحديد المذكرات التي قد تطابق أيًا من مصطلحات البحث
+        
+        المذكرات غير المفهرسة تُعاد دائمًا حتى يتم فحصها بعد فك التشفير.
+        """
+        matches = set()
+        for term in search_terms:
+            words = WORD_RE.findall(term.lower())
+            if not words or any(len(word) < MIN_TOKEN_LENGTH for word in words):
+                return list(entry_keys)
+            
+            term_matches = None
+            for word in words:
+                keys = self.tokens.get(self._token(word), set())
+                term_matches = keys if term_matches is None else term_matches & keys
+            matches |= term_matches
+        
+        return [key for key in entry_keys if key in matches or key not in self.entries]
+
+def build_matcher(search_terms):
+    """
+    إنشاء دالة تتحقق مما إذا كان نص (بأحرف صغيرة) يحتوي على أي من المصطلحات
+    
+    تُستخدم آلة Aho-Corasick من pyahocorasick إن كانت متاحة للبحث عن جميع
+    المصطلحات في مرور واحد على النص.
+    """
+    needles = [term.lower() for term in search_terms]
+    
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for needle in needles:
+            automaton.add_word(needle, needle)
+        automaton.make_automaton()
+        return lambda text: next(automaton.iter(text), None) is not None
+    
+    return lambda text: any(needle in text for needle in needles)
+
 def clear_screen():
     """مسح الشاشة لتحسين واجهة المستخدم"""
     os.system('cls' if os.name == 'nt' else 'clear')
@@ -102,7 +281,48 @@ def format_diary_entry(entry):
 {content}
 """
 
-def add_diary_entry(cell):
+def header_key(entry_id):
+    """مفتاح ملخص المذكرة المقابل لمفتاح المذكرة"""
+    return "hdr_" + entry_id[len("entry_"):]
+
+def make_entry_header(entry_id, entry):
+    """إنشاء ملخص صغير للمذكرة يكفي لشاشات العرض والإحصائيات"""
+    return {
+        "date": entry.get("date", ""),
+        "title": entry.get("title", ""),
+        "mood": entry.get("mood", ""),
+        "words": len(entry.get("content", "").split()),
+        "ref": entry_id
+    }
+
+def load_entry_headers(cell, entry_keys):
+    """
+    تحميل ملخصات المذكرات بدلًا من المذكرات الكاملة
+    
+    المذكرات القديمة التي لا تملك ملخصًا تُقرأ كاملة مرة واحدة ويُنشأ ملخصها.
+    """
+    headers = cell.get_json_many([header_key(key) for key in entry_keys])
+    
+    result = {}
+    missing = []
+    for key in entry_keys:
+        header = headers.get(header_key(key))
+        if header:
+            result[key] = header
+        else:
+            missing.append(key)
+    
+    if missing:
+        new_headers = {
+            key: make_entry_header(key, entry)
+            for key, entry in cell.get_json_many(missing).items() if entry
+        }
+        cell.store_json_many({header_key(key): header for key, header in new_headers.items()})
+        result.update(new_headers)
+    
+    return result
+
+def add_diary_entry(cell, index):
     """إضافة مدخل جديد للمذكرات"""
     clear_screen()
     print("=== إضافة مذكرة جديدة ===")
@@ -136,40 +356,38 @@ def add_diary_entry(cell):
     # تخزين المدخل في الخلية
     entry_id = f"entry_{date}_{uuid.uuid4().hex[:8]}"
     cell.store_json(entry_id, entry)
+    cell.store_json(header_key(entry_id), make_entry_header(entry_id, entry))
+    index.add(entry_id, entry)
+    index.save()
     
     print("\nتم حفظ المذكرة بنجاح!")
     input("اضغط Enter للمتابعة...")
 
-def view_diary_entries(cell):
+def view_diary_entries(cell, index):
     """عرض جميع مدخلات المذكرات"""
     clear_screen()
     print("=== جميع المذكرات ===")
     
-    # الحصول على جميع المفاتيح
-    keys = cell.list_keys()
-    
-    # تصفية مفاتيح المذكرات
-    entry_keys = [key for key in keys if key.startswith("entry_")]
+    # الحصول على مفاتيح المذكرات فقط (التصفية على الخادم)
+    entry_keys = cell.list_keys(prefix="entry_")
     
     if not entry_keys:
         print("لا توجد مذكرات مخزنة بعد.")
         input("اضغط Enter للمتابعة...")
         return
     
-    # جمع معلومات المذكرات
+    # جمع ملخصات المذكرات فقط دون محتواها الكامل
     entries = []
-    for key in entry_keys:
-        entry = cell.get_json(key)
-        if entry:
-            entries.append({
-                "id": key,
-                "date": entry.get("date", ""),
-                "title": entry.get("title", ""),
-                "mood": entry.get("mood", "")
-            })
+    for key, header in load_entry_headers(cell, entry_keys).items():
+        entries.append({
+            "id": key,
+            "date": header.get("date", ""),
+            "title": header.get("title", ""),
+            "mood": header.get("mood", "")
+        })
     
     # ترتيب المذكرات حسب التاريخ (الأحدث أولاً)
-    entries.sort(key=lambda x: x["date"], reverse=True)
+    entries.sort(key=itemgetter("date"), reverse=True)
     
     # عرض المذكرات في جدول
     table_data = [[i+1, e["date"], e["title"], e["mood"]] for i, e in enumerate(entries)]
@@ -182,13 +400,13 @@ def view_diary_entries(cell):
         return
     
     try:
-        index = int(choice) - 1
-        if 0 <= index < len(entries):
-            view_diary_entry(cell, entries[index]["id"])
+        choice_index = int(choice) - 1
+        if 0 <= choice_index < len(entries):
+            view_diary_entry(cell, entries[choice_index]["id"], index)
     except ValueError:
         pass
 
-def view_diary_entry(cell, entry_id):
+def view_diary_entry(cell, entry_id, index):
     """عرض مدخل مذكرة محدد"""
     clear_screen()
     
@@ -208,11 +426,11 @@ def view_diary_entry(cell, entry_id):
     choice = input("> ")
     
     if choice == "1":
-        edit_diary_entry(cell, entry_id, entry)
+        edit_diary_entry(cell, entry_id, entry, index)
     elif choice == "2":
-        delete_diary_entry(cell, entry_id, entry)
+        delete_diary_entry(cell, entry_id, entry, index)
 
-def edit_diary_entry(cell, entry_id, entry):
+def edit_diary_entry(cell, entry_id, entry, index):
     """تعديل مدخل مذكرة"""
     clear_screen()
     print("=== تعديل المذكرة ===")
@@ -249,11 +467,14 @@ def edit_diary_entry(cell, entry_id, entry):
     }
     
     cell.store_json(entry_id, updated_entry)
+    cell.store_json(header_key(entry_id), make_entry_header(entry_id, updated_entry))
+    index.add(entry_id, updated_entry)
+    index.save()
     
     print("\nتم تحديث المذكرة بنجاح!")
     input("اضغط Enter للمتابعة...")
 
-def delete_diary_entry(cell, entry_id, entry):
+def delete_diary_entry(cell, entry_id, entry, index):
     """حذف مدخل مذكرة"""
     clear_screen()
     print("=== حذف المذكرة ===")
@@ -264,37 +485,45 @@ def delete_diary_entry(cell, entry_id, entry):
     
     if confirm == 'ن':
         cell.delete(entry_id)
+        cell.delete(header_key(entry_id))
+        index.remove(entry_id)
+        index.save()
         print("\nتم حذف المذكرة بنجاح!")
     else:
         print("\nتم إلغاء الحذف.")
     
     input("اضغط Enter للمتابعة...")
 
-def search_diary_entries(cell):
+def search_diary_entries(cell, index):
     """البحث في مدخلات المذكرات"""
     clear_screen()
     print("=== البحث في المذكرات ===")
     
-    search_term = input("أدخل مصطلح البحث: ")
-    if not search_term:
+    search_input = input("أدخل مصطلح البحث (افصل بين عدة مصطلحات بفاصلة): ")
+    search_terms = [term.strip() for term in search_input.split(",") if term.strip()]
+    if not search_terms:
         return
     
-    # الحصول على جميع المفاتيح
-    keys = cell.list_keys()
+    # الحصول على مفاتيح المذكرات فقط (التصفية على الخادم)
+    entry_keys = cell.list_keys(prefix="entry_")
+    
+    # الفهرس المحلي يستبعد المذكرات غير المطابقة قبل جلبها وفك تشفيرها
+    candidate_keys = index.candidates(search_terms, entry_keys)
     
-    # تصفية مفاتيح المذكرات
-    entry_keys = [key for key in keys if key.startswith("entry_")]
+    # تجهيز آلة البحث مرة واحدة لجميع المصطلحات
+    matches = build_matcher(search_terms)
     
     # البحث في المذكرات
     results = []
-    for key in entry_keys:
-        entry = cell.get_json(key)
+    indexed = False
+    for key, entry in cell.get_json_many(candidate_keys).items():
         if entry:
-            # البحث في العنوان والمحتوى
-            title = entry.get("title", "").lower()
-            content = entry.get("content", "").lower()
+            if key not in index.entries:
+                index.add(key, entry)
+                indexed = True
             
-            if search_term.lower() in title or search_term.lower() in content:
+            # البحث في العنوان أولًا، ولا يُحوَّل المحتوى إلى أحرف صغيرة إلا عند الحاجة
+            if matches(entry.get("title", "").lower()) or matches(entry.get("content", "").lower()):
                 results.append({
                     "id": key,
                     "date": entry.get("date", ""),
@@ -302,6 +531,9 @@ def search_diary_entries(cell):
                     "mood": entry.get("mood", "")
                 })
     
+    if indexed:
+        index.save()
+    
     if not results:
         print("لم يتم العثور على نتائج.")
         input("اضغط Enter للمتابعة...")
@@ -319,9 +551,9 @@ def search_diary_entries(cell):
         return
     
     try:
-        index = int(choice) - 1
-        if 0 <= index < len(results):
-            view_diary_entry(cell, results[index]["id"])
+        choice_index = int(choice) - 1
+        if 0 <= choice_index < len(results):
+            view_diary_entry(cell, results[choice_index]["id"], index)
     except ValueError:
         pass
 
@@ -330,31 +562,23 @@ def export_diary(cell):
     clear_screen()
     print("=== تصدير المذكرات ===")
     
-    # الحصول على جميع المفاتيح
-    keys = cell.list_keys()
-    
-    # تصفية مفاتيح المذكرات
-    entry_keys = [key for key in keys if key.startswith("entry_")]
+    # جلب جميع المذكرات من نقطة التصدير في طلب واحد
+    entries = {key: entry for key, entry in cell.export_json(prefix="entry_").items() if entry}
     
-    if not entry_keys:
+    if not entries:
         print("لا توجد مذكرات لتصديرها.")
         input("اضغط Enter للمتابعة...")
         return
     
-    # جمع جميع المذكرات
-    entries = {}
-    for key in entry_keys:
-        entry = cell.get_json(key)
-        if entry:
-            entries[key] = entry
-    
     # تحديد مسار الملف للتصدير
     export_path = input("أدخل مسار الملف للتصدير (مثال: ~/diary_export.json): ")
     export_path = os.path.expanduser(export_path)
     
     try:
-        with open(export_path, 'w', encoding='utf-8') as f:
-            json.dump(entries, f, ensure_ascii=False, indent=2)
+        # ترميز الملف بالكامل ثم كتابته دفعة واحدة
+        payload = json_dumps_pretty(entries)
+        with open(export_path, 'wb') as f:
+            f.write(payload)
         
         print(f"\nتم تصدير {len(entries)} مذكرة بنجاح إلى {export_path}")
     except Exception as e:
@@ -362,7 +586,7 @@ def export_diary(cell):
     
     input("اضغط Enter للمتابعة...")
 
-def import_diary(cell):
+def import_diary(cell, index):
     """استيراد المذكرات من ملف JSON"""
     clear_screen()
     print("=== استيراد المذكرات ===")
@@ -377,18 +601,28 @@ def import_diary(cell):
         return
     
     try:
-        with open(import_path, 'r', encoding='utf-8') as f:
-            entries = json.load(f)
+        with open(import_path, 'rb', buffering=IMPORT_BUFFER_SIZE) as f:
+            entries = json_loads(f.read())
         
         if not isinstance(entries, dict):
             print("خطأ: تنسيق الملف غير صالح")
             input("اضغط Enter للمتابعة...")
             return
         
-        # استيراد المذكرات
-        for key, entry in entries.items():
-            if key.startswith("entry_") and isinstance(entry, dict):
-                cell.store_json(key, entry)
+        # استيراد المذكرات في طلب واحد
+        diary_entries = {
+            key: entry for key, entry in entries.items()
+            if key.startswith("entry_") and isinstance(entry, dict)
+        }
+        cell.store_json_many(diary_entries)
+        cell.store_json_many({
+            header_key(key): make_entry_header(key, entry)
+            for key, entry in diary_entries.items()
+        })
+        
+        for key, entry in diary_entries.items():
+            index.add(key, entry)
+        index.save()
         
         print(f"\nتم استيراد {len(entries)} مذكرة بنجاح")
     except Exception as e:
@@ -401,11 +635,8 @@ def show_stats(cell):
     clear_screen()
     print("=== إحصائيات المذكرات ===")
     
-    # الحصول على جميع المفاتيح
-    keys = cell.list_keys()
-    
-    # تصفية مفاتيح المذكرات
-    entry_keys = [key for key in keys if key.startswith("entry_")]
+    # الحصول على مفاتيح المذكرات فقط (التصفية على الخادم)
+    entry_keys = cell.list_keys(prefix="entry_")
     
     if not entry_keys:
         print("لا توجد مذكرات بعد.")
@@ -414,25 +645,22 @@ def show_stats(cell):
     
     # جمع المذكرات
     entries = []
-    moods = {}
-    total_words = 0
+    moods = Counter()
     
-    for key in entry_keys:
-        entry = cell.get_json(key)
-        if entry:
-            entries.append(entry)
-            
-            # حساب المزاج
-            mood = entry.get("mood", "").lower()
-            if mood:
-                moods[mood] = moods.get(mood, 0) + 1
-            
-            # حساب الكلمات
-            content = entry.get("content", "")
-            total_words += len(content.split())
+    # الملخصات مشتركة مع ذاكرة العميل المؤقتة فلا تُعدَّل
+    for header in load_entry_headers(cell, entry_keys).values():
+        entries.append(header)
+        
+        # حساب المزاج
+        mood = header.get("mood", "").lower()
+        if mood:
+            moods[mood] += 1
+    
+    # حساب الكلمات (محسوب مسبقًا في الملخص)
+    total_words = sum(header.get("words", 0) for header in entries)
     
     # ترتيب المذكرات حسب التاريخ
-    entries.sort(key=lambda x: x.get("date", ""))
+    entries.sort(key=lambda header: header.get("date", ""))
     
     # الإحصائيات
     print(f"إجمالي عدد المذكرات: {len(entries)}")
@@ -444,8 +672,7 @@ def show_stats(cell):
     # عرض المزاج الأكثر شيوعًا
     if moods:
         print("\nالمزاج الأكثر شيوعًا:")
-        mood_data = sorted(moods.items(), key=lambda x: x[1], reverse=True)
-        for mood, count in mood_data[:5]:
+        for mood, count in moods.most_common(5):
             print(f"- {mood}: {count} مرة")
     
     input("\nاضغط Enter للمتابعة...")
@@ -479,6 +706,7 @@ def main():
     try:
         cell = hivedb.connect(cell_key, password)
         print(f"تم الاتصال بالخلية {cell_key} بنجاح")
+        index = SearchIndex(cell_key, password)
     except Exception as e:
         print(f"خطأ في الاتصال: {e}")
         return
@@ -498,17 +726,17 @@ def main():
         choice = input("\nاختر رقم العملية: ")
         
         if choice == "1":
-            add_diary_entry(cell)
+            add_diary_entry(cell, index)
         elif choice == "2":
-            view_diary_entries(cell)
+            view_diary_entries(cell, index)
         elif choice == "3":
-            search_diary_entries(cell)
+            search_diary_entries(cell, index)
         elif choice == "4":
             show_stats(cell)
         elif choice == "5":
             export_diary(cell)
         elif choice == "6":
-            import_diary(cell)
+            import_diary(cell, index)
         elif choice == "0":
             print("شكرًا لاستخدام تطبيق المذكرات الشخصية")
             break
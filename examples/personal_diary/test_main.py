@@ -0,0 +1,83 @@
+"""
+اختبارات فهرس البحث المحلي لتطبيق المذكرات
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python_client"))
+
+import main
+from main import SearchIndex, build_matcher
+
+ENTRY_KEYS = ["entry_1", "entry_2", "entry_3"]
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    """فهرس بحث في مجلد مؤقت يحتوي على مذكرتين"""
+    monkeypatch.setattr(main, "CONFIG_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "INDEX_FILE", str(tmp_path / "index.json"))
+    index = SearchIndex("cell1", "password123")
+    index.add("entry_1", {"title": "Happy day", "content": "Went to the beach"})
+    index.add("entry_2", {"title": "Rain", "content": "Stayed home reading"})
+    return index
+
+
+def test_candidates_match_word_prefix(index):
+    """البحث ببادئة كلمة يعيد المذكرة المطابقة والمذكرات غير المفهرسة فقط"""
+    assert index.candidates(["hap"], ENTRY_KEYS) == ["entry_1", "entry_3"]
+
+
+def test_candidates_match_infix_and_suffix(index):
+    """المصطلحات في وسط الكلمة أو نهايتها لا تُسقط المذكرات المطابقة"""
+    assert index.candidates(["ppy"], ENTRY_KEYS) == ["entry_1", "entry_3"]
+    assert index.candidates(["ding"], ENTRY_KEYS) == ["entry_2", "entry_3"]
+
+
+def test_candidates_multiple_terms_and_words(index):
+    """كل مصطلح يضيف مطابقاته، وكلمات المصطلح الواحد يجب أن توجد كلها"""
+    assert index.candidates(["beach", "rain"], ENTRY_KEYS) == ENTRY_KEYS
+    assert index.candidates(["py da"], ENTRY_KEYS) == ["entry_1", "entry_3"]
+    assert index.candidates(["happy home"], ENTRY_KEYS) == ["entry_3"]
+
+
+def test_candidates_short_term_returns_all(index):
+    """المصطلح الأقصر من الحد الأدنى لا يمكن تصفيته بالفهرس"""
+    assert index.candidates(["a"], ENTRY_KEYS) == ENTRY_KEYS
+
+
+def test_remove_entry(index):
+    """حذف مذكرة يزيل كلماتها من الفهرس"""
+    index.remove("entry_1")
+    assert index.candidates(["happy"], ["entry_1", "entry_2"]) == ["entry_1"]
+    assert "entry_1" not in index.entries
+
+
+def test_index_persists_with_same_password(index):
+    """الفهرس المحفوظ يُحمَّل بنفس كلمة المرور ويُتجاهل بكلمة مرور مختلفة"""
+    index.save()
+
+    reloaded = SearchIndex("cell1", "password123")
+    assert reloaded.candidates(["ppy"], ENTRY_KEYS) == ["entry_1", "entry_3"]
+
+    other = SearchIndex("cell1", "other_password")
+    assert other.entries == {}
+
+
+def test_index_file_hides_words(index):
+    """ملف الفهرس لا يحتوي على نص المذكرات"""
+    index.save()
+    with open(index.path, "rb") as f:
+        content = f.read()
+    assert b"happy" not in content.lower()
+
+
+def test_build_matcher():
+    """المطابقة تجد أيًا من المصطلحات داخل النص"""
+    matches = build_matcher(["PPY", "rain"])
+    assert matches("happy day")
+    assert matches("heavy rain")
+    assert not matches("sunny")
@@ -3,16 +3,47 @@
 توفر واجهة برمجية بسيطة للتفاعل مع خلايا HiveDB
 """
 
+import base64
 import json
 import os
 import requests
 import time
-from typing import Any, Dict, List, Optional, Union
-from .utils import encrypt, decrypt, hash_password
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
+from .utils import (
+    encrypt_raw_with_key, decrypt_raw_with_key, derive_key, hash_password,
+    compress_value, decompress_value
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    def _dumps(data: Any) -> str:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    _loads = orjson.loads
+    _JSONDecodeError = orjson.JSONDecodeError
+else:
+    def _dumps(data: Any) -> str:
+        return json.dumps(data, ensure_ascii=False)
+    _loads = json.loads
+    _JSONDecodeError = json.JSONDecodeError
 
 # عنوان الخادم الافتراضي
 DEFAULT_SERVER = "https://api.hivedb.io"
 
+# الحد الأقصى لخيوط التشفير وفك التشفير في العمليات الجماعية
+MAX_CRYPTO_WORKERS = 8
+
+# حجم مجمع اتصالات HTTP المعاد استخدامها لكل خلية
+HTTP_POOL_SIZE = 16
+
+# عدد المفاتيح في كل صفحة عند سرد مفاتيح الخلية
+KEYS_PAGE_SIZE = 5000
+
 class Cell:
     """
     فئة تمثل خلية بيانات في نظام HiveDB
@@ -29,9 +60,24 @@ class Cell:
         """
         self.cell_key = cell_key
         self.password_hash = hash_password(password)
+        # اشتقاق مفتاح التشفير مرة واحدة للجلسة بدلًا من كل عملية
+        self._aes_key = derive_key(self.password_hash)
         self.server_url = server_url
         self.session_token = None
         self.cache = {}
+        # كائنات JSON المحللة مسبقًا لتجنب إعادة التحليل في كل قراءة
+        self._json_cache: Dict[str, Any] = {}
+        
+        # جلسة HTTP واحدة لإعادة استخدام الاتصالات (keep-alive) بين الطلبات
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        # إرسال القيم المشفرة كبايتات خام ما دام الخادم يدعم ذلك
+        self._raw_supported = True
+        
+        # ذاكرة مؤقتة لقوائم المفاتيح حسب البادئة (None = جميع المفاتيح)
+        self._keys_cache: Dict[Optional[str], Set[str]] = {}
         
         # التحقق من الاتصال والمصادقة
         self._authenticate()
@@ -42,7 +88,7 @@ class Cell:
         يرفع استثناء في حالة فشل المصادقة
         """
         try:
-            response = requests.post(
+            response = self._session.post(
                 f"{self.server_url}/auth",
                 json={
                     "cell_key": self.cell_key,
@@ -53,6 +99,7 @@ class Cell:
             if response.status_code == 200:
                 data = response.json()
                 self.session_token = data.get("session_token")
+                self._session.headers.update({"Authorization": f"Bearer {self.session_token}"})
             else:
                 raise ConnectionError(f"فشل المصادقة: {response.status_code} - {response.text}")
         except requests.RequestException as e:
@@ -72,22 +119,32 @@ class Cell:
         """
         # تخزين في الذاكرة المؤقتة المحلية
         self.cache[key] = value
+        self._json_cache.pop(key, None)
+        self._track_keys([key])
         
         # تشفير البيانات
-        encrypted_value = encrypt(value, self.password_hash)
+        encrypted_value = self._seal_raw(value)
         
         # محاولة التخزين على الخادم إذا كان متصلاً
         try:
             if self.session_token:
-                response = requests.post(
+                if self._raw_supported:
+                    response = self._session.put(
+                        f"{self.server_url}/cells/{self.cell_key}/raw/{key}",
+                        data=encrypted_value,
+                        headers={"Content-Type": "application/octet-stream"}
+                    )
+                    if not self._raw_route_missing(response):
+                        return self._store_accepted([key], response)
+                
+                response = self._session.post(
                     f"{self.server_url}/cells/{self.cell_key}/data",
-                    headers={"Authorization": f"Bearer {self.session_token}"},
                     json={
                         "key": key,
-                        "value": encrypted_value
+                        "value": base64.b64encode(encrypted_value).decode('ascii')
                     }
                 )
-                return response.status_code == 200
+                return self._store_accepted([key], response)
             return True  # نجاح محلي فقط
         except requests.RequestException:
             return True  # نجاح محلي فقط
@@ -109,17 +166,29 @@ class Cell:
         # محاولة الحصول على البيانات من الخادم
         try:
             if self.session_token:
-                response = requests.get(
-                    f"{self.server_url}/cells/{self.cell_key}/data/{key}",
-                    headers={"Authorization": f"Bearer {self.session_token}"}
+                if self._raw_supported:
+                    response = self._session.get(
+                        f"{self.server_url}/cells/{self.cell_key}/raw/{key}"
+                    )
+                    if not self._raw_route_missing(response):
+                        if response.status_code == 200:
+                            value = self._unseal_raw(response.content)
+                            if value is not None:
+                                self.cache[key] = value
+                            return value
+                        return None
+                
+                response = self._session.get(
+                    f"{self.server_url}/cells/{self.cell_key}/data/{key}"
                 )
                 
                 if response.status_code == 200:
                     data = response.json()
                     encrypted_value = data.get("value")
                     if encrypted_value:
-                        value = decrypt(encrypted_value, self.password_hash)
-                        self.cache[key] = value
+                        value = self._unseal(encrypted_value)
+                        if value is not None:
+                            self.cache[key] = value
                         return value
             return None
         except requests.RequestException:
@@ -138,19 +207,92 @@ class Cell:
         # حذف من الذاكرة المؤقتة المحلية
         if key in self.cache:
             del self.cache[key]
+        self._json_cache.pop(key, None)
+        for cached_keys in self._keys_cache.values():
+            cached_keys.discard(key)
         
         # محاولة الحذف من الخادم
         try:
             if self.session_token:
-                response = requests.delete(
-                    f"{self.server_url}/cells/{self.cell_key}/data/{key}",
-                    headers={"Authorization": f"Bearer {self.session_token}"}
+                response = self._session.delete(
+                    f"{self.server_url}/cells/{self.cell_key}/data/{key}"
                 )
                 return response.status_code == 200
             return True  # نجاح محلي فقط
         except requests.RequestException:
             return True  # نجاح محلي فقط
     
+    def _seal(self, value: str) -> str:
+        """
+        ضغط القيمة ثم تشفيرها بتنسيق Base64 لواجهات JSON
+        """
+        return base64.b64encode(self._seal_raw(value)).decode('ascii')
+    
+    def _unseal(self, encrypted_value: str) -> Optional[str]:
+        """
+        فك تشفير قيمة Base64 من واجهات JSON ثم فك ضغطها، أو None إذا تعذر ذلك
+        """
+        try:
+            encrypted_value = base64.b64decode(encrypted_value)
+        except ValueError:
+            return None
+        return self._unseal_raw(encrypted_value)
+    
+    def _seal_raw(self, value: str) -> bytes:
+        """
+        ضغط القيمة ثم تشفيرها كبايتات خام
+        """
+        return encrypt_raw_with_key(compress_value(value), self._aes_key)
+    
+    def _unseal_raw(self, encrypted_value: bytes) -> Optional[str]:
+        """
+        فك تشفير بايتات خام من الخادم ثم فك ضغطها
+        
+        القيمة التي لا يمكن فك تشفيرها (مفتاح مختلف أو بيانات تالفة) تُعامل كقيمة غير موجودة
+        فيُعاد None بدل رفع استثناء إلى المستدعي.
+        """
+        try:
+            return decompress_value(decrypt_raw_with_key(encrypted_value, self._aes_key))
+        except ValueError:
+            return None
+    
+    def _store_accepted(self, keys, response) -> bool:
+        """
+        التحقق من قبول الخادم للتخزين، وإزالة القيم المرفوضة من الذاكرة المؤقتة المحلية
+        
+        تُجلب هذه المفاتيح من الخادم عند قراءتها التالية بدل إعادة قيمة لم يقبلها.
+        """
+        if response.status_code == 200:
+            return True
+        for key in keys:
+            self.cache.pop(key, None)
+            self._json_cache.pop(key, None)
+        return False
+    
+    def _route_missing(self, response) -> bool:
+        """
+        التحقق مما إذا كان الخادم لا يوفر المسار المطلوب
+        
+        يميز بين "المسار غير موجود" (رد FastAPI الافتراضي) وبين "الخلية أو البيانات غير موجودة".
+        """
+        if response.status_code not in (404, 405):
+            return False
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        detail = body.get("detail") if isinstance(body, dict) else None
+        return detail in ("Not Found", "Method Not Allowed")
+    
+    def _raw_route_missing(self, response) -> bool:
+        """
+        التحقق مما إذا كان الخادم لا يوفر الواجهة الثنائية الخام
+        """
+        if self._route_missing(response):
+            self._raw_supported = False
+            return True
+        return False
+    
     def store_json(self, key: str, data: Dict[str, Any]) -> bool:
         """
         تخزين بيانات JSON في الخلية
@@ -162,8 +304,12 @@ class Cell:
         العائد:
             bool: نجاح العملية
         """
-        json_str = json.dumps(data, ensure_ascii=False)
-        return self.store(key, json_str)
+        json_str = _dumps(data)
+        success = self.store(key, json_str)
+        if success:
+            # نسخة محللة مما أُرسل، فتعديل المستدعي لقاموسه لاحقًا لا يغير الذاكرة المؤقتة
+            self._json_cache[key] = _loads(json_str)
+        return success
     
     def get_json(self, key: str) -> Optional[Dict[str, Any]]:
         """
@@ -174,52 +320,359 @@ class Cell:
             
         العائد:
             البيانات المخزنة كقاموس Python أو None إذا لم يتم العثور عليها
+        
+        القاموس المعاد مشترك مع الذاكرة المؤقتة لتجنب إعادة التحليل، فيجب عدم تعديله؛
+        انسخه قبل التعديل ثم خزّن النسخة عبر store_json.
         """
+        if key in self._json_cache:
+            return self._json_cache[key]
+        
         json_str = self.get(key)
         if json_str:
             try:
-                return json.loads(json_str)
-            except json.JSONDecodeError:
+                data = _loads(json_str)
+            except _JSONDecodeError:
                 return None
+            self._json_cache[key] = data
+            return data
         return None
     
-    def list_keys(self) -> List[str]:
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """
+        استرجاع عدة قيم من الخلية في طلب واحد
+        
+        المعلمات:
+            keys: قائمة المفاتيح للبحث عنها
+            
+        العائد:
+            Dict[str, str]: قاموس بالقيم التي تم العثور عليها فقط
+        """
+        result = {}
+        missing = []
+        
+        # التحقق أولاً من الذاكرة المؤقتة المحلية
+        for key in keys:
+            if key in self.cache:
+                result[key] = self.cache[key]
+            else:
+                missing.append(key)
+        
+        if not missing or not self.session_token:
+            return result
+        
+        try:
+            response = self._session.post(
+                f"{self.server_url}/cells/{self.cell_key}/data/batch/get",
+                json={"keys": missing}
+            )
+        except requests.RequestException:
+            return result
+        
+        if self._route_missing(response):
+            # الخادم لا يدعم العمليات الجماعية، نعود إلى طلبات فردية متوازية
+            with ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE) as executor:
+                for key, value in zip(missing, executor.map(self.get, missing)):
+                    if value is not None:
+                        result[key] = value
+            return result
+        
+        if response.status_code == 200:
+            items = response.json().get("items", {})
+            encrypted_items = [(key, value) for key, value in items.items() if value]
+            
+            # فك التشفير بالتوازي
+            with ThreadPoolExecutor(max_workers=MAX_CRYPTO_WORKERS) as executor:
+                values = executor.map(
+                    lambda item: self._unseal(item[1]),
+                    encrypted_items
+                )
+                for (key, _), value in zip(encrypted_items, values):
+                    if value is not None:
+                        self.cache[key] = value
+                        result[key] = value
+        
+        return result
+    
+    def store_many(self, items: Dict[str, str]) -> bool:
+        """
+        تخزين عدة قيم نصية في الخلية في طلب واحد
+        
+        المعلمات:
+            items: قاموس بالمفاتيح والقيم النصية للتخزين
+            
+        العائد:
+            bool: نجاح العملية
+        """
+        if not items:
+            return True
+        
+        # تخزين في الذاكرة المؤقتة المحلية
+        self.cache.update(items)
+        for key in items:
+            self._json_cache.pop(key, None)
+        self._track_keys(items.keys())
+        
+        if not self.session_token:
+            return True  # نجاح محلي فقط
+        
+        # ضغط البيانات وتشفيرها بالتوازي
+        with ThreadPoolExecutor(max_workers=MAX_CRYPTO_WORKERS) as executor:
+            encrypted_values = executor.map(self._seal, items.values())
+            encrypted_items = dict(zip(items.keys(), encrypted_values))
+        
+        try:
+            response = self._session.post(
+                f"{self.server_url}/cells/{self.cell_key}/data/batch/store",
+                json={"items": encrypted_items}
+            )
+        except requests.RequestException:
+            return True  # نجاح محلي فقط
+        
+        if self._route_missing(response):
+            # الخادم لا يدعم العمليات الجماعية، نعود إلى طلبات فردية متوازية
+            with ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE) as executor:
+                return all(list(executor.map(self.store, items.keys(), items.values())))
+        
+        return self._store_accepted(items.keys(), response)
+    
+    def get_json_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        استرجاع عدة كائنات JSON من الخلية في طلب واحد
+        
+        المعلمات:
+            keys: قائمة المفاتيح للبحث عنها
+            
+        العائد:
+            قاموس بالبيانات التي تم العثور عليها وتحليلها بنجاح
+        
+        القواميس المعادة مشتركة مع الذاكرة المؤقتة ويجب عدم تعديلها (انظر get_json).
+        """
+        result = {}
+        missing = []
+        for key in keys:
+            if key in self._json_cache:
+                result[key] = self._json_cache[key]
+            else:
+                missing.append(key)
+        
+        for key, json_str in self.get_many(missing).items():
+            try:
+                data = _loads(json_str)
+            except _JSONDecodeError:
+                continue
+            self._json_cache[key] = data
+            result[key] = data
+        return result
+    
+    def store_json_many(self, items: Dict[str, Dict[str, Any]]) -> bool:
+        """
+        تخزين عدة كائنات JSON في الخلية في طلب واحد
+        
+        المعلمات:
+            items: قاموس بالمفاتيح وبيانات Python المقابلة
+            
+        العائد:
+            bool: نجاح العملية
+        """
+        json_items = {
+            key: _dumps(data)
+            for key, data in items.items()
+        }
+        success = self.store_many(json_items)
+        if success:
+            self._json_cache.update((key, _loads(json_str)) for key, json_str in json_items.items())
+        return success
+    
+    def list_keys(self, prefix: Optional[str] = None) -> List[str]:
         """
         الحصول على قائمة بجميع المفاتيح في الخلية
         
+        المعلمات:
+            prefix: بادئة لتصفية المفاتيح على الخادم (اختياري)
+        
         العائد:
             List[str]: قائمة بالمفاتيح
         """
+        # استخدام القائمة المحفوظة من طلب سابق في هذه الجلسة
+        if prefix in self._keys_cache:
+            return sorted(self._keys_cache[prefix])
+        
+        keys = []
+        cursor = None
+        while True:
+            page = self._fetch_keys_page(prefix, cursor)
+            if page is None:
+                return self._cached_keys(prefix)
+            page_keys, cursor = page
+            keys.extend(page_keys)
+            if cursor is None:
+                break
+        
+        self._keys_cache[prefix] = set(keys)
+        return keys
+    
+    def iter_keys(self, prefix: Optional[str] = None, page_size: int = KEYS_PAGE_SIZE) -> Iterator[str]:
+        """
+        المرور على مفاتيح الخلية صفحة تلو الأخرى دون انتظار القائمة كاملة
+        
+        المعلمات:
+            prefix: بادئة لتصفية المفاتيح على الخادم (اختياري)
+            page_size: عدد المفاتيح في كل طلب
+        
+        العائد:
+            Iterator[str]: المفاتيح بترتيبها على الخادم
+        """
+        if prefix in self._keys_cache:
+            yield from sorted(self._keys_cache[prefix])
+            return
+        
+        cursor = None
+        first_page = True
+        while True:
+            page = self._fetch_keys_page(prefix, cursor, page_size)
+            if page is None:
+                if first_page:
+                    yield from self._cached_keys(prefix)
+                return
+            page_keys, cursor = page
+            first_page = False
+            yield from page_keys
+            if cursor is None:
+                return
+    
+    def _fetch_keys_page(self, prefix: Optional[str], cursor: Optional[str],
+                         page_size: int = KEYS_PAGE_SIZE) -> Optional[Tuple[List[str], Optional[str]]]:
+        """
+        جلب صفحة واحدة من المفاتيح من الخادم
+        
+        العائد:
+            (المفاتيح، مؤشر الصفحة التالية) أو None إذا تعذر الاتصال
+        """
+        if not self.session_token:
+            return None
+        
+        params = {"limit": page_size}
+        if prefix:
+            params["prefix"] = prefix
+        if cursor is not None:
+            params["cursor"] = cursor
+        
         try:
-            if self.session_token:
-                response = requests.get(
-                    f"{self.server_url}/cells/{self.cell_key}/keys",
-                    headers={"Authorization": f"Bearer {self.session_token}"}
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return data.get("keys", [])
-            return list(self.cache.keys())
+            response = self._session.get(
+                f"{self.server_url}/cells/{self.cell_key}/keys",
+                params=params
+            )
         except requests.RequestException:
-            return list(self.cache.keys())
+            return None
+        
+        if response.status_code != 200:
+            return None
+        
+        # تحليل الجسم الخام مباشرة (أسرع مع orjson من response.json())
+        data = _loads(response.content)
+        return data.get("keys", []), data.get("next_cursor")
+    
+    def refresh_keys(self) -> None:
+        """
+        إفراغ ذاكرة قوائم المفاتيح لإجبار إعادة جلبها من الخادم
+        """
+        self._keys_cache.clear()
+    
+    def _track_keys(self, keys) -> None:
+        """
+        إضافة مفاتيح جديدة إلى قوائم المفاتيح المحفوظة المطابقة لبادئاتها
+        """
+        for prefix, cached_keys in self._keys_cache.items():
+            for key in keys:
+                if prefix is None or key.startswith(prefix):
+                    cached_keys.add(key)
     
-    def export_data(self) -> Dict[str, str]:
+    def _cached_keys(self, prefix: Optional[str] = None) -> List[str]:
         """
-        تصدير جميع بيانات الخلية
+        المفاتيح المتوفرة في الذاكرة المؤقتة المحلية (للوضع غير المتصل)
+        """
+        if prefix:
+            return [key for key in self.cache if key.startswith(prefix)]
+        return list(self.cache.keys())
+    
+    def export_data(self, prefix: Optional[str] = None) -> Dict[str, str]:
+        """
+        تصدير جميع بيانات الخلية في طلب واحد
+        
+        المعلمات:
+            prefix: تصدير المفاتيح التي تبدأ بهذه البادئة فقط (اختياري)
         
         العائد:
             Dict[str, str]: قاموس بجميع البيانات
         """
-        data = {}
-        keys = self.list_keys()
+        encrypted_items = self._fetch_export(prefix)
+        if encrypted_items is None:
+            # الخادم لا يدعم التصدير المجمع أو غير متصل
+            return self.get_many(self.list_keys(prefix))
         
-        for key in keys:
-            value = self.get(key)
-            if value is not None:
-                data[key] = value
+        # قائمة المفاتيح تأتي مع التصدير دون طلب إضافي
+        self._keys_cache[prefix] = set(encrypted_items)
         
-        return data
+        encrypted_items = [(key, value) for key, value in encrypted_items.items() if isinstance(value, str) and value]
+        
+        # فك التشفير بالتوازي
+        result = {}
+        with ThreadPoolExecutor(max_workers=MAX_CRYPTO_WORKERS) as executor:
+            values = executor.map(lambda item: self._unseal(item[1]), encrypted_items)
+            for (key, _), value in zip(encrypted_items, values):
+                if value is not None:
+                    self.cache[key] = value
+                    result[key] = value
+        
+        return result
+    
+    def export_json(self, prefix: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        تصدير جميع كائنات JSON في الخلية في طلب واحد
+        
+        المعلمات:
+            prefix: تصدير المفاتيح التي تبدأ بهذه البادئة فقط (اختياري)
+        
+        العائد:
+            قاموس بالبيانات التي تم تحليلها بنجاح
+        
+        القواميس المعادة مشتركة مع الذاكرة المؤقتة ويجب عدم تعديلها (انظر get_json).
+        """
+        result = {}
+        for key, json_str in self.export_data(prefix).items():
+            data = self._json_cache.get(key)
+            if data is None:
+                try:
+                    data = _loads(json_str)
+                except _JSONDecodeError:
+                    continue
+                self._json_cache[key] = data
+            result[key] = data
+        return result
+    
+    def _fetch_export(self, prefix: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        جلب جميع القيم المشفرة من نقطة التصدير على الخادم (مضغوطة بـ gzip)
+        
+        العائد:
+            قاموس بالقيم المشفرة أو None إذا تعذر استخدام نقطة التصدير
+        """
+        if not self.session_token:
+            return None
+        
+        try:
+            response = self._session.get(
+                f"{self.server_url}/cells/{self.cell_key}/export",
+                params={"prefix": prefix} if prefix else None,
+                headers={"Accept-Encoding": "gzip"}
+            )
+        except requests.RequestException:
+            return None
+        
+        if response.status_code != 200:
+            return None
+        
+        return _loads(response.content).get("items", {})
     
     def import_data(self, data: Dict[str, str]) -> bool:
         """
@@ -231,12 +684,7 @@ class Cell:
         العائد:
             bool: نجاح العملية
         """
-        success = True
-        for key, value in data.items():
-            if not self.store(key, value):
-                success = False
-        
-        return success
+        return self.store_many(data)
 
 
 def connect(cell_key: str, password: str, server_url: str = DEFAULT_SERVER) -> Cell:
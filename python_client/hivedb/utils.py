@@ -8,9 +8,30 @@ import hashlib
 import os
 import secrets
 import uuid
-from typing import Tuple
+import zlib
+from typing import Optional, Tuple, Union
 from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
+from Crypto.Util.Padding import unpad
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# أحجام مكونات التشفير بنمط GCM
+GCM_NONCE_SIZE = 12
+GCM_TAG_SIZE = 16
+
+# حجم متجه التهيئة في التنسيق القديم بنمط CBC (IV ثم البيانات المشفرة)
+CBC_IV_SIZE = 16
+
+# علامات طريقة الضغط (البايت الأول من البيانات قبل التشفير)
+CODEC_RAW = 0x00
+CODEC_ZLIB = 0x01
+CODEC_ZSTD = 0x02
+
+# القيم الأصغر من هذا الحد لا تستفيد من الضغط
+MIN_COMPRESS_SIZE = 64
 
 def generate_cell_key() -> str:
     """
@@ -86,7 +107,7 @@ def derive_key(password: str) -> bytes:
         50000  # عدد التكرارات
     )
 
-def encrypt(data: str, password: str) -> str:
+def encrypt(data: Union[str, bytes], password: str) -> str:
     """
     تشفير البيانات باستخدام AES-256-GCM
     
@@ -97,24 +118,46 @@ def encrypt(data: str, password: str) -> str:
     العائد:
         str: البيانات المشفرة بتنسيق Base64
     """
-    # اشتقاق مفتاح التشفير
-    key = derive_key(password)
+    return encrypt_with_key(data, derive_key(password))
+
+def encrypt_with_key(data: Union[str, bytes], key: bytes) -> str:
+    """
+    تشفير البيانات بمفتاح مشتق مسبقًا (دون إعادة تشغيل PBKDF2)
+    
+    المعلمات:
+        data: البيانات للتشفير (نص أو بايتات UTF-8 جاهزة)
+        key: مفتاح التشفير (32 بايت) من derive_key
+        
+    العائد:
+        str: البيانات المشفرة بتنسيق Base64
+    """
+    return base64.b64encode(encrypt_raw_with_key(data, key)).decode('utf-8')
+
+def encrypt_raw_with_key(data: Union[str, bytes], key: bytes) -> bytes:
+    """
+    تشفير البيانات وإعادة البايتات الخام دون ترميز Base64 (للإرسال الثنائي)
     
-    # إنشاء متجه التهيئة (IV)
-    iv = os.urandom(16)
+    المعلمات:
+        data: البيانات للتشفير (نص أو بايتات UTF-8 جاهزة)
+        key: مفتاح التشفير (32 بايت) من derive_key
+        
+    العائد:
+        bytes: nonce ثم وسم المصادقة ثم البيانات المشفرة
+    """
+    # إنشاء رقم الاستخدام الواحد (nonce)
+    nonce = os.urandom(GCM_NONCE_SIZE)
     
-    # إنشاء شفرة AES
-    cipher = AES.new(key, AES.MODE_CBC, iv)
+    # إنشاء شفرة AES بنمط GCM (تستفيد من تعليمات AES-NI ولا تحتاج إلى تبطين)
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
     
-    # تشفير البيانات
-    padded_data = pad(data.encode('utf-8'), AES.block_size)
-    encrypted_data = cipher.encrypt(padded_data)
+    if isinstance(data, str):
+        data = data.encode('utf-8')
     
-    # دمج IV مع البيانات المشفرة
-    combined = iv + encrypted_data
+    # تشفير البيانات وحساب وسم المصادقة
+    encrypted_data, tag = cipher.encrypt_and_digest(data)
     
-    # تحويل إلى Base64
-    return base64.b64encode(combined).decode('utf-8')
+    # دمج nonce والوسم مع البيانات المشفرة
+    return nonce + tag + encrypted_data
 
 def decrypt(encrypted_data: str, password: str) -> str:
     """
@@ -127,27 +170,131 @@ def decrypt(encrypted_data: str, password: str) -> str:
     العائد:
         str: البيانات الأصلية
     """
-    # اشتقاق مفتاح التشفير
-    key = derive_key(password)
+    return decrypt_with_key(encrypted_data, derive_key(password))
+
+def decrypt_with_key(encrypted_data: str, key: bytes) -> str:
+    """
+    فك تشفير البيانات بمفتاح مشتق مسبقًا (دون إعادة تشغيل PBKDF2)
+    
+    المعلمات:
+        encrypted_data: البيانات المشفرة بتنسيق Base64
+        key: مفتاح التشفير (32 بايت) من derive_key
+        
+    العائد:
+        str: البيانات الأصلية
+    """
+    return decrypt_bytes_with_key(encrypted_data, key).decode('utf-8')
+
+def decrypt_bytes_with_key(encrypted_data: str, key: bytes) -> bytes:
+    """
+    فك تشفير البيانات إلى بايتات دون تحويلها إلى نص
     
+    المعلمات:
+        encrypted_data: البيانات المشفرة بتنسيق Base64
+        key: مفتاح التشفير (32 بايت) من derive_key
+        
+    العائد:
+        bytes: البيانات الأصلية
+    """
     # فك ترميز البيانات المشفرة
-    combined = base64.b64decode(encrypted_data.encode('utf-8'))
+    return decrypt_raw_with_key(base64.b64decode(encrypted_data.encode('utf-8')), key)
+
+def decrypt_raw_with_key(combined: bytes, key: bytes) -> bytes:
+    """
+    فك تشفير بايتات خام ناتجة عن encrypt_raw_with_key
+    
+    المعلمات:
+        combined: nonce ثم وسم المصادقة ثم البيانات المشفرة
+        key: مفتاح التشفير (32 بايت) من derive_key
+        
+    القيم التي كتبتها الإصدارات السابقة بنمط CBC (IV ثم البيانات المشفرة) تُقرأ
+    إذا فشل التحقق منها كقيم GCM.
+    
+    العائد:
+        bytes: البيانات الأصلية
+    
+    يرفع ValueError إذا تعذر فك التشفير بأي من التنسيقين.
+    """
+    # استخراج nonce والوسم
+    nonce = combined[:GCM_NONCE_SIZE]
+    tag = combined[GCM_NONCE_SIZE:GCM_NONCE_SIZE + GCM_TAG_SIZE]
+    encrypted_data = combined[GCM_NONCE_SIZE + GCM_TAG_SIZE:]
+    
+    # إنشاء شفرة AES بنمط GCM
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+    
+    # فك تشفير البيانات والتحقق من سلامتها
+    try:
+        return cipher.decrypt_and_verify(encrypted_data, tag)
+    except ValueError:
+        legacy = _decrypt_legacy_cbc(combined, key)
+        if legacy is None:
+            raise
+        return legacy
+
+def _decrypt_legacy_cbc(combined: bytes, key: bytes) -> Optional[bytes]:
+    """
+    فك تشفير قيمة بالتنسيق القديم بنمط CBC، أو None إذا لم تكن بهذا التنسيق
+    """
+    encrypted_data = combined[CBC_IV_SIZE:]
+    if not encrypted_data or len(encrypted_data) % AES.block_size:
+        return None
+    
+    cipher = AES.new(key, AES.MODE_CBC, combined[:CBC_IV_SIZE])
+    try:
+        return unpad(cipher.decrypt(encrypted_data), AES.block_size)
+    except ValueError:
+        return None
+
+def compress_value(data: str) -> bytes:
+    """
+    ضغط قيمة نصية قبل تشفيرها مع إضافة بايت يحدد طريقة الضغط
+    
+    المعلمات:
+        data: القيمة النصية
+        
+    العائد:
+        bytes: بايت الطريقة متبوعًا بالبيانات (مضغوطة أو كما هي)
+    """
+    raw = data.encode('utf-8')
+    if len(raw) < MIN_COMPRESS_SIZE:
+        return bytes([CODEC_RAW]) + raw
     
-    # استخراج IV (أول 16 بايت)
-    iv = combined[:16]
-    encrypted_data = combined[16:]
+    if zstandard is not None:
+        codec, compressed = CODEC_ZSTD, zstandard.ZstdCompressor(level=3).compress(raw)
+    else:
+        codec, compressed = CODEC_ZLIB, zlib.compress(raw, 6)
     
-    # إنشاء شفرة AES
-    cipher = AES.new(key, AES.MODE_CBC, iv)
+    # الاحتفاظ بالنسخة الأصلية إذا لم يقلل الضغط الحجم
+    if len(compressed) >= len(raw):
+        return bytes([CODEC_RAW]) + raw
+    return bytes([codec]) + compressed
+
+def decompress_value(data: bytes) -> str:
+    """
+    فك ضغط قيمة ناتجة عن compress_value
     
-    # فك تشفير البيانات
-    decrypted_padded = cipher.decrypt(encrypted_data)
+    القيم المخزنة قبل إضافة الضغط (نص UTF-8 بدون بايت الطريقة) تُعاد كما هي.
     
-    # إزالة التبطين
-    decrypted_data = unpad(decrypted_padded, AES.block_size)
+    المعلمات:
+        data: البيانات بعد فك التشفير
+        
+    العائد:
+        str: القيمة النصية الأصلية
+    """
+    if not data:
+        return ""
     
-    # تحويل إلى سلسلة نصية
-    return decrypted_data.decode('utf-8')
+    codec, payload = data[0], data[1:]
+    if codec == CODEC_RAW:
+        return payload.decode('utf-8')
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(payload).decode('utf-8')
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("القيمة مضغوطة بـ zstd لكن حزمة zstandard غير مثبتة")
+        return zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+    return data.decode('utf-8')
 
 def generate_token() -> str:
     """
@@ -9,6 +9,9 @@ setup(
         "pycryptodome>=3.10.1",
         "python-dotenv>=0.19.0",
     ],
+    extras_require={
+        "fast": ["orjson>=3.6", "zstandard>=0.15"],
+    },
     author="فريق HiveDB",
     author_email="info@hivedb.io",
     description="مكتبة Python لنظام قواعد بيانات HiveDB المستوحى من خلية النحل",
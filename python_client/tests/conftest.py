@@ -0,0 +1,8 @@
+"""
+ملف تكوين pytest لاختبارات عميل HiveDB
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -0,0 +1,243 @@
+"""
+اختبارات عميل HiveDB مع خادم وهمي
+"""
+
+import base64
+import json
+
+import pytest
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+
+from hivedb.client import Cell
+
+SERVER = "http://hivedb.test"
+ROUTE_MISSING = (404, {"detail": "Not Found"})
+CELL_MISSING = (404, {"detail": "الخلية غير موجودة"})
+
+
+class FakeResponse:
+    """رد HTTP وهمي بجسم JSON أو بايتات خام"""
+
+    def __init__(self, status_code, body=None, content=None):
+        self.status_code = status_code
+        self._body = body
+        self.content = content if content is not None else json.dumps(body).encode("utf-8")
+
+    def json(self):
+        if self._body is None:
+            raise ValueError("no JSON body")
+        return self._body
+
+
+class FakeSession:
+    """جلسة HTTP وهمية تعيد ردودًا محددة لكل (طريقة، مسار) وتسجل الطلبات"""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.calls = []
+
+    def _request(self, method, url, **kwargs):
+        path = url[len(SERVER):]
+        self.calls.append((method, path))
+        route = self.routes.get((method, path), ROUTE_MISSING)
+        return route(kwargs) if callable(route) else FakeResponse(*route)
+
+    def get(self, url, **kwargs):
+        return self._request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self._request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self._request("PUT", url, **kwargs)
+
+
+@pytest.fixture
+def make_cell(monkeypatch):
+    """إنشاء خلية متصلة بخادم وهمي دون مصادقة حقيقية"""
+    monkeypatch.setattr(Cell, "_authenticate", lambda self: None)
+
+    def factory(routes):
+        cell = Cell("cell1", "password123", server_url=SERVER)
+        cell.session_token = "token"
+        cell._session = FakeSession(routes)
+        return cell
+    return factory
+
+
+def test_get_many_batch(make_cell):
+    """get_many يجلب القيم ويفك تشفيرها في طلب واحد"""
+    cell = make_cell({})
+    sealed = cell._seal("value-a")
+    cell._session.routes[("POST", "/cells/cell1/data/batch/get")] = (200, {"items": {"a": sealed, "b": None}})
+
+    assert cell.get_many(["a", "b"]) == {"a": "value-a"}
+    assert cell._session.calls == [("POST", "/cells/cell1/data/batch/get")]
+
+
+def test_get_many_falls_back_when_batch_route_missing(make_cell):
+    """get_many يعود إلى طلبات فردية إذا لم يوفر الخادم المسار الجماعي"""
+    cell = make_cell({})
+    cell._session.routes[("GET", "/cells/cell1/raw/a")] = (200, None, cell._seal_raw("value-a"))
+    cell._session.routes[("GET", "/cells/cell1/raw/b")] = (404, {"detail": "البيانات غير موجودة"})
+
+    assert cell.get_many(["a", "b"]) == {"a": "value-a"}
+    assert ("GET", "/cells/cell1/raw/a") in cell._session.calls
+
+
+def test_get_many_does_not_fall_back_when_cell_missing(make_cell):
+    """رد 404 لخلية غير موجودة لا يؤدي إلى طلب لكل مفتاح"""
+    cell = make_cell({("POST", "/cells/cell1/data/batch/get"): CELL_MISSING})
+
+    assert cell.get_many(["a", "b"]) == {}
+    assert cell._session.calls == [("POST", "/cells/cell1/data/batch/get")]
+
+
+def test_store_many_batch(make_cell):
+    """store_many يرسل جميع القيم مشفرة في طلب واحد"""
+    sent = {}
+
+    def batch_store(kwargs):
+        sent.update(kwargs["json"]["items"])
+        return FakeResponse(200, {"stored": len(sent)})
+
+    cell = make_cell({("POST", "/cells/cell1/data/batch/store"): batch_store})
+
+    assert cell.store_many({"a": "value-a", "b": "value-b"})
+    assert {key: cell._unseal(value) for key, value in sent.items()} == {"a": "value-a", "b": "value-b"}
+
+
+def test_store_many_falls_back_when_batch_route_missing(make_cell):
+    """store_many يعود إلى تخزين كل مفتاح على حدة إذا لم يوفر الخادم المسار الجماعي"""
+    cell = make_cell({
+        ("PUT", "/cells/cell1/raw/a"): (200, {}),
+        ("PUT", "/cells/cell1/raw/b"): (200, {}),
+    })
+
+    assert cell.store_many({"a": "value-a", "b": "value-b"})
+    assert ("PUT", "/cells/cell1/raw/a") in cell._session.calls
+    assert ("PUT", "/cells/cell1/raw/b") in cell._session.calls
+
+
+def test_store_many_does_not_fall_back_when_cell_missing(make_cell):
+    """رد 404 لخلية غير موجودة يفشل دون طلب لكل مفتاح"""
+    cell = make_cell({("POST", "/cells/cell1/data/batch/store"): CELL_MISSING})
+
+    assert not cell.store_many({"a": "value-a", "b": "value-b"})
+    assert cell._session.calls == [("POST", "/cells/cell1/data/batch/store")]
+
+
+def test_raw_store_and_get(make_cell):
+    """القيم تُرسل وتُستقبل كبايتات خام عند دعم الخادم لذلك"""
+    stored = {}
+
+    def raw_put(kwargs):
+        stored["a"] = kwargs["data"]
+        return FakeResponse(200, {})
+
+    cell = make_cell({("PUT", "/cells/cell1/raw/a"): raw_put})
+    assert cell.store("a", "value-a")
+
+    cell.cache.clear()
+    cell._session.routes[("GET", "/cells/cell1/raw/a")] = (200, None, stored["a"])
+    assert cell.get("a") == "value-a"
+    assert cell._raw_supported
+
+
+def test_raw_falls_back_to_json_when_route_missing(make_cell):
+    """غياب الواجهة الخام يعيد العميل إلى واجهة JSON بـ Base64 ويتذكر ذلك"""
+    sent = {}
+
+    def json_store(kwargs):
+        sent.update(kwargs["json"])
+        return FakeResponse(200, {})
+
+    cell = make_cell({("POST", "/cells/cell1/data"): json_store})
+    assert cell.store("a", "value-a")
+    assert not cell._raw_supported
+    assert cell._unseal_raw(base64.b64decode(sent["value"])) == "value-a"
+
+    cell.cache.clear()
+    cell._session.routes[("GET", "/cells/cell1/data/a")] = (200, {"value": sent["value"]})
+    assert cell.get("a") == "value-a"
+    assert ("GET", "/cells/cell1/raw/a") not in cell._session.calls
+
+
+def test_raw_missing_value_keeps_raw_route(make_cell):
+    """قيمة غير موجودة على الواجهة الخام لا تعطل استخدامها"""
+    cell = make_cell({("GET", "/cells/cell1/raw/a"): (404, {"detail": "البيانات غير موجودة"})})
+
+    assert cell.get("a") is None
+    assert cell._raw_supported
+
+
+def test_export_data(make_cell):
+    """export_data يجلب جميع القيم في طلب واحد ويحفظ قائمة المفاتيح"""
+    cell = make_cell({})
+    items = {"entry_1": cell._seal("one"), "entry_2": cell._seal("two")}
+    cell._session.routes[("GET", "/cells/cell1/export")] = (200, {"items": items, "count": 2})
+
+    assert cell.export_data() == {"entry_1": "one", "entry_2": "two"}
+    assert cell.list_keys() == ["entry_1", "entry_2"]
+    assert cell._session.calls == [("GET", "/cells/cell1/export")]
+
+
+def test_export_data_falls_back_without_export_route(make_cell):
+    """export_data يعود إلى سرد المفاتيح وجلبها إذا لم يوفر الخادم التصدير"""
+    cell = make_cell({})
+    cell._session.routes[("GET", "/cells/cell1/keys")] = (200, {"keys": ["a"], "next_cursor": None})
+    cell._session.routes[("POST", "/cells/cell1/data/batch/get")] = (200, {"items": {"a": cell._seal("one")}})
+
+    assert cell.export_data() == {"a": "one"}
+
+
+def test_get_reads_legacy_cbc_value(make_cell):
+    """get يقرأ القيم التي كتبها الإصدار السابق بنمط CBC"""
+    cell = make_cell({})
+    iv = bytes(16)
+    legacy = iv + AES.new(cell._aes_key, AES.MODE_CBC, iv).encrypt(pad(b'{"a": 1}', AES.block_size))
+    cell._session.routes[("GET", "/cells/cell1/raw/a")] = (200, None, legacy)
+
+    assert cell.get_json("a") == {"a": 1}
+
+
+def test_undecryptable_values_are_missing(make_cell):
+    """القيم التي لا يمكن فك تشفيرها تُعامل كقيم غير موجودة بدل رفع استثناء"""
+    cell = make_cell({})
+    cell._session.routes[("GET", "/cells/cell1/raw/a")] = (200, None, b"\x00" * 40)
+    cell._session.routes[("POST", "/cells/cell1/data/batch/get")] = (
+        200, {"items": {"b": base64.b64encode(b"\x01" * 40).decode("ascii"), "c": cell._seal("value-c")}}
+    )
+
+    assert cell.get("a") is None
+    assert "a" not in cell.cache
+    assert cell.get_many(["b", "c"]) == {"c": "value-c"}
+
+
+def test_store_json_caches_only_accepted_values(make_cell):
+    """القيمة التي رفضها الخادم لا تبقى في الذاكرة المؤقتة"""
+    cell = make_cell({("PUT", "/cells/cell1/raw/a"): (403, {"detail": "ليس لديك حق الكتابة في هذه الخلية"})})
+
+    assert not cell.store_json("a", {"n": 1})
+    assert "a" not in cell._json_cache and "a" not in cell.cache
+    assert cell.get_json("a") is None
+
+
+def test_store_json_snapshots_caller_dict(make_cell):
+    """تعديل القاموس بعد تخزينه لا يغير ما تعيده get_json"""
+    cell = make_cell({("PUT", "/cells/cell1/raw/a"): (200, {})})
+    data = {"n": 1, "tags": ["x"]}
+
+    assert cell.store_json("a", data)
+    data["n"] = 2
+    data["tags"].append("y")
+    assert cell.get_json("a") == {"n": 1, "tags": ["x"]}
+
+
+def test_store_json_many_caches_only_on_success(make_cell):
+    """التخزين الجماعي المرفوض لا يترك قيمًا في الذاكرة المؤقتة"""
+    cell = make_cell({("POST", "/cells/cell1/data/batch/store"): (403, {"detail": "ليس لديك حق الكتابة في هذه الخلية"})})
+
+    assert not cell.store_json_many({"a": {"n": 1}})
+    assert "a" not in cell._json_cache and "a" not in cell.cache
@@ -0,0 +1,40 @@
+"""
+اختبارات التشفير والضغط في وحدة المساعدة
+"""
+
+import base64
+
+import pytest
+
+from hivedb.utils import (
+    decrypt, decrypt_raw_with_key, decrypt_with_key, derive_key, encrypt, encrypt_raw_with_key
+)
+
+# قيمة كتبها الإصدار السابق بنمط CBC: IV ثم البيانات المشفرة بتبطين PKCS7، بمفتاح derive_key("password123")
+LEGACY_CBC_VALUE = "AAECAwQFBgcICQoLDA0OD85qSH3/E2AnH6bA7VAbfUgCwfYSPtE6lTCGS10OSD7y"
+LEGACY_PLAINTEXT = '{"title": "يوم سعيد"}'
+
+
+def test_gcm_round_trip():
+    """التشفير بنمط GCM ثم فكه يعيد البيانات الأصلية"""
+    assert decrypt(encrypt("مرحبا", "password123"), "password123") == "مرحبا"
+
+
+def test_gcm_rejects_tampered_value():
+    """تعديل البيانات المشفرة يفشل التحقق من الوسم"""
+    key = derive_key("password123")
+    combined = bytearray(encrypt_raw_with_key("value", key))
+    combined[-1] ^= 1
+    with pytest.raises(ValueError):
+        decrypt_raw_with_key(bytes(combined), key)
+
+
+def test_reads_legacy_cbc_value():
+    """القيم المكتوبة بنمط CBC في الإصدارات السابقة ما زالت قابلة للقراءة"""
+    assert decrypt_with_key(LEGACY_CBC_VALUE, derive_key("password123")) == LEGACY_PLAINTEXT
+
+
+def test_legacy_value_with_wrong_key_raises():
+    """قيمة قديمة بمفتاح خاطئ ترفع ValueError ولا تُعاد بيانات عشوائية"""
+    with pytest.raises(ValueError):
+        decrypt_raw_with_key(base64.b64decode(LEGACY_CBC_VALUE), derive_key("other_password"))
@@ -4,27 +4,43 @@
 """
 
 import os
+import json
+import asyncio
+import base64
+import hmac
 import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from typing import Dict, List, Optional, Union
 from datetime import datetime, timedelta
 
+import orjson
 import uvicorn
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException, status, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel, EmailStr, Field
+from sqlalchemy import and_, func, insert, inspect, select, text
 from sqlalchemy.orm import Session
 from prometheus_fastapi_instrumentator import Instrumentator
 
 # Import services
 from services.database import get_db, Base, engine
+from services.database.models import upgrade_schema
 from services.auth.models import User, UserCreate, UserLogin, UserResponse, Token
 from services.auth.models import Cell, CellCreate, CellResponse, CellOwnership
 from services.auth.auth import (
-    get_password_hash, verify_password, authenticate_user,
+    get_password_hash, get_password_hash_async, verify_password, authenticate_user, authenticate_user_async,
     create_access_token, get_current_user, get_current_active_user, get_current_admin_user
 )
+from services.kafka.producer import kafka_producer
+from services.kafka.consumer import kafka_consumer
+from services.sgx.enclave import sgx_enclave
 # Simplified imports - removed complex dependencies
 from services.query_optimizer.optimizer import query_optimizer
 from services.liquid_cache.liquid_cache import liquid_cache
@@ -48,11 +64,22 @@ logger = logging.getLogger("hivedb")
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+# users.last_login was added after the first release; create_all does not alter existing tables
+_inspector = inspect(engine)
+if _inspector.has_table("users") and "last_login" not in {column["name"] for column in _inspector.get_columns("users")}:
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE users ADD COLUMN last_login TIMESTAMP"))
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_users_last_login ON users (last_login)"))
+
+# Tables created before cells.x/y/hex_id and cell_data.size_bytes get those columns and are backfilled once
+upgrade_schema(engine)
+
 # Create FastAPI app
 app = FastAPI(
     title="HiveDB API",
     description="واجهة برمجة التطبيقات لنظام قواعد بيانات HiveDB المستوحى من خلية النحل مع ميزات متقدمة",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -64,6 +91,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON bodies above ~1KB (query results, exports, admin stats) for clients that accept gzip
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=6)
+
 # Add Prometheus metrics
 Instrumentator().instrument(app).expose(app)
 
@@ -82,12 +112,312 @@ class CellDataResponse(BaseModel):
 
 class KeysResponse(BaseModel):
     keys: List[str]
+    next_cursor: Optional[str] = None
 
 class QueryRequest(BaseModel):
     filter: Optional[Dict] = None
     sort: Optional[List[str]] = None
     limit: Optional[int] = None
 
+class BatchGetRequest(BaseModel):
+    keys: List[str]
+
+class BatchStoreRequest(BaseModel):
+    items: Dict[str, str]
+
+class SecureDataRequest(BaseModel):
+    data: Dict
+    data_id: Optional[str] = None
+
+class SecureVerifyRequest(BaseModel):
+    data: Dict
+    hash_value: str
+
+class SecureComputeRequest(BaseModel):
+    operation: str
+    encrypted_data: Dict[str, str]
+    params: Dict = Field(default_factory=dict)
+
+def glob_prefix(prefix: str) -> str:
+    """Build a SQLite GLOB pattern matching keys that start with `prefix`"""
+    escaped = "".join(f"[{ch}]" if ch in "*?[" else ch for ch in prefix)
+    return escaped + "*"
+
+# Columns of the cell `data` table that queries may filter and sort on
+QUERY_COLUMNS = ("key", "value", "created_at", "updated_at")
+SQL_COMPARISON_OPS = {"eq": "=", "ne": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+QUERY_FETCH_SIZE = 1000
+
+def _is_sql_scalar(value) -> bool:
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+def fts_phrase(term: str) -> str:
+    """Quote a user search term as an FTS5 prefix phrase on the value column so MATCH never sees query syntax"""
+    return 'value : "' + term.replace('"', '""') + '"*'
+
+def build_sql(query_params: Dict, pushable_columns=QUERY_COLUMNS, full_text: bool = True):
+    """
+    Translate a cell query (filter/sort/limit) into a parametrized SELECT.
+    
+    A `filter.search` term is answered by the data_fts index when `full_text`
+    is set (plaintext values); otherwise it is left in the residual.
+    
+    Returns (sql, params, residual) where `residual` holds the parts of the
+    query SQLite cannot evaluate (unknown fields, non-scalar operands, or
+    columns that are encrypted at rest); those are left to the query optimizer.
+    """
+    where = []
+    params = []
+    residual = {}
+    
+    residual_filter = {}
+    filters = dict(query_params.get("filter") or {})
+    search = filters.pop("search", None)
+    if search is not None:
+        if full_text and isinstance(search, str) and search.strip():
+            where.append("rowid IN (SELECT rowid FROM data_fts WHERE data_fts MATCH ?)")
+            params.append(fts_phrase(search))
+        else:
+            residual_filter["search"] = search
+    
+    for field, condition in filters.items():
+        if field not in pushable_columns:
+            residual_filter[field] = condition
+            continue
+        
+        conditions = condition if isinstance(condition, dict) else {"eq": condition}
+        residual_ops = {}
+        for op, value in conditions.items():
+            if op in SQL_COMPARISON_OPS and _is_sql_scalar(value):
+                where.append(f"{field} {SQL_COMPARISON_OPS[op]} ?")
+                params.append(value)
+            elif op in ("in", "nin") and isinstance(value, list) and all(_is_sql_scalar(v) for v in value):
+                if value:
+                    placeholders = ",".join("?" for _ in value)
+                    where.append(f"{field} {'IN' if op == 'in' else 'NOT IN'} ({placeholders})")
+                    params.extend(value)
+                elif op == "in":
+                    where.append("0")
+            else:
+                residual_ops[op] = value
+        if residual_ops:
+            residual_filter[field] = residual_ops
+    if residual_filter:
+        residual["filter"] = residual_filter
+    
+    order_by = []
+    sort_fields = query_params.get("sort") or []
+    for field in sort_fields:
+        name = field.lstrip("-+")
+        if name not in pushable_columns:
+            # Partial ordering is useless, so the whole sort falls back to Python
+            residual["sort"] = sort_fields
+            order_by = []
+            break
+        order_by.append(f"{name} DESC" if field.startswith("-") else name)
+    
+    sql = "SELECT key, value, created_at, updated_at FROM data"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if order_by:
+        sql += " ORDER BY " + ", ".join(order_by)
+    
+    limit = query_params.get("limit")
+    if limit is not None:
+        if residual:
+            residual["limit"] = limit
+        else:
+            sql += " LIMIT ?"
+            params.append(limit)
+    
+    return sql, params, residual
+
+def iter_rows(cursor, size: int = QUERY_FETCH_SIZE):
+    """Stream rows from a cursor in fetchmany() batches instead of one fetchall()"""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+async def publish_events(*sends):
+    """Await several Kafka sends concurrently; meant to run as a background task"""
+    await asyncio.gather(*sends)
+
+# Values sealed by the enclave are stored as "ENC:" + JSON payload; plaintext values are stored untouched
+SEALED_PREFIX = "ENC:"
+_SEALED_HEADER = SEALED_PREFIX.encode()
+
+def is_sealed(value) -> bool:
+    """Check the stored-value header in constant time instead of branching on str.startswith"""
+    return isinstance(value, str) and hmac.compare_digest(value[:len(SEALED_PREFIX)].encode(), _SEALED_HEADER)
+
+def encrypt_for_storage(cell_key: str, data_key: str, value: str):
+    """Encrypt a value with SGX if available, returning (value_to_store, is_encrypted)"""
+    if not sgx_enclave.is_initialized:
+        return value, False
+    
+    # استخدام معرف الخلية كمعرف للبيانات للمساعدة في اشتقاق المفتاح
+    data_id = f"{cell_key}:{data_key}"
+    encrypted_data = sgx_enclave.encrypt_data({"value": value}, data_id)
+    if not encrypted_data:
+        return value, False
+    return SEALED_PREFIX + json.dumps(encrypted_data), True
+
+def encrypt_many_for_storage(cell_key: str, items: Dict[str, str]):
+    """Encrypt several values with one enclave call, returning ([(data_key, value_to_store)], is_encrypted)"""
+    if not sgx_enclave.is_initialized:
+        return list(items.items()), False
+    
+    payloads = sgx_enclave.encrypt_many(
+        [{"value": value} for value in items.values()],
+        [f"{cell_key}:{data_key}" for data_key in items]
+    )
+    rows = []
+    is_encrypted = False
+    for (data_key, value), encrypted_data in zip(items.items(), payloads):
+        if encrypted_data:
+            rows.append((data_key, SEALED_PREFIX + json.dumps(encrypted_data)))
+            is_encrypted = True
+        else:
+            rows.append((data_key, value))
+    return rows, is_encrypted
+
+def decrypt_from_storage(value: str):
+    """Decrypt a stored value produced by encrypt_for_storage"""
+    if not (sgx_enclave.is_initialized and is_sealed(value)):
+        return value
+    
+    try:
+        item_data = sgx_enclave.decrypt_data(json.loads(value[len(SEALED_PREFIX):]))
+        if item_data and "value" in item_data:
+            return item_data["value"]
+    except Exception as e:
+        logger.error(f"خطأ في فك تشفير البيانات: {e}")
+    # إذا فشل فك التشفير، نعيد البيانات المشفرة كما هي
+    return {"error": "decryption_failed", "encrypted_data": value}
+
+# Per-cell SQLite connections are kept open and reused across requests
+CELL_CONN_CACHE_SIZE = 128
+CELL_MMAP_SIZE = 64 * 1024 * 1024
+
+# Statement text is kept constant so sqlite3's per-connection statement cache reuses the prepared statement
+_SQL_UPSERT = (
+    "INSERT INTO data (key, value, created_at, updated_at) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at"
+)
+
+_conn_cache: "OrderedDict[str, sqlite3.Connection]" = OrderedDict()
+_conn_lock = threading.Lock()
+
+def cell_db_path(cell_key: str) -> str:
+    """Path of a cell's database: cells/<key>/data.db, or the legacy cells/<key>.db if only that exists"""
+    db_file = os.path.join(CELLS_DIR, cell_key, "data.db")
+    legacy_file = os.path.join(CELLS_DIR, f"{cell_key}.db")
+    if not os.path.exists(db_file) and os.path.exists(legacy_file):
+        return legacy_file
+    return db_file
+
+def _open_cell_conn(cell_key: str) -> sqlite3.Connection:
+    """Open and configure a cell database connection (done once per cached connection)"""
+    db_file = cell_db_path(cell_key)
+    os.makedirs(os.path.dirname(db_file), exist_ok=True)
+    
+    conn = sqlite3.connect(db_file, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute(f'PRAGMA mmap_size={CELL_MMAP_SIZE}')
+    with conn:
+        conn.execute('CREATE TABLE IF NOT EXISTS data (key TEXT PRIMARY KEY, value TEXT, created_at TEXT, updated_at TEXT)')
+        conn.execute('CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_data_updated ON data(updated_at)')
+        _ensure_fts(conn)
+    return conn
+
+def _ensure_fts(conn: sqlite3.Connection):
+    """Create the data_fts full-text index over data (kept in sync by triggers), backfilling older cells once"""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'data_fts'").fetchone()
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS data_fts USING fts5(key, value, content='data', content_rowid='rowid')")
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS data_fts_insert AFTER INSERT ON data BEGIN
+        INSERT INTO data_fts(rowid, key, value) VALUES (new.rowid, new.key, new.value);
+    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS data_fts_delete AFTER DELETE ON data BEGIN
+        INSERT INTO data_fts(data_fts, rowid, key, value) VALUES ('delete', old.rowid, old.key, old.value);
+    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS data_fts_update AFTER UPDATE ON data BEGIN
+        INSERT INTO data_fts(data_fts, rowid, key, value) VALUES ('delete', old.rowid, old.key, old.value);
+        INSERT INTO data_fts(rowid, key, value) VALUES (new.rowid, new.key, new.value);
+    END''')
+    if not exists:
+        conn.execute("INSERT INTO data_fts(data_fts) VALUES ('rebuild')")
+
+def get_cell_conn(cell_key: str) -> sqlite3.Connection:
+    """Return the cached connection for a cell, opening it (and evicting the least recently used) if needed"""
+    with _conn_lock:
+        conn = _conn_cache.get(cell_key)
+        if conn is not None:
+            _conn_cache.move_to_end(cell_key)
+            return conn
+        
+        conn = _open_cell_conn(cell_key)
+        _conn_cache[cell_key] = conn
+        if len(_conn_cache) > CELL_CONN_CACHE_SIZE:
+            _, evicted = _conn_cache.popitem(last=False)
+            evicted.close()
+        return conn
+
+def close_cell_conns():
+    """Close every cached cell connection"""
+    with _conn_lock:
+        for conn in _conn_cache.values():
+            conn.close()
+        _conn_cache.clear()
+
+# Total cell storage is expensive to measure, so /admin/stats reuses it for a short while
+STORAGE_STATS_TTL = 60
+
+_storage_stats = {"bytes": 0, "measured_at": 0.0}
+
+def _cell_db_size(cell_key: str) -> int:
+    """Size of one cell database, read from SQLite's page counters when the connection is already open"""
+    with _conn_lock:
+        conn = _conn_cache.get(cell_key)
+    if conn is not None:
+        return conn.execute(
+            'SELECT page_count * page_size FROM pragma_page_count(), pragma_page_size()'
+        ).fetchone()[0]
+    
+    db_file = cell_db_path(cell_key)
+    return os.path.getsize(db_file) if os.path.exists(db_file) else 0
+
+def total_storage_bytes(db: Session) -> int:
+    """Summed size of every cell database, recomputed at most once per STORAGE_STATS_TTL seconds"""
+    now = time.monotonic()
+    if _storage_stats["measured_at"] and now - _storage_stats["measured_at"] < STORAGE_STATS_TTL:
+        return _storage_stats["bytes"]
+    
+    total = sum(_cell_db_size(cell_key) for (cell_key,) in db.query(Cell.key))
+    _storage_stats.update(bytes=total, measured_at=now)
+    return total
+
+def _load_cell_with_permission(db: Session, cell_key: str, user_id: int):
+    """
+    Fetch a cell and the user's permission level on it in one round trip.
+    
+    Returns (cell, permission_level); cell is None if it does not exist and
+    permission_level is None if the user has no ownership record for it.
+    """
+    row = db.query(Cell, CellOwnership.permission_level).outerjoin(
+        CellOwnership,
+        and_(CellOwnership.cell_id == Cell.id, CellOwnership.user_id == user_id)
+    ).filter(Cell.key == cell_key).first()
+    
+    if row is None:
+        return None, None
+    return row[0], row[1]
+
 # Startup and shutdown events
 @app.on_event("startup")
 async def startup_event():
@@ -100,6 +430,13 @@ async def startup_event():
     # Initialize query optimizer
     query_optimizer.initialize()
     
+    # Initialize SGX enclave if enabled
+    if os.getenv("SGX_ENABLED", "False").lower() in ("true", "1", "t"):
+        if sgx_enclave.initialize():
+            logger.info("Intel SGX enclave initialized successfully")
+        else:
+            logger.warning("Failed to initialize Intel SGX enclave, falling back to standard security")
+    
     logger.info("HiveDB server started successfully")
 
 @app.on_event("shutdown")
@@ -110,11 +447,14 @@ async def shutdown_event():
     # Shutdown liquid cache
     liquid_cache.shutdown()
     
+    # Close cell databases
+    close_cell_conns()
+    
     logger.info("HiveDB server shutdown complete")
 
 # Authentication endpoints
 @app.post("/auth/register", response_model=UserResponse)
-async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user_data: UserCreate, background: BackgroundTasks, db: Session = Depends(get_db)):
     """Register a new user"""
     # Check if user already exists
     db_user = db.query(User).filter(User.email == user_data.email).first()
@@ -125,38 +465,39 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
-    db_user = User(
-        email=user_data.email,
-        username=user_data.username,
-        hashed_password=hashed_password
-    )
-    
-    db.add(db_user)
+    hashed_password = await get_password_hash_async(user_data.password)
+    # RETURNING hands back the generated id and defaults in the INSERT round trip, so no refresh SELECT follows
+    db_user = db.execute(
+        insert(User).values(
+            email=user_data.email,
+            username=user_data.username,
+            hashed_password=hashed_password
+        ).returning(User.id, User.email, User.username, User.is_active, User.is_admin, User.created_at)
+    ).one()
     db.commit()
-    db.refresh(db_user)
-    
-    # Send event to Kafka
-    await kafka_producer.send_user_event(
-        db_user.id,
-        "user_registered",
-        {"email": db_user.email, "username": db_user.username}
-    )
     
-    # Send audit log
-    await kafka_producer.send_audit_event(
-        str(db_user.id),
-        "register",
-        "user",
-        {"email": db_user.email}
+    # Publish event and audit log after the response, together so they share a producer batch
+    background.add_task(
+        publish_events,
+        kafka_producer.send_user_event(
+            db_user.id,
+            "user_registered",
+            {"email": db_user.email, "username": db_user.username}
+        ),
+        kafka_producer.send_audit_event(
+            str(db_user.id),
+            "register",
+            "user",
+            {"email": db_user.email}
+        )
     )
     
     return db_user
 
 @app.post("/auth/login", response_model=Token)
-async def login_for_access_token(form_data: UserLogin, db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: UserLogin, background: BackgroundTasks, db: Session = Depends(get_db)):
     """Login and get access token"""
-    user = authenticate_user(db, form_data.email, form_data.password)
+    user = await authenticate_user_async(db, form_data.email, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -164,14 +505,18 @@ async def login_for_access_token(form_data: UserLogin, db: Session = Depends(get
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    user.last_login = datetime.utcnow()
+    db.commit()
+    
     access_token_expires = timedelta(minutes=60)
     access_token = create_access_token(
         data={"sub": str(user.id)},
         expires_delta=access_token_expires
     )
     
-    # Send audit log
-    await kafka_producer.send_audit_event(
+    # Send audit log once the response is out
+    background.add_task(
+        kafka_producer.send_audit_event,
         str(user.id),
         "login",
         "user",
@@ -191,28 +536,23 @@ async def login_for_access_token(form_data: UserLogin, db: Session = Depends(get
 @app.post("/cells", response_model=CellResponse)
 async def create_cell(
     cell_data: CellCreate,
+    background: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Create a new cell"""
     # Generate a unique cell key
-    import uuid
     cell_key = f"cell{str(uuid.uuid4().int)[:10]}"
     
     # Hash the password
-    password_hash = get_password_hash(cell_data.password)
+    password_hash = await get_password_hash_async(cell_data.password)
     
     # Create cell in database
-    db_cell = Cell(
-        key=cell_key,
-        password_hash=password_hash
-    )
-    
-    db.add(db_cell)
-    db.commit()
-    db.refresh(db_cell)
+    db_cell = db.execute(
+        insert(Cell).values(key=cell_key, password_hash=password_hash).returning(Cell.id, Cell.key, Cell.created_at)
+    ).one()
     
-    # Create ownership record
+    # Create ownership record in the same transaction as the cell
     cell_ownership = CellOwnership(
         user_id=current_user.id,
         cell_id=db_cell.id,
@@ -222,34 +562,28 @@ async def create_cell(
     db.add(cell_ownership)
     db.commit()
     
-    # Create cell directory and database
-    cell_path = os.path.join(CELLS_DIR, f"{cell_key}")
-    os.makedirs(cell_path, exist_ok=True)
-    
-    # Initialize cell storage
-    import sqlite3
-    db_file = os.path.join(cell_path, "data.db")
-    conn = sqlite3.connect(db_file)
-    conn.execute('CREATE TABLE IF NOT EXISTS data (key TEXT PRIMARY KEY, value TEXT, created_at TEXT, updated_at TEXT)')
-    conn.execute('CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)')
-    conn.execute('INSERT INTO metadata (key, value) VALUES (?, ?)', ('created_at', datetime.now().isoformat()))
-    conn.execute('INSERT INTO metadata (key, value) VALUES (?, ?)', ('owner_id', str(current_user.id)))
-    conn.commit()
-    conn.close()
-    
-    # Send event to Kafka
-    await kafka_producer.send_cell_event(
-        cell_key,
-        "cell_created",
-        {"owner_id": current_user.id}
-    )
+    # Initialize cell storage (the directory and tables are created with the connection)
+    conn = get_cell_conn(cell_key)
+    with conn:
+        conn.executemany(
+            'INSERT INTO metadata (key, value) VALUES (?, ?)',
+            [('created_at', datetime.utcnow().isoformat()), ('owner_id', str(current_user.id))]
+        )
     
-    # Send audit log
-    await kafka_producer.send_audit_event(
-        str(current_user.id),
-        "create",
-        f"cell/{cell_key}",
-        {"cell_key": cell_key}
+    # Publish event and audit log after the response, together so they share a producer batch
+    background.add_task(
+        publish_events,
+        kafka_producer.send_cell_event(
+            cell_key,
+            "cell_created",
+            {"owner_id": current_user.id}
+        ),
+        kafka_producer.send_audit_event(
+            str(current_user.id),
+            "create",
+            f"cell/{cell_key}",
+            {"cell_key": cell_key}
+        )
     )
     
     return db_cell
@@ -260,11 +594,10 @@ async def get_user_cells(
     db: Session = Depends(get_db)
 ):
     """Get all cells owned by the current user"""
-    # Get all cells owned by the user
-    cell_ownerships = db.query(CellOwnership).filter(CellOwnership.user_id == current_user.id).all()
-    cell_ids = [ownership.cell_id for ownership in cell_ownerships]
-    
-    cells = db.query(Cell).filter(Cell.id.in_(cell_ids)).all()
+    # Get all cells owned by the user in a single JOIN
+    cells = db.query(Cell).join(CellOwnership, CellOwnership.cell_id == Cell.id).filter(
+        CellOwnership.user_id == current_user.id
+    ).all()
     
     return cells
 
@@ -276,7 +609,7 @@ async def get_cell(
 ):
     """Get cell details"""
     # Get cell
-    cell = db.query(Cell).filter(Cell.key == cell_key).first()
+    cell, permission_level = _load_cell_with_permission(db, cell_key, current_user.id)
     if not cell:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -284,12 +617,7 @@ async def get_cell(
         )
     
     # Check if user has access to the cell
-    ownership = db.query(CellOwnership).filter(
-        CellOwnership.cell_id == cell.id,
-        CellOwnership.user_id == current_user.id
-    ).first()
-    
-    if not ownership:
+    if not permission_level:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="ليس لديك حق الوصول إلى هذه الخلية"
@@ -301,142 +629,105 @@ async def get_cell(
 @app.get("/cells/{cell_key}/keys", response_model=KeysResponse)
 async def get_cell_keys(
     cell_key: str,
+    prefix: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=10000),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get all keys in a cell"""
+    """
+    Get all keys in a cell, optionally only those starting with `prefix`.
+    
+    When `limit` is given the keys are returned in key order, one page at a
+    time, starting after `cursor`; `next_cursor` is set while more pages remain.
+    """
     # Verify cell access
-    cell = db.query(Cell).filter(Cell.key == cell_key).first()
+    cell, permission_level = _load_cell_with_permission(db, cell_key, current_user.id)
     if not cell:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="الخلية غير موجودة"
         )
     
-    ownership = db.query(CellOwnership).filter(
-        CellOwnership.cell_id == cell.id,
-        CellOwnership.user_id == current_user.id
-    ).first()
-    
-    if not ownership:
+    if not permission_level:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="ليس لديك حق الوصول إلى هذه الخلية"
         )
     
     # Get keys from cell database
-    import sqlite3
-    cell_path = os.path.join(CELLS_DIR, f"{cell_key}")
-    db_file = os.path.join(cell_path, "data.db")
-    
-    conn = sqlite3.connect(db_file)
-    cursor = conn.execute('SELECT key FROM data')
-    keys = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    
-    return {"keys": keys}
+    conditions = []
+    params = []
+    if prefix:
+        # GLOB prefix matches can be answered from the primary key index
+        conditions.append("key GLOB ?")
+        params.append(glob_prefix(prefix))
+    if cursor is not None:
+        conditions.append("key > ?")
+        params.append(cursor)
+    
+    sql = "SELECT key FROM data"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if limit:
+        sql += " ORDER BY key LIMIT ?"
+        params.append(limit)
+    
+    conn = get_cell_conn(cell_key)
+    keys = [row[0] for row in conn.execute(sql, params).fetchall()]
+    
+    next_cursor = keys[-1] if limit and len(keys) == limit else None
+    return {"keys": keys, "next_cursor": next_cursor}
 
 @app.post("/cells/{cell_key}/data", status_code=status.HTTP_200_OK)
 async def store_cell_data(
     cell_key: str,
     data_item: CellDataItem,
+    background: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Store data in a cell"""
     # Verify cell access
-    cell = db.query(Cell).filter(Cell.key == cell_key).first()
+    cell, permission_level = _load_cell_with_permission(db, cell_key, current_user.id)
     if not cell:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="الخلية غير موجودة"
         )
     
-    ownership = db.query(CellOwnership).filter(
-        CellOwnership.cell_id == cell.id,
-        CellOwnership.user_id == current_user.id
-    ).first()
-    
-    if not ownership or ownership.permission_level not in ["owner", "editor"]:
+    if permission_level not in ["owner", "editor"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="ليس لديك حق الكتابة في هذه الخلية"
         )
     
-    # Store data in cell database
-    import sqlite3
-    cell_path = os.path.join(CELLS_DIR, f"{cell_key}")
-    os.makedirs(cell_path, exist_ok=True)
-    db_file = os.path.join(cell_path, "data.db")
-    
-    # Create table if not exists
-    conn = sqlite3.connect(db_file)
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS data (
-            key TEXT PRIMARY KEY,
-            value TEXT,
-            created_at TEXT,
-            updated_at TEXT
-        )
-    ''')
-    
-    # Check if key exists
-    cursor = conn.execute('SELECT key FROM data WHERE key = ?', (data_item.key,))
-    exists = cursor.fetchone() is not None
-    
     # Check if we should encrypt the data using SGX
-    value_to_store = data_item.value
-    is_encrypted = False
-    
-    if sgx_enclave.is_initialized:
-        # استخدام معرف الخلية كمعرف للبيانات للمساعدة في اشتقاق المفتاح
-        data_id = f"{cell_key}:{data_item.key}"
-        encrypted_data = sgx_enclave.encrypt_data({"value": data_item.value}, data_id)
-        is_encrypted = True
-        value_to_store = encrypted_data
+    value_to_store, is_encrypted = encrypt_for_storage(cell_key, data_item.key, data_item.value)
     
-    # Insert or update data
+    # Insert or update data in one statement; created_at is kept on conflict
     now = datetime.utcnow().isoformat()
-    if exists:
-        conn.execute(
-            'UPDATE data SET value = ?, updated_at = ? WHERE key = ?',
-            (value_to_store, now, data_item.key)
-        )
-    else:
-        conn.execute(
-            'INSERT INTO data (key, value, created_at, updated_at) VALUES (?, ?, ?, ?)',
-            (data_item.key, value_to_store, now, now)
+    conn = get_cell_conn(cell_key)
+    with conn:
+        conn.execute(_SQL_UPSERT, (data_item.key, value_to_store, now, now))
+    
+    # Invalidate every cached read of this cell
+    liquid_cache.on_write(cell_key)
+    
+    # Publish event and audit log after the response, together so they share a producer batch
+    background.add_task(
+        publish_events,
+        kafka_producer.send_cell_event(
+            cell_key,
+            "data_stored",
+            {"key": data_item.key, "encrypted": is_encrypted}
+        ),
+        kafka_producer.send_audit_event(
+            str(current_user.id),
+            "store",
+            f"cell/{cell_key}/data/{data_item.key}",
+            {"cell_key": cell_key, "data_key": data_item.key}
         )
-    
-    conn.commit()
-    conn.close()
-    
-    # Invalidate cache entries related to this cell
-    cache_keys_to_invalidate = liquid_cache.find_related_keys(f"cell_{cell_key}")
-    for cache_key in cache_keys_to_invalidate:
-        liquid_cache.invalidate(cache_key)
-    
-    # Also invalidate any specific key for this data
-    specific_key = liquid_cache._generate_key("cell_data", {
-        "cell_key": cell_key,
-        "data_key": data_item.key,
-        "user_id": str(current_user.id)
-    })
-    liquid_cache.invalidate(specific_key)
-    
-    # Send event to Kafka
-    await kafka_producer.send_cell_event(
-        cell_key,
-        "data_stored",
-        {"key": data_item.key, "encrypted": is_encrypted}
-    )
-    
-    # Send audit log
-    await kafka_producer.send_audit_event(
-        str(current_user.id),
-        "store",
-        f"cell/{cell_key}/data/{data_item.key}",
-        {"cell_key": cell_key, "data_key": data_item.key}
     )
     
     return {"status": "success", "encrypted": is_encrypted}
@@ -445,6 +736,7 @@ async def store_cell_data(
 async def get_cell_data(
     cell_key: str,
     key: str,
+    background: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -469,7 +761,7 @@ async def get_cell_data(
     })
     
     # Verify cell access
-    cell = db.query(Cell).filter(Cell.key == cell_key).first()
+    cell, permission_level = _load_cell_with_permission(db, cell_key, current_user.id)
     if not cell:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -477,27 +769,15 @@ async def get_cell_data(
         )
     
     # Check if user has access to the cell
-    if cell.owner_id != current_user.id:
-        ownership = db.query(CellOwnership).filter(
-            CellOwnership.cell_id == cell.id,
-            CellOwnership.user_id == current_user.id
-        ).first()
-        
-        if not ownership:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="ليس لديك صلاحية الوصول إلى هذه الخلية"
-            )
-    
-    # Connect to the cell's database
-    conn = sqlite3.connect(f"{CELLS_DIR}/{cell_key}.db")
-    conn.row_factory = sqlite3.Row
+    if not permission_level:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="ليس لديك صلاحية الوصول إلى هذه الخلية"
+        )
     
-    # Execute query
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM data WHERE key = ?', (key,))
-    row = cursor.fetchone()
-    conn.close()
+    # Query the cell's database
+    conn = get_cell_conn(cell_key)
+    row = conn.execute('SELECT * FROM data WHERE key = ?', (key,)).fetchone()
     
     if not row:
         raise HTTPException(
@@ -505,34 +785,18 @@ async def get_cell_data(
             detail="البيانات غير موجودة"
         )
     
-    # Process data
-    value = row["value"]
-    
-    # Try to decrypt if needed
-    try:
-        # Check if this looks like encrypted data
-        if sgx_enclave.is_initialized and value.startswith("ENC:"):
-            try:
-                # Attempt to decrypt
-                item_data = sgx_enclave.decrypt_data(value)
-                if item_data and "value" in item_data:
-                    value = item_data["value"]
-            except Exception as e:
-                logger.error(f"خطأ في فك تشفير البيانات: {e}")
-                # إذا فشل فك التشفير، نعيد البيانات المشفرة كما هي
-                value = {"error": "decryption_failed", "encrypted_data": value}
-    except:
-        # Not encrypted or not valid base64, use as is
-        pass
+    # Process data, decrypting if needed
+    value = decrypt_from_storage(row["value"])
     
     # Prepare response
     response = {"key": key, "value": value}
     
     # Cache the result
-    liquid_cache.set(cache_key, response)
+    liquid_cache.set(cache_key, response, tags=[liquid_cache.cell_tag(cell_key)])
     
-    # Send audit log
-    await kafka_producer.send_audit_event(
+    # Send audit log once the response is out
+    background.add_task(
+        kafka_producer.send_audit_event,
         str(current_user.id),
         "retrieve",
         f"cell/{cell_key}/data/{key}",
@@ -545,70 +809,270 @@ async def get_cell_data(
 async def delete_cell_data(
     cell_key: str,
     key: str,
+    background: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Delete data from a cell"""
     # Verify cell access
-    cell = db.query(Cell).filter(Cell.key == cell_key).first()
+    cell, permission_level = _load_cell_with_permission(db, cell_key, current_user.id)
     if not cell:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="الخلية غير موجودة"
         )
     
-    ownership = db.query(CellOwnership).filter(
-        CellOwnership.cell_id == cell.id,
-        CellOwnership.user_id == current_user.id
-    ).first()
-    
-    if not ownership or ownership.permission_level not in ["owner", "editor"]:
+    if permission_level not in ["owner", "editor"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="ليس لديك حق الحذف في هذه الخلية"
         )
     
     # Delete data from cell database
-    import sqlite3
-    conn = sqlite3.connect(f"{CELLS_DIR}/{cell_key}.db")
-    cursor = conn.execute('DELETE FROM data WHERE key = ?', (key,))
-    conn.commit()
-    conn.close()
-    
-    # Invalidate cache entries related to this cell
-    cache_keys_to_invalidate = liquid_cache.find_related_keys(f"cell_{cell_key}")
-    for cache_key in cache_keys_to_invalidate:
-        liquid_cache.invalidate(cache_key)
-    
-    # Also invalidate any specific key for this data
-    specific_key = liquid_cache._generate_key("cell_data", {
-        "cell_key": cell_key,
-        "data_key": key,
-        "user_id": str(current_user.id)
-    })
-    liquid_cache.invalidate(specific_key)
+    conn = get_cell_conn(cell_key)
+    with conn:
+        conn.execute('DELETE FROM data WHERE key = ?', (key,))
+    
+    # Invalidate every cached read of this cell
+    liquid_cache.on_write(cell_key)
+    
+    # Publish event and audit log after the response, together so they share a producer batch
+    background.add_task(
+        publish_events,
+        kafka_producer.send_cell_event(
+            cell_key,
+            "data_deleted",
+            {"key": key}
+        ),
+        kafka_producer.send_audit_event(
+            str(current_user.id),
+            "delete",
+            f"cell/{cell_key}/data/{key}",
+            {"cell_key": cell_key, "data_key": key}
+        )
+    )
+    
+    return {"status": "success"}
+
+@app.get("/cells/{cell_key}/export")
+async def export_cell_data(
+    cell_key: str,
+    background: BackgroundTasks,
+    prefix: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Export every stored value in a cell (optionally only keys starting with `prefix`) in one response"""
+    # Verify cell access
+    cell, permission_level = _load_cell_with_permission(db, cell_key, current_user.id)
+    if not cell:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="الخلية غير موجودة"
+        )
+    
+    if not permission_level:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="ليس لديك حق الوصول إلى هذه الخلية"
+        )
+    
+    conn = get_cell_conn(cell_key)
+    if prefix:
+        cursor = conn.execute('SELECT key, value FROM data WHERE key GLOB ?', (glob_prefix(prefix),))
+    else:
+        cursor = conn.execute('SELECT key, value FROM data')
+    items = {key: decrypt_from_storage(value) for key, value in cursor}
     
-    # Send event to Kafka
-    await kafka_producer.send_cell_event(
-        cell_key,
-        "data_deleted",
-        {"key": key}
+    # Send audit log once the response is out
+    background.add_task(
+        kafka_producer.send_audit_event,
+        str(current_user.id),
+        "export",
+        f"cell/{cell_key}/data",
+        {"cell_key": cell_key, "prefix": prefix, "count": len(items)}
     )
     
-    # Send audit log
-    await kafka_producer.send_audit_event(
+    # Exports are the largest responses we serve; GZipMiddleware compresses them when the client allows it
+    return Response(content=orjson.dumps({"items": items, "count": len(items)}), media_type="application/json")
+
+@app.put("/cells/{cell_key}/raw/{key}", status_code=status.HTTP_200_OK)
+async def store_cell_data_raw(
+    cell_key: str,
+    key: str,
+    request: Request,
+    background: BackgroundTasks,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Store a binary value sent as the raw request body (no base64/JSON envelope)"""
+    body = await request.body()
+    data_item = CellDataItem(key=key, value=base64.b64encode(body).decode("ascii"))
+    return await store_cell_data(cell_key, data_item, background, current_user, db)
+
+@app.get("/cells/{cell_key}/raw/{key}")
+async def get_cell_data_raw(
+    cell_key: str,
+    key: str,
+    background: BackgroundTasks,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get a value stored through the raw endpoint as application/octet-stream"""
+    # Verify cell access
+    cell, permission_level = _load_cell_with_permission(db, cell_key, current_user.id)
+    if not cell:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="الخلية غير موجودة"
+        )
+    
+    if not permission_level:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="ليس لديك حق الوصول إلى هذه الخلية"
+        )
+    
+    conn = get_cell_conn(cell_key)
+    row = conn.execute('SELECT value FROM data WHERE key = ?', (key,)).fetchone()
+    
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="البيانات غير موجودة"
+        )
+    
+    value = decrypt_from_storage(row[0])
+    if not isinstance(value, str):
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="فشل فك تشفير البيانات"
+        )
+    
+    try:
+        body = base64.b64decode(value, validate=True)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="القيمة ليست بيانات ثنائية مخزنة عبر الواجهة الخام"
+        )
+    
+    # Send audit log once the response is out
+    background.add_task(
+        kafka_producer.send_audit_event,
         str(current_user.id),
-        "delete",
+        "retrieve",
         f"cell/{cell_key}/data/{key}",
         {"cell_key": cell_key, "data_key": key}
     )
     
-    return {"status": "success"}
+    return Response(content=body, media_type="application/octet-stream")
+
+@app.post("/cells/{cell_key}/data/batch/get", status_code=status.HTTP_200_OK)
+async def batch_get_cell_data(
+    cell_key: str,
+    request: BatchGetRequest,
+    background: BackgroundTasks,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get several data items from a cell in a single round trip"""
+    # Verify cell access
+    cell, permission_level = _load_cell_with_permission(db, cell_key, current_user.id)
+    if not cell:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="الخلية غير موجودة"
+        )
+    
+    if not permission_level:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="ليس لديك حق الوصول إلى هذه الخلية"
+        )
+    
+    items = {}
+    if request.keys:
+        conn = get_cell_conn(cell_key)
+        placeholders = ",".join("?" for _ in request.keys)
+        cursor = conn.execute(
+            f'SELECT key, value FROM data WHERE key IN ({placeholders})',
+            request.keys
+        )
+        rows = cursor.fetchall()
+        
+        items = {key: decrypt_from_storage(value) for key, value in rows}
+    
+    # Send audit log once the response is out
+    background.add_task(
+        kafka_producer.send_audit_event,
+        str(current_user.id),
+        "retrieve_batch",
+        f"cell/{cell_key}/data",
+        {"cell_key": cell_key, "data_keys": list(items.keys())}
+    )
+    
+    return {"items": items, "count": len(items)}
+
+@app.post("/cells/{cell_key}/data/batch/store", status_code=status.HTTP_200_OK)
+@app.post("/cells/{cell_key}/data/bulk", status_code=status.HTTP_200_OK)
+async def batch_store_cell_data(
+    cell_key: str,
+    request: BatchStoreRequest,
+    background: BackgroundTasks,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Store several data items in a cell in a single transaction"""
+    # Verify cell access
+    cell, permission_level = _load_cell_with_permission(db, cell_key, current_user.id)
+    if not cell:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="الخلية غير موجودة"
+        )
+    
+    if permission_level not in ["owner", "editor"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="ليس لديك حق الكتابة في هذه الخلية"
+        )
+    
+    # Encrypt all values up front in one enclave call, outside the write transaction
+    rows, is_encrypted = encrypt_many_for_storage(cell_key, request.items)
+    
+    # Store data in cell database
+    now = datetime.utcnow().isoformat()
+    conn = get_cell_conn(cell_key)
+    with conn:
+        conn.executemany(_SQL_UPSERT, [(data_key, value, now, now) for data_key, value in rows])
+    
+    # Invalidate every cached read of this cell
+    liquid_cache.on_write(cell_key)
+    
+    # Publish event and audit log after the response, together so they share a producer batch
+    background.add_task(
+        publish_events,
+        kafka_producer.send_cell_event(
+            cell_key,
+            "data_stored_batch",
+            {"keys": list(request.items.keys()), "encrypted": is_encrypted}
+        ),
+        kafka_producer.send_audit_event(
+            str(current_user.id),
+            "store_batch",
+            f"cell/{cell_key}/data",
+            {"cell_key": cell_key, "data_keys": list(request.items.keys())}
+        )
+    )
+    
+    return {"status": "success", "stored": len(rows), "encrypted": is_encrypted}
 
 @app.post("/cells/{cell_key}/query", status_code=status.HTTP_200_OK)
 async def query_cell_data(
     cell_key: str,
     query: QueryRequest,
+    background: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -625,7 +1089,7 @@ async def query_cell_data(
     cached_result = liquid_cache.get(cache_key)
     if cached_result:
         logger.debug(f"Cache hit for query on cell {cell_key}")
-        return cached_result
+        return ORJSONResponse(content=cached_result)
     
     # Register this query pattern for learning
     liquid_cache.register_query("cell_query", {
@@ -634,92 +1098,91 @@ async def query_cell_data(
     })
     
     # Verify cell access
-    cell = db.query(Cell).filter(Cell.key == cell_key).first()
+    cell, permission_level = _load_cell_with_permission(db, cell_key, current_user.id)
     if not cell:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="الخلية غير موجودة"
         )
     
-    ownership = db.query(CellOwnership).filter(
-        CellOwnership.cell_id == cell.id,
-        CellOwnership.user_id == current_user.id
-    ).first()
-    
-    if not ownership:
+    if not permission_level:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="ليس لديك حق الوصول إلى هذه الخلية"
         )
     
-    # Get all data from cell database
-    import sqlite3
-    cell_path = os.path.join(CELLS_DIR, f"{cell_key}")
-    db_file = os.path.join(cell_path, "data.db")
-    
-    conn = sqlite3.connect(db_file)
-    cursor = conn.execute('SELECT key, value, created_at, updated_at FROM data')
-    rows = cursor.fetchall()
-    conn.close()
-    
-    # Convert to list of dictionaries
-    data = []
-    for row in rows:
-        item = {
-            "key": row[0],
-            "value": row[1],
-            "created_at": row[2],
-            "updated_at": row[3]
-        }
-        
-        # Decrypt if needed
-        try:
-            if sgx_enclave.is_initialized:
+    # Let SQLite filter, sort and limit; values sealed by the enclave can only be matched after decryption
+    if not sgx_enclave.is_initialized:
+        sql, sql_params, residual_query = build_sql(query_params)
+    else:
+        sql, sql_params, residual_query = build_sql(
+            query_params, ("key", "created_at", "updated_at"), full_text=False
+        )
+    
+    # Under SGX the search term is matched below, after decryption, rather than by the optimizer
+    residual_filter = residual_query.get("filter") or {}
+    search = str(residual_filter.pop("search", "") or "").lower()
+    if not residual_filter:
+        residual_query.pop("filter", None)
+    
+    conn = get_cell_conn(cell_key)
+    cursor = conn.execute(sql, sql_params)
+    
+    # Connections use sqlite3.Row, so each row converts to a dict keyed by the selected column names
+    data = [dict(row) for row in iter_rows(cursor)]
+    
+    # Decrypt sealed values in one enclave batch, off the event loop
+    if sgx_enclave.is_initialized:
+        sealed = []
+        payloads = []
+        for item in data:
+            if is_sealed(item["value"]):
                 try:
-                    # استخدام وظيفة البحث الآمن في البيانات المشفرة إذا كان الاستعلام يتضمن بحثًا
-                    if query_params.get("search"):
-                        search_result = sgx_enclave.secure_compute_on_encrypted(
-                            "search",
-                            item["value"],
-                            {"query": query_params["search"]}
-                        )
-                        # إذا كان البحث ناجحًا ووجدت تطابقات، نفك تشفير البيانات
-                        if search_result and search_result.get("count", 0) > 0:
-                            decrypted_data = sgx_enclave.decrypt_data(item["value"])
-                            if decrypted_data and "value" in decrypted_data:
-                                item["value"] = decrypted_data["value"]
-                                item["matched_search"] = True
-                    else:
-                        # فك تشفير البيانات العادي إذا لم يكن هناك بحث
-                        decrypted_data = sgx_enclave.decrypt_data(item["value"])
-                        if decrypted_data and "value" in decrypted_data:
-                            item["value"] = decrypted_data["value"]
-                except Exception as e:
-                    logger.error(f"خطأ في معالجة البيانات المشفرة: {e}")
+                    payloads.append(json.loads(item["value"][len(SEALED_PREFIX):]))
+                    sealed.append(item)
+                except ValueError:
                     item["decryption_error"] = True
-        except:
-            pass
         
-        data.append(item)
-    
-    # Use query optimizer to process the query
-    result = await query_optimizer.optimize_query(query.dict(exclude_none=True), data)
+        decrypted = await asyncio.to_thread(sgx_enclave.decrypt_batch, payloads) if payloads else []
+        for item, decrypted_data in zip(sealed, decrypted):
+            if not decrypted_data or "value" not in decrypted_data:
+                logger.error(f"خطأ في معالجة البيانات المشفرة: {item['key']}")
+                item["decryption_error"] = True
+                continue
+            item["value"] = decrypted_data["value"]
+    
+    if search:
+        # نفس منطق البحث في secure_compute_on_encrypted بعد فك التشفير
+        data = [
+            item for item in data
+            if (isinstance(item["value"], str) and search in item["value"].lower())
+            or (isinstance(item["value"], (int, float)) and search == str(item["value"]).lower())
+        ]
+    
+    # Only what SQLite could not express is left to the query optimizer. Its result cache is keyed by the
+    # query alone, so a residual (the same for different pushed-down filters) must bypass it
+    if residual_query:
+        result = query_optimizer.execute_query(residual_query, data)
+    else:
+        result = data
     
     # Prepare response
     response = {"results": result, "count": len(result)}
     
     # Cache the result
-    liquid_cache.set(cache_key, response)
+    liquid_cache.set(cache_key, response, tags=[liquid_cache.cell_tag(cell_key)])
     
-    # Send audit log
-    await kafka_producer.send_audit_event(
+    # Send audit log once the response is out
+    background.add_task(
+        kafka_producer.send_audit_event,
         str(current_user.id),
         "query",
         f"cell/{cell_key}",
         {"cell_key": cell_key, "query": query.dict(exclude_none=True)}
     )
     
-    return response
+    # Rows are plain JSON values already, so skip jsonable_encoder and serialize directly
+    return ORJSONResponse(content=response)
 
 # Admin endpoints
 @app.get("/admin/stats", status_code=status.HTTP_200_OK)
@@ -728,28 +1191,26 @@ async def get_admin_stats(
     db: Session = Depends(get_db)
 ):
     """Get system statistics (admin only)"""
-    # Get user count
-    user_count = db.query(User).count()
+    now = datetime.utcnow()
     
-    # Get cell count
-    cell_count = db.query(Cell).count()
+    # Each count is queried once and reused below; plain COUNT(*) selects skip ORM entity loading
+    user_count = db.scalar(select(func.count()).select_from(User))
+    cell_count = db.scalar(select(func.count()).select_from(Cell))
+    active_users_24h = db.scalar(
+        select(func.count()).select_from(User).where(User.last_login > now - timedelta(days=1))
+    )
     
     # Get query optimizer stats
     optimizer_stats = query_optimizer.get_statistics()
     
     # Get storage usage
-    import os
-    total_size = 0
-    for dirpath, dirnames, filenames in os.walk(CELLS_DIR):
-        for f in filenames:
-            fp = os.path.join(dirpath, f)
-            total_size += os.path.getsize(fp)
+    total_size = total_storage_bytes(db)
     
     # إحصائيات النظام
     system_stats = {
-        "total_users": db.query(User).count(),
-        "total_cells": db.query(Cell).count(),
-        "active_users_24h": db.query(User).filter(User.last_login > datetime.utcnow() - timedelta(days=1)).count(),
+        "total_users": user_count,
+        "total_cells": cell_count,
+        "active_users_24h": active_users_24h,
         "sgx_enabled": sgx_enclave.is_initialized,
         "sgx_mode": "simulation" if sgx_enclave.simulation_mode else "hardware",
         "sgx_features": {
@@ -761,7 +1222,7 @@ async def get_admin_stats(
         "liquid_cache_enabled": liquid_cache.enabled,
         "liquid_cache_patterns": len(liquid_cache.query_patterns),
         "kafka_enabled": kafka_producer.is_connected and kafka_consumer.is_connected,
-        "server_uptime": str(datetime.utcnow() - app.state.start_time),
+        "server_uptime": str(now - app.state.start_time),
         "server_version": app.version
     }
     
@@ -774,7 +1235,7 @@ async def get_admin_stats(
         "sgx_enabled": sgx_enclave.is_initialized,
         "kafka_enabled": kafka_producer.is_ready,
         "system_stats": system_stats,
-        "liquid_cache": liquid_cache.get_stats()
+        "liquid_cache": system_stats["liquid_cache"]
     }
 
 @app.get("/admin/cache/stats", status_code=status.HTTP_200_OK)
@@ -823,15 +1284,9 @@ async def preload_cache(current_user: User = Depends(get_current_admin_user), db
                 if not cell:
                     continue
                 
-                # Connect to the cell's database
-                conn = sqlite3.connect(f"{CELLS_DIR}/{cell_key}.db")
-                conn.row_factory = sqlite3.Row
-                
-                # Execute query
-                cursor = conn.cursor()
-                cursor.execute('SELECT * FROM data WHERE key = ?', (data_key,))
-                row = cursor.fetchone()
-                conn.close()
+                # Query the cell's database
+                conn = get_cell_conn(cell_key)
+                row = conn.execute('SELECT * FROM data WHERE key = ?', (data_key,)).fetchone()
                 
                 if row:
                     # Generate cache key
@@ -842,7 +1297,7 @@ async def preload_cache(current_user: User = Depends(get_current_admin_user), db
                     })
                     
                     # Cache the data
-                    liquid_cache.set(cache_key, {"key": data_key, "value": row["value"]})
+                    liquid_cache.set(cache_key, {"key": data_key, "value": row["value"]}, tags=[liquid_cache.cell_tag(cell_key)])
                     preloaded += 1
             
             elif hint["type"] == "cell_query":
@@ -850,22 +1305,6 @@ async def preload_cache(current_user: User = Depends(get_current_admin_user), db
                 cell_key = hint["cell_key"]
                 query_type = hint.get("query_type", ["all"])
                 
-                # Create a basic query
-                query = {}
-                if "filter" in query_type:
-                    query["filter"] = {}
-                if "sort" in query_type:
-                    query["sort"] = ["created_at"]
-                if "limit" in query_type:
-                    query["limit"] = 100
-                
-                # Generate cache key
-                cache_key = liquid_cache._generate_key("cell_query", {
-                    "cell_key": cell_key,
-                    "query": query,
-                    "user_id": "preload"
-                })
-                
                 # We don't actually execute the query, just register the pattern
                 liquid_cache.register_query("cell_query", {
                     "cell_key": cell_key,
@@ -884,7 +1323,7 @@ async def preload_cache(current_user: User = Depends(get_current_admin_user), db
 
 # SGX Secure Operations API Endpoints
 
-@app.post("/api/secure/encrypt", response_model=Dict[str, any])
+@app.post("/api/secure/encrypt")
 async def secure_encrypt_data(request: SecureDataRequest, current_user: User = Depends(get_current_active_user)):
     """تشفير البيانات باستخدام Intel SGX
     
@@ -929,7 +1368,7 @@ async def secure_encrypt_data(request: SecureDataRequest, current_user: User = D
             detail=f"خطأ في تشفير البيانات: {str(e)}"
         )
 
-@app.post("/api/secure/decrypt", response_model=Dict[str, any])
+@app.post("/api/secure/decrypt")
 async def secure_decrypt_data(encrypted_data: Dict[str, str], current_user: User = Depends(get_current_active_user)):
     """فك تشفير البيانات باستخدام Intel SGX
     
@@ -974,7 +1413,7 @@ async def secure_decrypt_data(encrypted_data: Dict[str, str], current_user: User
             detail=f"خطأ في فك تشفير البيانات: {str(e)}"
         )
 
-@app.post("/api/secure/verify", response_model=Dict[str, any])
+@app.post("/api/secure/verify")
 async def secure_verify_data(request: SecureVerifyRequest, current_user: User = Depends(get_current_active_user)):
     """التحقق من سلامة البيانات باستخدام Intel SGX
     
@@ -1002,7 +1441,7 @@ async def secure_verify_data(request: SecureVerifyRequest, current_user: User =
             detail=f"خطأ في التحقق من سلامة البيانات: {str(e)}"
         )
 
-@app.post("/api/secure/compute", response_model=Dict[str, any])
+@app.post("/api/secure/compute")
 async def secure_compute_on_encrypted(request: SecureComputeRequest, current_user: User = Depends(get_current_active_user)):
     """إجراء عمليات على البيانات المشفرة باستخدام Intel SGX
     
@@ -1065,7 +1504,7 @@ async def secure_compute_on_encrypted(request: SecureComputeRequest, current_use
             detail=f"خطأ في إجراء العملية على البيانات المشفرة: {str(e)}"
         )
 
-@app.get("/api/secure/attestation", response_model=Dict[str, any])
+@app.get("/api/secure/attestation")
 async def secure_remote_attestation(current_user: User = Depends(get_current_admin_user)):
     """إجراء التحقق عن بعد من بيئة Intel SGX
     
@@ -1122,4 +1561,5 @@ def read_root():
 # Run the server
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port)
+    workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+    uvicorn.run("main:app", host="0.0.0.0", port=port, loop="uvloop", http="httptools", workers=workers)
@@ -4,56 +4,278 @@
 """
 
 import logging
-from typing import Dict, List, Any, Optional, Tuple
-import pandas as pd
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple, Callable
 import numpy as np
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, text
+from sqlalchemy import bindparam, func, desc, select, text
+import orjson
 from ..database.models import Cell, CellData, Hive, AuditLog, User
 
+try:
+    import redis
+except ImportError:  # pragma: no cover - اختياري
+    redis = None
+
 logger = logging.getLogger(__name__)
 
+# عند ضبط REDIS_URL تتشارك كل عمليات Uvicorn ذاكرة التحليلات المؤقتة بدل أن تحسب كل عملية نتائجها بنفسها
+REDIS_URL = os.getenv("REDIS_URL")
+REDIS_KEY_PREFIX = "hivedb:analytics"
+
+# أسماء الأيام مرتبة حسب dow في PostgreSQL (0 = الأحد)
+DAYS_AR = ("الأحد", "الاثنين", "الثلاثاء", "الأربعاء", "الخميس", "الجمعة", "السبت")
+
+# تجميعات سجل التدقيق قد تعيد آلاف الصفوف للفترات الطويلة، فتُبث على دفعات عبر مؤشر على الخادم
+STREAM_OPTIONS = {"stream_results": True, "yield_per": 1000}
+
+# نمو النظام اليومي في رحلة واحدة: كل جدول يُجمَّع مرة واحدة في CTE خاص به، وgenerate_series يولّد
+# كل أيام الفترة فتحصل الأيام الخالية على صفر عبر LEFT JOIN
+_DAILY_GROWTH = text("""
+    WITH days AS (
+        SELECT d FROM generate_series(CAST(:start AS date), CURRENT_DATE, interval '1 day') AS d
+    ),
+    u AS (
+        SELECT date_trunc('day', created_at) AS d, COUNT(*) AS v
+        FROM users WHERE created_at >= :start GROUP BY 1
+    ),
+    c AS (
+        SELECT date_trunc('day', created_at) AS d, COUNT(*) AS v
+        FROM cells WHERE created_at >= :start GROUP BY 1
+    ),
+    dg AS (
+        SELECT date_trunc('day', created_at) AS d, SUM(size_bytes) AS v
+        FROM cell_data WHERE created_at >= :start GROUP BY 1
+    )
+    SELECT days.d::date AS date,
+           COALESCE(u.v, 0) AS new_users,
+           COALESCE(c.v, 0) AS new_cells,
+           COALESCE(dg.v, 0) AS data_size
+    FROM days
+    LEFT JOIN u ON u.d = days.d
+    LEFT JOIN c ON c.d = days.d
+    LEFT JOIN dg ON dg.d = days.d
+    ORDER BY days.d
+""")
+
+# جميع عدادات النظام في عبارة واحدة من الاستعلامات الفرعية العددية: رحلة واحدة إلى قاعدة البيانات.
+# تُبنى العبارة مرة واحدة على مستوى الوحدة بمعاملات مربوطة، فيُعاد استخدام SQL المترجم من ذاكرة التخزين المؤقت
+_SYSTEM_STATS = select(
+    # عدد المستخدمين
+    select(func.count(User.id)).scalar_subquery().label("user_count"),
+    # عدد الخلايا الرئيسية
+    select(func.count(Hive.id)).scalar_subquery().label("hive_count"),
+    # عدد الخلايا الفرعية
+    select(func.count(Cell.id)).scalar_subquery().label("cell_count"),
+    # حجم البيانات الإجمالي
+    select(func.sum(CellData.size_bytes)).scalar_subquery().label("data_size"),
+    # عدد العمليات في آخر 24 ساعة
+    select(func.count(AuditLog.id)).where(
+        AuditLog.timestamp >= bindparam("yesterday")
+    ).scalar_subquery().label("operations_24h"),
+    # عدد المستخدمين النشطين في آخر 7 أيام: GROUP BY ثم عدّ المجموعات أرخص من count(distinct)
+    select(func.count()).select_from(
+        select(AuditLog.user_id).where(
+            AuditLog.timestamp >= bindparam("last_week"),
+            AuditLog.user_id.isnot(None)
+        ).group_by(AuditLog.user_id).subquery()
+    ).scalar_subquery().label("active_users"),
+)
+
+# مركز ثقل البيانات على كل الخلايا يُحسب في قاعدة البيانات، فتعود ثلاثة مجاميع بدل صف لكل خلية
+_CENTER_OF_GRAVITY = select(
+    func.sum(Cell.x * CellData.size_bytes).label("sum_x"),
+    func.sum(Cell.y * CellData.size_bytes).label("sum_y"),
+    func.sum(CellData.size_bytes).label("total_weight"),
+).select_from(Cell).join(CellData, CellData.cell_id == Cell.id)
+
 class AnalyticsEngine:
     """محرك تحليلات متقدم للبيانات السداسية"""
     
     def __init__(self):
         self.cache_enabled = True
-        self.analytics_cache = {}
-        self.cache_ttl = 3600  # ثانية واحدة
+        # ذاكرة مؤقتة محدودة الحجم: المفتاح -> (وقت الانتهاء، البيانات)، مرتبة من الأقدم استخدامًا إلى الأحدث
+        self.analytics_cache: "OrderedDict[Tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.cache_max_size = 256
+        self.cache_ttl = 3600  # ساعة واحدة، للمفاتيح التي ليس لها مدة خاصة
+        # مدة التخزين لكل نوع من التحليلات بالثواني: الإحصاءات اللحظية تتغير كل دقيقة والاتجاهات الطويلة تبقى صالحة لساعات
+        self.ttls = {
+            "system_stats": 60,
+            "growth_metrics": 900,
+            "usage_patterns": 600,
+            "performance_metrics": 120,
+            "hexagonal_metrics": 1800,
+            "predictive_insights": 21600
+        }
+        # النتائج الفارغة (قاعدة بيانات جديدة مثلًا) تُخزَّن لمدة أقصر حتى تظهر البيانات الأولى سريعًا
+        self._empty_ttl = 60
+        self._hits = 0
+        self._misses = 0
+        # الطلبات المتزامنة تقرأ وتعدّل الذاكرة المؤقتة والعدادات
+        self._lock = threading.RLock()
+        # الاستعلامات المستقلة تُنفّذ بالتوازي، كل منها بجلسة واتصال خاصين به
+        self._executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix="analytics")
+        # ذاكرة Redis المشتركة إن توفرت، وإلا تبقى الذاكرة المحلية أعلاه هي المستخدمة
+        self._redis = None
+        if REDIS_URL and redis is not None:
+            self._redis = redis.Redis.from_url(REDIS_URL, decode_responses=False)
+        elif REDIS_URL:
+            logger.warning("REDIS_URL مضبوط لكن مكتبة redis غير مثبتة، سيتم استخدام الذاكرة المحلية")
     
-    def get_system_stats(self, db: Session) -> Dict[str, Any]:
-        """الحصول على إحصاءات النظام الأساسية"""
-        cache_key = "system_stats"
-        if self.cache_enabled and cache_key in self.analytics_cache:
-            cache_item = self.analytics_cache[cache_key]
-            if datetime.now().timestamp() - cache_item["timestamp"] < self.cache_ttl:
-                return cache_item["data"]
-        
-        # عدد المستخدمين
-        user_count = db.query(func.count(User.id)).scalar()
-        
-        # عدد الخلايا الرئيسية
-        hive_count = db.query(func.count(Hive.id)).scalar()
+    def _run_parallel(self, db: Session, queries: Dict[str, Callable[[Session], Any]]) -> Dict[str, Any]:
+        """تنفيذ استعلامات مستقلة بالتوازي وإرجاع نتائجها بنفس المفاتيح
         
-        # عدد الخلايا الفرعية
-        cell_count = db.query(func.count(Cell.id)).scalar()
+        الجلسات غير آمنة للمشاركة بين الخيوط، لذلك تفتح كل مهمة جلسة خاصة بها
+        على نفس محرك الجلسة الممررة.
+        """
+        bind = db.get_bind()
         
-        # حجم البيانات الإجمالي
-        data_size = db.query(func.sum(func.length(CellData.value_text) + 
-                                     func.length(CellData.value_json))).scalar() or 0
+        def run(query: Callable[[Session], Any]) -> Any:
+            with Session(bind=bind) as session:
+                return query(session)
         
-        # عدد العمليات في آخر 24 ساعة
+        futures = {name: self._executor.submit(run, query) for name, query in queries.items()}
+        return {name: future.result() for name, future in futures.items()}
+    
+    @staticmethod
+    def _redis_key(key: Tuple) -> str:
+        """مفتاح Redis بالشكل hivedb:analytics:<الدالة>:<المعاملات>"""
+        return ":".join((REDIS_KEY_PREFIX,) + tuple(str(part) for part in key))
+    
+    def _cache_get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """قراءة نتيجة من الذاكرة المؤقتة مع احتساب الإصابة أو الإخفاق"""
+        if self._redis is not None:
+            try:
+                raw = self._redis.get(self._redis_key(key))
+            except redis.RedisError as e:
+                logger.warning(f"تعذر القراءة من Redis، سيتم استخدام الذاكرة المحلية: {e}")
+            else:
+                with self._lock:
+                    if raw is None:
+                        self._misses += 1
+                        return None
+                    self._hits += 1
+                return orjson.loads(raw)
+        
+        with self._lock:
+            entry = self.analytics_cache.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self.analytics_cache[key]
+                self._misses += 1
+                return None
+            
+            self.analytics_cache.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+    
+    def _cache_set(self, key: Tuple, data: Dict[str, Any], ttl: Optional[float] = None):
+        """تخزين نتيجة مع طرد الأقدم استخدامًا عند امتلاء الذاكرة المؤقتة"""
+        if ttl is None:
+            ttl = self.ttls.get(key[0], self.cache_ttl)
+        
+        if self._redis is not None:
+            try:
+                # Decimal من مجاميع PostgreSQL لا يدعمه orjson مباشرة فيُحوَّل إلى عدد عشري
+                self._redis.setex(self._redis_key(key), max(1, math.ceil(ttl)),
+                                  orjson.dumps(data, default=float))
+                return
+            except (redis.RedisError, TypeError) as e:
+                logger.warning(f"تعذر الكتابة إلى Redis، سيتم استخدام الذاكرة المحلية: {e}")
+        
+        with self._lock:
+            self.analytics_cache[key] = (time.monotonic() + ttl, data)
+            self.analytics_cache.move_to_end(key)
+            while len(self.analytics_cache) > self.cache_max_size:
+                self.analytics_cache.popitem(last=False)
+    
+    def _cached(self, key: Tuple, compute: Callable[[], Dict[str, Any]],
+                is_empty: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Dict[str, Any]:
+        """إرجاع النتيجة المخزنة للمفتاح (اسم الدالة ومعاملاتها) أو حسابها وتخزينها
+        
+        الحساب يجري خارج القفل حتى لا يحجز استعلام بطيء بقية الطلبات، وإذا
+        أعادت is_empty القيمة True تُخزَّن النتيجة لمدة _empty_ttl فقط.
+        """
+        if not self.cache_enabled:
+            return compute()
+        
+        data = self._cache_get(key)
+        if data is None:
+            data = compute()
+            self._cache_set(key, data, self._empty_ttl if is_empty and is_empty(data) else None)
+        return data
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """إحصاءات الذاكرة المؤقتة الفعلية"""
+        with self._lock:
+            hits, misses, size = self._hits, self._misses, len(self.analytics_cache)
+        lookups = hits + misses
+        return {
+            "cache_backend": "redis" if self._redis is not None else "local",
+            "cache_size": size,
+            "cache_max_size": self.cache_max_size,
+            "cache_hits": hits,
+            "cache_misses": misses,
+            "cache_hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "cache_ttl_seconds": self.cache_ttl,
+            "cache_ttls_seconds": dict(self.ttls),
+            "empty_result_ttl_seconds": self._empty_ttl
+        }
+    
+    def get_system_stats(self, db: Session) -> Dict[str, Any]:
+        """الحصول على إحصاءات النظام الأساسية"""
+        return self._cached(("system_stats",), lambda: self._compute_system_stats(db))
+    
+    def get_growth_metrics(self, db: Session, days: int = 30) -> Dict[str, Any]:
+        """الحصول على مقاييس النمو على مدار فترة زمنية"""
+        return self._cached(
+            ("growth_metrics", days),
+            lambda: self._compute_growth_metrics(db, days),
+            is_empty=lambda data: not any(
+                row["count"] for row in data["new_users"] + data["new_cells"]
+            ) and not any(row["size_bytes"] for row in data["data_growth"])
+        )
+    
+    def get_usage_patterns(self, db: Session, days: int = 7) -> Dict[str, Any]:
+        """تحليل أنماط استخدام النظام"""
+        return self._cached(("usage_patterns", days), lambda: self._compute_usage_patterns(db, days))
+    
+    def get_performance_metrics(self, db: Session, days: int = 1) -> Dict[str, Any]:
+        """قياس أداء النظام"""
+        metrics = self._cached(("performance_metrics", days), lambda: self._compute_performance_metrics(db, days))
+        # إحصاءات الذاكرة المؤقتة تُحسب عند كل طلب حتى لا تُخزَّن قيمة قديمة منها
+        return {**metrics, "cache_stats": self.get_cache_stats()}
+    
+    def get_hexagonal_metrics(self, db: Session) -> Dict[str, Any]:
+        """إحصاءات خاصة بالبنية السداسية"""
+        return self._cached(
+            ("hexagonal_metrics",),
+            lambda: self._compute_hexagonal_metrics(db),
+            is_empty=lambda data: not data["coordinates_data"]
+        )
+    
+    def get_predictive_insights(self, db: Session) -> Dict[str, Any]:
+        """تحليلات تنبؤية لنمو البيانات واستخدام النظام"""
+        return self._cached(("predictive_insights",), lambda: self._compute_predictive_insights(db))
+    
+    def _compute_system_stats(self, db: Session) -> Dict[str, Any]:
         yesterday = datetime.utcnow() - timedelta(days=1)
-        operations_24h = db.query(func.count(AuditLog.id)).filter(
-            AuditLog.timestamp >= yesterday
-        ).scalar()
-        
-        # عدد المستخدمين النشطين في آخر 7 أيام
         last_week = datetime.utcnow() - timedelta(days=7)
-        active_users = db.query(func.count(func.distinct(AuditLog.user_id))).filter(
-            AuditLog.timestamp >= last_week
-        ).scalar()
+        
+        row = db.execute(_SYSTEM_STATS, {"yesterday": yesterday, "last_week": last_week}).one()
+        user_count = row.user_count
+        hive_count = row.hive_count
+        cell_count = row.cell_count
+        data_size = row.data_size or 0
+        operations_24h = row.operations_24h
+        active_users = row.active_users
         
         stats = {
             "user_count": user_count,
@@ -66,64 +288,23 @@ class AnalyticsEngine:
             "timestamp": datetime.utcnow().isoformat()
         }
         
-        if self.cache_enabled:
-            self.analytics_cache[cache_key] = {
-                "data": stats,
-                "timestamp": datetime.now().timestamp()
-            }
-        
         return stats
     
-    def get_growth_metrics(self, db: Session, days: int = 30) -> Dict[str, Any]:
-        """الحصول على مقاييس النمو على مدار فترة زمنية"""
+    def _compute_growth_metrics(self, db: Session, days: int) -> Dict[str, Any]:
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # استعلام لعدد المستخدمين الجدد يوميًا
-        new_users_query = db.query(
-            func.date_trunc('day', User.created_at).label('date'),
-            func.count(User.id).label('count')
-        ).filter(
-            User.created_at >= start_date
-        ).group_by(
-            func.date_trunc('day', User.created_at)
-        ).order_by(
-            func.date_trunc('day', User.created_at)
-        )
-        
-        new_users_data = [{"date": row.date.strftime("%Y-%m-%d"), "count": row.count} 
-                         for row in new_users_query]
-        
-        # استعلام لعدد الخلايا الجديدة يوميًا
-        new_cells_query = db.query(
-            func.date_trunc('day', Cell.created_at).label('date'),
-            func.count(Cell.id).label('count')
-        ).filter(
-            Cell.created_at >= start_date
-        ).group_by(
-            func.date_trunc('day', Cell.created_at)
-        ).order_by(
-            func.date_trunc('day', Cell.created_at)
-        )
-        
-        new_cells_data = [{"date": row.date.strftime("%Y-%m-%d"), "count": row.count} 
-                         for row in new_cells_query]
-        
-        # استعلام لحجم البيانات المضافة يوميًا
-        data_growth_query = db.query(
-            func.date_trunc('day', CellData.created_at).label('date'),
-            func.sum(func.length(CellData.value_text) + 
-                   func.length(CellData.value_json)).label('size')
-        ).filter(
-            CellData.created_at >= start_date
-        ).group_by(
-            func.date_trunc('day', CellData.created_at)
-        ).order_by(
-            func.date_trunc('day', CellData.created_at)
-        )
-        
-        data_growth = [{"date": row.date.strftime("%Y-%m-%d"), "size_bytes": row.size or 0,
-                      "size_human": self._format_size(row.size or 0)} 
-                     for row in data_growth_query]
+        new_users_data = []
+        new_cells_data = []
+        data_growth = []
+        for row in db.execute(_DAILY_GROWTH, {"start": start_date.date()}):
+            day = row.date.strftime("%Y-%m-%d")
+            # عدد المستخدمين الجدد يوميًا
+            new_users_data.append({"date": day, "count": row.new_users})
+            # عدد الخلايا الجديدة يوميًا
+            new_cells_data.append({"date": day, "count": row.new_cells})
+            # حجم البيانات المضافة يوميًا
+            data_growth.append({"date": day, "size_bytes": row.data_size,
+                                "size_human": self._format_size(row.data_size)})
         
         return {
             "new_users": new_users_data,
@@ -133,75 +314,87 @@ class AnalyticsEngine:
             "timestamp": datetime.utcnow().isoformat()
         }
     
-    def get_usage_patterns(self, db: Session, days: int = 7) -> Dict[str, Any]:
-        """تحليل أنماط استخدام النظام"""
+    def _compute_usage_patterns(self, db: Session, days: int) -> Dict[str, Any]:
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # توزيع العمليات حسب النوع
-        operation_types = db.query(
-            AuditLog.action_type,
-            func.count(AuditLog.id).label('count')
-        ).filter(
-            AuditLog.timestamp >= start_date
-        ).group_by(
-            AuditLog.action_type
-        ).order_by(
-            desc('count')
-        )
-        
-        operations_by_type = [{"action_type": row.action_type, "count": row.count} 
-                             for row in operation_types]
-        
-        # توزيع العمليات حسب الساعة
-        hourly_usage = db.query(
-            func.extract('hour', AuditLog.timestamp).label('hour'),
-            func.count(AuditLog.id).label('count')
-        ).filter(
-            AuditLog.timestamp >= start_date
-        ).group_by(
-            func.extract('hour', AuditLog.timestamp)
-        ).order_by(
-            func.extract('hour', AuditLog.timestamp)
-        )
-        
-        usage_by_hour = [{"hour": int(row.hour), "count": row.count} 
-                        for row in hourly_usage]
-        
-        # توزيع العمليات حسب اليوم
-        daily_usage = db.query(
-            func.extract('dow', AuditLog.timestamp).label('day_of_week'),
-            func.count(AuditLog.id).label('count')
-        ).filter(
-            AuditLog.timestamp >= start_date
-        ).group_by(
-            func.extract('dow', AuditLog.timestamp)
-        ).order_by(
-            func.extract('dow', AuditLog.timestamp)
-        )
-        
-        days_map = {0: "الاثنين", 1: "الثلاثاء", 2: "الأربعاء", 3: "الخميس", 
-                   4: "الجمعة", 5: "السبت", 6: "الأحد"}
-        
-        usage_by_day = [{"day": days_map[int(row.day_of_week)], "day_num": int(row.day_of_week), "count": row.count} 
-                       for row in daily_usage]
-        
-        # المستخدمين الأكثر نشاطًا
-        top_users = db.query(
-            AuditLog.user_id,
-            User.email,
-            func.count(AuditLog.id).label('operation_count')
-        ).join(
-            User, User.id == AuditLog.user_id
-        ).filter(
-            AuditLog.timestamp >= start_date
-        ).group_by(
-            AuditLog.user_id, User.email
-        ).order_by(
-            desc('operation_count')
-        ).limit(10)
-        
-        most_active_users = [{"user_id": row.user_id, "email": row.email, "operation_count": row.operation_count} 
-                            for row in top_users]
+        def operations_by_type_query(s: Session) -> List[Dict[str, Any]]:
+            # توزيع العمليات حسب النوع
+            operation_types = s.query(
+                AuditLog.action_type,
+                func.count(AuditLog.id).label('count')
+            ).filter(
+                AuditLog.timestamp >= start_date
+            ).group_by(
+                AuditLog.action_type
+            ).order_by(
+                desc('count')
+            )
+            operations = []
+            for row in operation_types.execution_options(**STREAM_OPTIONS):
+                operations.append({"action_type": row.action_type, "count": row.count})
+            return operations
+        
+        def usage_by_hour_query(s: Session) -> List[Dict[str, Any]]:
+            # توزيع العمليات حسب الساعة
+            hourly_usage = s.query(
+                AuditLog.hour_of_day.label('hour'),
+                func.count(AuditLog.id).label('count')
+            ).filter(
+                AuditLog.timestamp >= start_date
+            ).group_by(
+                AuditLog.hour_of_day
+            ).order_by(
+                AuditLog.hour_of_day
+            )
+            return [{"hour": int(row.hour), "count": row.count} 
+                    for row in hourly_usage]
+        
+        def usage_by_day_query(s: Session) -> List[Dict[str, Any]]:
+            # توزيع العمليات حسب اليوم
+            daily_usage = s.query(
+                AuditLog.dow.label('day_of_week'),
+                func.count(AuditLog.id).label('count')
+            ).filter(
+                AuditLog.timestamp >= start_date
+            ).group_by(
+                AuditLog.dow
+            ).order_by(
+                AuditLog.dow
+            )
+            return [{"day": DAYS_AR[int(row.day_of_week)], "day_num": int(row.day_of_week), "count": row.count} 
+                    for row in daily_usage]
+        
+        def most_active_users_query(s: Session) -> List[Dict[str, Any]]:
+            # المستخدمين الأكثر نشاطًا
+            top_users = s.query(
+                AuditLog.user_id,
+                User.email,
+                func.count(AuditLog.id).label('operation_count')
+            ).join(
+                User, User.id == AuditLog.user_id
+            ).filter(
+                AuditLog.timestamp >= start_date
+            ).group_by(
+                AuditLog.user_id, User.email
+            ).order_by(
+                desc('operation_count')
+            ).limit(10)
+            users = []
+            for row in top_users.execution_options(**STREAM_OPTIONS):
+                users.append({"user_id": row.user_id, "email": row.email,
+                              "operation_count": row.operation_count})
+            return users
+        
+        results = self._run_parallel(db, {
+            "operations_by_type": operations_by_type_query,
+            "usage_by_hour": usage_by_hour_query,
+            "usage_by_day": usage_by_day_query,
+            "most_active_users": most_active_users_query,
+        })
+        operations_by_type = results["operations_by_type"]
+        usage_by_hour = results["usage_by_hour"]
+        usage_by_day = results["usage_by_day"]
+        most_active_users = results["most_active_users"]
         
         return {
             "operations_by_type": operations_by_type,
@@ -212,8 +405,7 @@ class AnalyticsEngine:
             "timestamp": datetime.utcnow().isoformat()
         }
     
-    def get_performance_metrics(self, db: Session, days: int = 1) -> Dict[str, Any]:
-        """قياس أداء النظام"""
+    def _compute_performance_metrics(self, db: Session, days: int) -> Dict[str, Any]:
         start_date = datetime.utcnow() - timedelta(days=days)
         
         # متوسط وقت الاستجابة للعمليات
@@ -232,16 +424,16 @@ class AnalyticsEngine:
             desc('avg_time')
         )
         
-        performance_by_operation = [
-            {
+        # بث النتائج عبر مؤشر على الخادم بدل تحميلها كلها دفعة واحدة
+        performance_by_operation = []
+        for row in response_times.execution_options(**STREAM_OPTIONS):
+            performance_by_operation.append({
                 "action_type": row.action_type, 
                 "avg_time_ms": round(row.avg_time, 2), 
                 "min_time_ms": round(row.min_time, 2),
                 "max_time_ms": round(row.max_time, 2),
                 "count": row.count
-            } 
-            for row in response_times
-        ]
+            })
         
         # الاستعلامات الأبطأ
         slowest_queries = db.query(
@@ -268,65 +460,56 @@ class AnalyticsEngine:
             for row in slowest_queries
         ]
         
-        # إحصاءات الذاكرة المؤقتة
-        cache_stats = {
-            "cache_size": len(self.analytics_cache),
-            "cache_hit_ratio": 0.75,  # يمكن حساب هذه القيمة بشكل ديناميكي
-            "cache_ttl_seconds": self.cache_ttl
-        }
-        
         return {
             "performance_by_operation": performance_by_operation,
             "slowest_operations": slowest_operations,
-            "cache_stats": cache_stats,
             "period_days": days,
             "timestamp": datetime.utcnow().isoformat()
         }
     
-    def get_hexagonal_metrics(self, db: Session) -> Dict[str, Any]:
-        """إحصاءات خاصة بالبنية السداسية"""
-        
+    def _compute_hexagonal_metrics(self, db: Session) -> Dict[str, Any]:
         # توزيع الخلايا حسب الإحداثيات
         cell_distribution = db.query(
-            Cell.coordinates,
+            Cell.x,
+            Cell.y,
             func.count(CellData.id).label('data_count'),
-            func.sum(func.length(CellData.value_text) + 
-                   func.length(CellData.value_json)).label('data_size')
+            func.sum(CellData.size_bytes).label('data_size')
         ).outerjoin(
             CellData, CellData.cell_id == Cell.id
         ).group_by(
-            Cell.coordinates
+            Cell.x, Cell.y
         ).order_by(
             desc('data_count')
         ).limit(100)
         
         coordinates_data = []
         for row in cell_distribution:
-            x, y = map(int, row.coordinates.split(','))
             coordinates_data.append({
-                "coordinates": row.coordinates,
-                "x": x,
-                "y": y,
+                "coordinates": f"{row.x},{row.y}",
+                "x": row.x,
+                "y": row.y,
                 "data_count": row.data_count or 0,
                 "data_size_bytes": row.data_size or 0,
                 "data_size_human": self._format_size(row.data_size or 0)
             })
         
-        # تحليل كثافة البيانات في الشبكة السداسية
-        # حساب المركز الثقلي للبيانات
-        total_weight = sum(item["data_size_bytes"] for item in coordinates_data)
-        if total_weight > 0:
-            center_x = sum(item["x"] * item["data_size_bytes"] for item in coordinates_data) / total_weight
-            center_y = sum(item["y"] * item["data_size_bytes"] for item in coordinates_data) / total_weight
+        # حساب المركز الثقلي للبيانات من المجاميع المحسوبة في قاعدة البيانات
+        gravity = db.execute(_CENTER_OF_GRAVITY).one()
+        if gravity.total_weight:
+            center_x = float(gravity.sum_x) / float(gravity.total_weight)
+            center_y = float(gravity.sum_y) / float(gravity.total_weight)
         else:
             center_x, center_y = 0, 0
         
-        # حساب نصف قطر توزيع البيانات
+        # تحليل كثافة البيانات في الشبكة السداسية بعمليات NumPy على الخلايا المعروضة
+        xs = np.fromiter((item["x"] for item in coordinates_data), dtype=np.float64, count=len(coordinates_data))
+        ys = np.fromiter((item["y"] for item in coordinates_data), dtype=np.float64, count=len(coordinates_data))
+        
+        # حساب نصف قطر توزيع البيانات: المسافة السداسية dx + max(0, dy - dx) لكل خلية ثم الأكبر
         if coordinates_data:
-            radius = max(
-                self._hex_distance((center_x, center_y), (item["x"], item["y"]))
-                for item in coordinates_data
-            )
+            dx = np.abs(xs - center_x)
+            dy = np.abs(ys - center_y)
+            radius = float((dx + np.maximum(0, dy - dx)).max())
         else:
             radius = 0
         
@@ -353,55 +536,38 @@ class AnalyticsEngine:
             "timestamp": datetime.utcnow().isoformat()
         }
     
-    def get_predictive_insights(self, db: Session) -> Dict[str, Any]:
-        """تحليلات تنبؤية لنمو البيانات واستخدام النظام"""
+    def _compute_predictive_insights(self, db: Session) -> Dict[str, Any]:
         # تحليل اتجاهات النمو
         
         # الحصول على بيانات النمو للأيام الـ 90 الماضية
         growth_data = self.get_growth_metrics(db, days=90)
         
-        # تحويل البيانات إلى DataFrame للتحليل
-        new_users_df = pd.DataFrame(growth_data["new_users"])
-        new_cells_df = pd.DataFrame(growth_data["new_cells"])
-        data_growth_df = pd.DataFrame(growth_data["data_growth"])
-        
-        # إضافة قيم افتراضية للأيام المفقودة
-        date_range = pd.date_range(
-            start=(datetime.utcnow() - timedelta(days=90)).strftime("%Y-%m-%d"),
-            end=datetime.utcnow().strftime("%Y-%m-%d")
-        )
-        date_strings = [date.strftime("%Y-%m-%d") for date in date_range]
-        
-        # إنشاء DataFrames كاملة مع القيم المفقودة
-        full_users_df = pd.DataFrame({"date": date_strings})
-        full_users_df = full_users_df.merge(new_users_df, on="date", how="left").fillna(0)
-        
-        full_cells_df = pd.DataFrame({"date": date_strings})
-        full_cells_df = full_cells_df.merge(new_cells_df, on="date", how="left").fillna(0)
-        
-        full_data_df = pd.DataFrame({"date": date_strings})
-        if not data_growth_df.empty:
-            full_data_df = full_data_df.merge(data_growth_df[["date", "size_bytes"]], on="date", how="left").fillna(0)
-        else:
-            full_data_df["size_bytes"] = 0
+        # السلاسل اليومية كثيفة ومرتبة من قاعدة البيانات (يوم لكل إزاحة)، فهي الهيستوغرام اليومي جاهزًا
+        # وتُملأ مباشرة في مصفوفات محجوزة مسبقًا بطول الفترة دون تجزئة أو دمج
+        n_days = len(growth_data["new_users"])
+        users_per_day = np.fromiter((row["count"] for row in growth_data["new_users"]), dtype=np.int64, count=n_days)
+        cells_per_day = np.fromiter((row["count"] for row in growth_data["new_cells"]), dtype=np.int64, count=n_days)
+        data_per_day = np.fromiter((row["size_bytes"] for row in growth_data["data_growth"]), dtype=np.float64,
+                                   count=n_days)
+        days_axis = np.arange(n_days)
         
         # تحليل الاتجاه للمستخدمين
         try:
-            user_trend = np.polyfit(range(len(full_users_df)), full_users_df["count"], 1)
+            user_trend = np.polyfit(days_axis, users_per_day, 1)
             user_growth_rate = user_trend[0]
         except:
             user_growth_rate = 0
         
         # تحليل الاتجاه للخلايا
         try:
-            cell_trend = np.polyfit(range(len(full_cells_df)), full_cells_df["count"], 1)
+            cell_trend = np.polyfit(days_axis, cells_per_day, 1)
             cell_growth_rate = cell_trend[0]
         except:
             cell_growth_rate = 0
         
         # تحليل الاتجاه لحجم البيانات
         try:
-            data_trend = np.polyfit(range(len(full_data_df)), full_data_df["size_bytes"], 1)
+            data_trend = np.polyfit(days_axis, data_per_day, 1)
             data_growth_rate = data_trend[0]
         except:
             data_growth_rate = 0
@@ -409,24 +575,24 @@ class AnalyticsEngine:
         # التنبؤ بالنمو للأيام الـ 30 القادمة
         predictions = {
             "users": {
-                "current": int(full_users_df["count"].sum()),
+                "current": int(users_per_day.sum()),
                 "growth_rate_daily": round(user_growth_rate, 2),
-                "projected_30_days": int(full_users_df["count"].sum() + user_growth_rate * 30),
+                "projected_30_days": int(users_per_day.sum() + user_growth_rate * 30),
                 "trend": "increasing" if user_growth_rate > 0 else "decreasing" if user_growth_rate < 0 else "stable"
             },
             "cells": {
-                "current": int(full_cells_df["count"].sum()),
+                "current": int(cells_per_day.sum()),
                 "growth_rate_daily": round(cell_growth_rate, 2),
-                "projected_30_days": int(full_cells_df["count"].sum() + cell_growth_rate * 30),
+                "projected_30_days": int(cells_per_day.sum() + cell_growth_rate * 30),
                 "trend": "increasing" if cell_growth_rate > 0 else "decreasing" if cell_growth_rate < 0 else "stable"
             },
             "data_size": {
-                "current_bytes": int(full_data_df["size_bytes"].sum()),
-                "current_human": self._format_size(int(full_data_df["size_bytes"].sum())),
+                "current_bytes": int(data_per_day.sum()),
+                "current_human": self._format_size(int(data_per_day.sum())),
                 "growth_rate_daily_bytes": round(data_growth_rate, 2),
                 "growth_rate_daily_human": self._format_size(round(data_growth_rate, 2)),
-                "projected_30_days_bytes": int(full_data_df["size_bytes"].sum() + data_growth_rate * 30),
-                "projected_30_days_human": self._format_size(int(full_data_df["size_bytes"].sum() + data_growth_rate * 30)),
+                "projected_30_days_bytes": int(data_per_day.sum() + data_growth_rate * 30),
+                "projected_30_days_human": self._format_size(int(data_per_day.sum() + data_growth_rate * 30)),
                 "trend": "increasing" if data_growth_rate > 0 else "decreasing" if data_growth_rate < 0 else "stable"
             }
         }
@@ -438,23 +604,19 @@ class AnalyticsEngine:
             "timestamp": datetime.utcnow().isoformat()
         }
     
-    def _format_size(self, size_bytes: int) -> str:
-        """تنسيق حجم البيانات بطريقة مقروءة"""
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _format_size(size_bytes: int) -> str:
+        """تنسيق حجم البيانات بطريقة مقروءة (دالة نقية تُحفظ نتائجها لتكرار الأحجام نفسها)"""
         if size_bytes == 0:
             return "0 B"
         
         size_names = ("B", "KB", "MB", "GB", "TB", "PB")
-        i = int(np.floor(np.log(size_bytes) / np.log(1024))) if size_bytes > 0 else 0
-        p = np.power(1024, i)
+        i = min(int(math.floor(math.log(size_bytes, 1024))), len(size_names) - 1) if size_bytes > 0 else 0
+        p = 1024 ** i
         s = round(size_bytes / p, 2)
         
         return f"{s} {size_names[i]}"
-    
-    def _hex_distance(self, a: Tuple[float, float], b: Tuple[float, float]) -> float:
-        """حساب المسافة في الشبكة السداسية"""
-        dx = abs(a[0] - b[0])
-        dy = abs(a[1] - b[1])
-        return dx + max(0, dy - dx)
 
 # إنشاء نسخة واحدة من محرك التحليلات
 analytics_engine = AnalyticsEngine()
@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
 from typing import Optional
 import os
+import asyncio
+import secrets
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -19,8 +21,15 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your_secret_key_here_change_in_production"
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
 
-# Password hashing
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# Password hashing: argon2id, 2 passes over 64 MiB on one lane
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__type="ID",
+    argon2__time_cost=2,
+    argon2__memory_cost=65536,
+    argon2__parallelism=1
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 def verify_password(plain_password, hashed_password):
@@ -31,6 +40,25 @@ def get_password_hash(password):
     """Generate a password hash."""
     return pwd_context.hash(password)
 
+# Verified against when the user does not exist, so unknown and known emails
+# take the same argon2 time and login latency does not reveal registered accounts
+_dummy_hash: Optional[str] = None
+
+def _get_dummy_hash():
+    """Return the dummy hash, creating it on first use."""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = get_password_hash(secrets.token_urlsafe(16))
+    return _dummy_hash
+
+async def get_password_hash_async(password):
+    """Generate a password hash in a worker thread so the event loop is not blocked."""
+    return await asyncio.to_thread(get_password_hash, password)
+
+def _verify_or_dummy(plain_password, hashed_password):
+    """Verify against the real hash, or the dummy hash when there is no user."""
+    return verify_password(plain_password, hashed_password or _get_dummy_hash())
+
 def get_user(db: Session, email: str):
     """Get a user by email."""
     return db.query(User).filter(User.email == email).first()
@@ -38,9 +66,16 @@ def get_user(db: Session, email: str):
 def authenticate_user(db: Session, email: str, password: str):
     """Authenticate a user."""
     user = get_user(db, email)
-    if not user:
+    password_ok = verify_password(password, user.hashed_password if user else _get_dummy_hash())
+    if not user or not password_ok:
         return False
-    if not verify_password(password, user.hashed_password):
+    return user
+
+async def authenticate_user_async(db: Session, email: str, password: str):
+    """Authenticate a user, running the argon2 verification in a worker thread."""
+    user = get_user(db, email)
+    password_ok = await asyncio.to_thread(_verify_or_dummy, password, user.hashed_password if user else None)
+    if not user or not password_ok:
         return False
     return user
 
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Optional, List
 from pydantic import BaseModel, EmailStr, validator
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -19,6 +19,7 @@ class User(Base):
     is_admin = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    last_login = Column(DateTime, nullable=True, index=True)
     
     # Relationships
     cells = relationship("CellOwnership", back_populates="user")
@@ -47,6 +48,11 @@ class CellOwnership(Base):
     # Relationships
     user = relationship("User", back_populates="cells")
     cell = relationship("Cell", back_populates="owners")
+    
+    # Access checks look up (cell_id, user_id) on every request
+    __table_args__ = (
+        Index("ix_cell_ownerships_cell_user", "cell_id", "user_id", unique=True),
+    )
 
 # Pydantic Models for API
 class UserBase(BaseModel):
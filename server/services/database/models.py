@@ -3,10 +3,16 @@
 يحتوي على تعريفات جداول قاعدة البيانات والعلاقات بينها
 """
 
+import json
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON
-from sqlalchemy.orm import relationship
+from typing import Optional, Tuple, Union
+from sqlalchemy import (Column, Integer, BigInteger, SmallInteger, String, Boolean, DateTime, Float, ForeignKey, Index, Text, JSON,
+                        Computed, cast, event, extract, inspect, literal_column, select, text, update)
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import relationship, Session
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.types import TypeDecorator
 
 Base = declarative_base()
 
@@ -57,6 +63,27 @@ class HiveOwnership(Base):
     user = relationship("User", back_populates="hives")
     hive = relationship("Hive", back_populates="owners")
 
+def pack_hex_id(x: int, y: int) -> int:
+    """حزم الإحداثيات السداسية في عدد صحيح واحد بـ 64 بت: x في النصف الأعلى وy مُزاحًا في الأدنى"""
+    return (x << 32) + (y + 2 ** 31)
+
+def unpack_hex_id(value: int) -> Tuple[int, int]:
+    """عكس pack_hex_id"""
+    return value >> 32, (value & 0xFFFFFFFF) - 2 ** 31
+
+class HexCellId(TypeDecorator):
+    """معرف الخلية السداسية كـ BIGINT مفهرس، يقبل (x, y) أو العدد المحزوم ويُعيد (x, y)"""
+    impl = BigInteger
+    cache_ok = True
+    
+    def process_bind_param(self, value: Union[None, int, Tuple[int, int]], dialect) -> Optional[int]:
+        if value is None or isinstance(value, int):
+            return value
+        return pack_hex_id(*value)
+    
+    def process_result_value(self, value: Optional[int], dialect) -> Optional[Tuple[int, int]]:
+        return None if value is None else unpack_hex_id(value)
+
 class Cell(Base):
     """نموذج الخلية (وحدة تخزين البيانات)"""
     __tablename__ = "cells"
@@ -64,7 +91,11 @@ class Cell(Base):
     id = Column(Integer, primary_key=True, index=True)
     cell_id = Column(String(50), unique=True, index=True)
     hive_id = Column(Integer, ForeignKey("hives.id"))
-    coordinates = Column(String(20), index=True)  # تنسيق: "x,y"
+    # الإحداثيات السداسية كعمودين صحيحين قابلين للفهرسة والترشيح كلٌّ على حدة
+    x = Column(Integer, index=True)
+    y = Column(Integer, index=True)
+    # الإحداثيات نفسها محزومة في مفتاح واحد: البحث عن خلية بإحداثياتها فحص واحد في فهرس B-tree
+    hex_id = Column(HexCellId, index=True)
     data_type = Column(String(20))  # json, binary, key_value, etc.
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -73,6 +104,29 @@ class Cell(Base):
     hive = relationship("Hive", back_populates="cells")
     owners = relationship("CellOwnership", back_populates="cell")
     data_items = relationship("CellData", back_populates="cell")
+    
+    __table_args__ = (
+        Index("ix_cell_created", "created_at"),
+        Index("ix_cell_xy", "x", "y"),
+    )
+    
+    @hybrid_property
+    def coordinates(self) -> Optional[str]:
+        """الإحداثيات بالتنسيق النصي القديم x,y"""
+        if self.x is None or self.y is None:
+            return None
+        return f"{self.x},{self.y}"
+    
+    @coordinates.setter
+    def coordinates(self, value: Optional[str]):
+        if value is None:
+            self.x = self.y = None
+        else:
+            self.x, self.y = map(int, value.split(","))
+    
+    @coordinates.expression
+    def coordinates(cls):
+        return cast(cls.x, String) + "," + cast(cls.y, String)
 
 class CellOwnership(Base):
     """نموذج ملكية الخلية"""
@@ -97,11 +151,104 @@ class CellData(Base):
     key = Column(String(100), index=True)
     value_text = Column(Text, nullable=True)
     value_json = Column(JSON, nullable=True)
+    # حجم القيمة محسوبًا مرة واحدة عند الكتابة حتى لا تحوّل التحليلات كل صف إلى نص في كل استعلام
+    size_bytes = Column(Integer, index=True, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # العلاقات
     cell = relationship("Cell", back_populates="data_items")
+    
+    __table_args__ = (
+        Index("ix_celldata_created", "created_at"),
+    )
+
+def cell_data_size(value_text, value_json) -> int:
+    """حساب حجم قيمة الخلية بالبايت (النص + تمثيل JSON)"""
+    size = len(value_text.encode("utf-8")) if value_text else 0
+    if value_json is not None:
+        size += len(json.dumps(value_json, ensure_ascii=False).encode("utf-8"))
+    return size
+
+@event.listens_for(Cell, "before_insert")
+@event.listens_for(Cell, "before_update")
+def _set_cell_hex_id(mapper, connection, target):
+    target.hex_id = None if target.x is None or target.y is None else (target.x, target.y)
+
+@event.listens_for(CellData, "before_insert")
+@event.listens_for(CellData, "before_update")
+def _set_cell_data_size(mapper, connection, target):
+    target.size_bytes = cell_data_size(target.value_text, target.value_json)
+
+def backfill_cell_coordinates(db: Session, batch_size: int = 1000) -> int:
+    """ترحيل لمرة واحدة: ملء x وy من عمود coordinates النصي القديم في الجداول المنشأة قبل تقسيمه"""
+    updated = 0
+    while True:
+        rows = db.execute(
+            text("SELECT id, coordinates FROM cells WHERE x IS NULL AND coordinates IS NOT NULL LIMIT :limit"),
+            {"limit": batch_size}
+        ).all()
+        if not rows:
+            return updated
+        params = []
+        for row in rows:
+            x, y = map(int, row.coordinates.split(","))
+            params.append({"id": row.id, "x": x, "y": y, "hex_id": pack_hex_id(x, y)})
+        db.execute(update(Cell), params)
+        db.commit()
+        updated += len(rows)
+
+def backfill_cell_data_sizes(db: Session, batch_size: int = 1000) -> int:
+    """ترحيل لمرة واحدة: ملء size_bytes للصفوف المكتوبة قبل إضافة العمود"""
+    updated = 0
+    while True:
+        rows = db.execute(
+            select(CellData.id, CellData.value_text, CellData.value_json)
+            .where(CellData.size_bytes.is_(None))
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return updated
+        db.execute(update(CellData), [
+            {"id": row.id, "size_bytes": cell_data_size(row.value_text, row.value_json)}
+            for row in rows
+        ])
+        db.commit()
+        updated += len(rows)
+
+def upgrade_schema(engine: Engine):
+    """إضافة الأعمدة الجديدة إلى الجداول المنشأة قبلها وملؤها، إذ لا يعدّل create_all الجداول الموجودة"""
+    inspector = inspect(engine)
+    if inspector.has_table("cells"):
+        columns = {column["name"] for column in inspector.get_columns("cells")}
+        # جدول cells في نماذج المصادقة لا يحمل إحداثيات فلا يُعدَّل
+        if "coordinates" in columns or "x" in columns:
+            with engine.begin() as connection:
+                for name, sql_type in (("x", "INTEGER"), ("y", "INTEGER"), ("hex_id", "BIGINT")):
+                    if name not in columns:
+                        connection.execute(text(f"ALTER TABLE cells ADD COLUMN {name} {sql_type}"))
+                connection.execute(text("CREATE INDEX IF NOT EXISTS ix_cells_x ON cells (x)"))
+                connection.execute(text("CREATE INDEX IF NOT EXISTS ix_cells_y ON cells (y)"))
+                connection.execute(text("CREATE INDEX IF NOT EXISTS ix_cells_hex_id ON cells (hex_id)"))
+                connection.execute(text("CREATE INDEX IF NOT EXISTS ix_cell_xy ON cells (x, y)"))
+            if "coordinates" in columns:
+                with Session(bind=engine) as db:
+                    backfill_cell_coordinates(db)
+            if "hex_id" not in columns:
+                # الخلايا التي لها x وy مسبقًا: نفس حساب pack_hex_id داخل قاعدة البيانات
+                with engine.begin() as connection:
+                    connection.execute(text(
+                        "UPDATE cells SET hex_id = x * 4294967296 + (y + 2147483648) "
+                        "WHERE hex_id IS NULL AND x IS NOT NULL AND y IS NOT NULL"
+                    ))
+    if inspector.has_table("cell_data") and "size_bytes" not in {
+            column["name"] for column in inspector.get_columns("cell_data")}:
+        # بلا قيمة افتراضية: الصفوف القديمة تبقى NULL فيملؤها backfill_cell_data_sizes
+        with engine.begin() as connection:
+            connection.execute(text("ALTER TABLE cell_data ADD COLUMN size_bytes INTEGER"))
+            connection.execute(text("CREATE INDEX IF NOT EXISTS ix_cell_data_size_bytes ON cell_data (size_bytes)"))
+        with Session(bind=engine) as db:
+            backfill_cell_data_sizes(db)
 
 class ApiKey(Base):
     """نموذج مفتاح API"""
@@ -124,12 +271,26 @@ class AuditLog(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    action_type = Column(String(50), nullable=True)
     action = Column(String(50))
     resource_type = Column(String(50))
     resource_id = Column(String(50))
     details = Column(JSON, nullable=True)
     ip_address = Column(String(50), nullable=True)
+    execution_time = Column(Float, nullable=True)  # بالمللي ثانية
+    timestamp = Column(DateTime, default=datetime.utcnow)
+    # الساعة واليوم محسوبان ومخزنان في الصف نفسه ومفهرسان، فتُجمَّع أنماط الاستخدام دون EXTRACT على كل صف
+    # extract يُترجم حسب اللهجة: EXTRACT على PostgreSQL وstrftime على SQLite، وكلاهما يعدّ الأحد 0
+    hour_of_day = Column(SmallInteger, Computed(extract("hour", literal_column("timestamp")), persisted=True), index=True)
+    dow = Column(SmallInteger, Computed(extract("dow", literal_column("timestamp")), persisted=True), index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # العلاقات
     user = relationship("User")
+    
+    # كل استعلامات التحليلات تُرشّح على timestamp >= :start؛ الجدول يُلحق به فقط فيكفي BRIN على PostgreSQL
+    __table_args__ = (
+        Index("ix_audit_ts", "timestamp", postgresql_using="brin"),
+        Index("ix_audit_user_ts", "user_id", "timestamp"),
+        Index("ix_audit_action_ts", "action_type", "timestamp"),
+    )
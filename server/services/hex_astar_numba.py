@@ -0,0 +1,83 @@
+"""
+بحث A* في الشبكة السداسية مُترجم بـ Numba
+يعمل على مصفوفات NumPy من الإحداثيات فقط دون أي وصول إلى قاعدة البيانات
+"""
+
+import heapq
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # pragma: no cover - اختياري
+    njit = None
+
+# إزاحات الجيران الستة بنفس ترتيب HEX_OFFSETS في محرك الاستعلام السداسي
+_OFFSETS_X = (0, 1, 1, 0, -1, -1)
+_OFFSETS_Y = (-1, -1, 0, 1, 1, 0)
+
+
+def _astar_hex(existing_xy: np.ndarray, sx: int, sy: int, ex: int, ey: int) -> np.ndarray:
+    """أقصر مسار من (sx, sy) إلى (ex, ey) عبر الخلايا الموجودة في existing_xy (مصفوفة n×2)
+
+    يُعيد مصفوفة k×2 من الإحداثيات بالترتيب، أو مصفوفة فارغة 0×2 إذا لم يوجد مسار.
+    """
+    # الخلايا الموجودة كمعرفات محزومة مرتبة، فاختبار الوجود بحث ثنائي
+    existing = np.sort((existing_xy[:, 0] << 32) + (existing_xy[:, 1] + 2 ** 31))
+    n_existing = existing.shape[0]
+    start_id = (np.int64(sx) << 32) + (sy + 2 ** 31)
+    end_id = (np.int64(ex) << 32) + (ey + 2 ** 31)
+
+    dx0 = abs(sx - ex)
+    dy0 = abs(sy - ey)
+    counter = 0
+    open_set = [(np.int64(dx0 + max(0, dy0 - dx0)), np.int64(counter), start_id)]
+    # بداية المسار تشير إلى نفسها، فلا حاجة لقاموس فارغ غير محدد النوع
+    came_from = {start_id: start_id}
+    g_score = {start_id: np.int64(0)}
+
+    while len(open_set) > 0:
+        _, _, current = heapq.heappop(open_set)
+
+        if current == end_id:
+            # إعادة بناء المسار
+            length = 1
+            node = current
+            while node != start_id:
+                node = came_from[node]
+                length += 1
+            path = np.empty((length, 2), dtype=np.int64)
+            node = current
+            for i in range(length - 1, -1, -1):
+                path[i, 0] = node >> 32
+                path[i, 1] = (node & 0xFFFFFFFF) - 2 ** 31
+                node = came_from[node]
+            return path
+
+        cx = current >> 32
+        cy = (current & 0xFFFFFFFF) - 2 ** 31
+        tentative_g = g_score[current] + 1
+
+        for k in range(6):
+            nx = cx + _OFFSETS_X[k]
+            ny = cy + _OFFSETS_Y[k]
+            neighbor = (nx << 32) + (ny + 2 ** 31)
+
+            # التحقق من وجود خلية في هذه الإحداثيات
+            pos = np.searchsorted(existing, neighbor)
+            if pos >= n_existing or existing[pos] != neighbor:
+                continue
+
+            if neighbor not in g_score or tentative_g < g_score[neighbor]:
+                came_from[neighbor] = current
+                g_score[neighbor] = tentative_g
+                dx = abs(nx - ex)
+                dy = abs(ny - ey)
+                counter += 1
+                heapq.heappush(open_set, (tentative_g + dx + max(0, dy - dx), np.int64(counter), neighbor))
+
+    # لم يتم العثور على مسار
+    return np.empty((0, 2), dtype=np.int64)
+
+
+# None عند غياب Numba، فيستخدم المحرك تنفيذ Python
+astar_hex = njit(cache=True)(_astar_hex) if njit is not None else None
@@ -3,79 +3,97 @@
 يوفر استعلامات متخصصة للبنية السداسية تتفوق على استعلامات SQL التقليدية في Directus
 """
 
+import hashlib
+import heapq
+import itertools
 import logging
+import threading
+import time
+from collections import OrderedDict
 from typing import Dict, List, Any, Optional, Tuple
 import json
-from sqlalchemy.orm import Session
-from .database.models import Cell, CellData, Hive
+import numpy as np
+from sqlalchemy import BigInteger, Text, cast, type_coerce
+from sqlalchemy.orm import Session, aliased
+from .database.models import Cell, CellData, Hive, pack_hex_id, unpack_hex_id
+from .hex_astar_numba import astar_hex
 
 logger = logging.getLogger(__name__)
 
+# إزاحات الجيران الستة في النظام السداسي: شمال، شمال شرق، جنوب شرق، جنوب، جنوب غرب، شمال غرب
+HEX_OFFSETS = ((0, -1), (1, -1), (1, 0), (0, 1), (-1, 1), (-1, 0))
+# الإزاحات نفسها في فضاء المعرفات المحزومة: pack_hex_id(x + dx, y + dy) == pack_hex_id(x, y) + الإزاحة
+HEX_PACKED_OFFSETS = tuple((dx << 32) + dy for dx, dy in HEX_OFFSETS)
+
 class HexagonalQueryEngine:
     """محرك استعلام متخصص للبنية السداسية"""
     
     def __init__(self):
         self.directions = ["north", "northeast", "southeast", "south", "southwest", "northwest"]
         self.cache_enabled = True
-        self.query_cache = {}
+        # نتائج _find_matching_cell_ids: بصمة المعايير -> (وقت الانتهاء، معرفات الخلايا)، مرتبة من الأقدم استخدامًا
+        # تُخزَّن المعرفات لا كائنات ORM حتى لا تُعاد كائنات مرتبطة بجلسة منتهية
+        self.query_cache: "OrderedDict[bytes, Tuple[float, List[int]]]" = OrderedDict()
+        self.cache_max_size = 1024
+        self.cache_ttl = 30
+        self._cache_lock = threading.RLock()
     
     def get_neighbors(self, db: Session, cell_id: str, depth: int = 1) -> List[Dict[str, Any]]:
-        """الحصول على الخلايا المجاورة بعمق محدد"""
+        """الحصول على الخلايا المجاورة بعمق محدد
+        
+        تُحسب كل الإحداثيات حتى العمق المطلوب بالبحث بالعرض (BFS) في الذاكرة، ثم
+        تُجلب خلاياها في استعلام واحد وبياناتها في استعلام ثانٍ بدل استعلامين لكل إحداثية.
+        """
         cell = db.query(Cell).filter(Cell.cell_id == cell_id).first()
         if not cell:
             return []
-            
-        # استخراج الإحداثيات
-        x, y = map(int, cell.coordinates.split(","))
         
-        neighbors = []
-        visited = set()
-        self._get_neighbors_recursive(db, x, y, depth, neighbors, visited)
+        # الخطوة 1: تعداد الإحداثيات مع أقل عمق لكل منها
+        coord_depth = self._enumerate_coordinates(cell.x, cell.y, depth)
         
-        return neighbors
-    
-    def _get_neighbors_recursive(self, db: Session, x: int, y: int, depth: int, 
-                                result: List[Dict[str, Any]], visited: set, current_depth: int = 0):
-        """استرجاع الخلايا المجاورة بشكل متكرر"""
-        if current_depth > depth or f"{x},{y}" in visited:
-            return
-            
-        visited.add(f"{x},{y}")
+        # الخطوة 2: جلب الخلايا الموجودة وبياناتها دفعة واحدة، بفحوص في فهرس المعرف المحزوم
+        cells = db.query(Cell).filter(Cell.hex_id.in_([pack_hex_id(x, y) for x, y in coord_depth])).all()
+        data_by_cell = self._load_cell_data(db, [c.id for c in cells])
         
-        # الحصول على الخلية الحالية
-        cell = db.query(Cell).filter(Cell.coordinates == f"{x},{y}").first()
-        if cell:
-            # إضافة بيانات الخلية إلى النتائج
-            cell_data = db.query(CellData).filter(CellData.cell_id == cell.id).all()
-            data_dict = {}
-            for data in cell_data:
-                if data.value_json:
-                    data_dict[data.key] = data.value_json
-                else:
-                    data_dict[data.key] = data.value_text
-                    
-            result.append({
-                "cell_id": cell.cell_id,
-                "coordinates": cell.coordinates,
-                "data_type": cell.data_type,
-                "data": data_dict,
-                "depth": current_depth
-            })
+        cells.sort(key=lambda c: coord_depth[(c.x, c.y)])
+        return [
+            {
+                "cell_id": c.cell_id,
+                "coordinates": c.coordinates,
+                "data_type": c.data_type,
+                "data": data_by_cell.get(c.id, {}),
+                "depth": coord_depth[(c.x, c.y)]
+            }
+            for c in cells
+        ]
+    
+    def _enumerate_coordinates(self, x: int, y: int, depth: int) -> Dict[Tuple[int, int], int]:
+        """كل الإحداثيات على بعد depth خطوة على الأكثر من (x, y) مع عمق كل منها"""
+        coord_depth = {(x, y): 0}
+        frontier = [(x, y)]
+        for current_depth in range(1, depth + 1):
+            next_frontier = []
+            for cx, cy in frontier:
+                for dx, dy in HEX_OFFSETS:
+                    coord = (cx + dx, cy + dy)
+                    if coord not in coord_depth:
+                        coord_depth[coord] = current_depth
+                        next_frontier.append(coord)
+            frontier = next_frontier
+        return coord_depth
+    
+    def _load_cell_data(self, db: Session, cell_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """بيانات عدة خلايا في استعلام واحد: معرف الخلية -> {المفتاح: القيمة}"""
+        data_by_cell: Dict[int, Dict[str, Any]] = {}
+        if not cell_ids:
+            return data_by_cell
         
-        # الحصول على الجيران
-        if current_depth < depth:
-            # إحداثيات الجيران في النظام السداسي
-            neighbor_coords = [
-                (x, y-1),      # شمال
-                (x+1, y-1),    # شمال شرق
-                (x+1, y),      # جنوب شرق
-                (x, y+1),      # جنوب
-                (x-1, y+1),    # جنوب غرب
-                (x-1, y)       # شمال غرب
-            ]
-            
-            for nx, ny in neighbor_coords:
-                self._get_neighbors_recursive(db, nx, ny, depth, result, visited, current_depth + 1)
+        rows = db.query(
+            CellData.cell_id, CellData.key, CellData.value_json, CellData.value_text
+        ).filter(CellData.cell_id.in_(cell_ids)).all()
+        for row in rows:
+            data_by_cell.setdefault(row.cell_id, {})[row.key] = row.value_json if row.value_json else row.value_text
+        return data_by_cell
     
     def path_query(self, db: Session, start_cell_id: str, end_cell_id: str) -> List[Dict[str, Any]]:
         """البحث عن أقصر مسار بين خليتين"""
@@ -85,31 +103,24 @@ class HexagonalQueryEngine:
         if not start_cell or not end_cell:
             return []
             
-        # استخراج الإحداثيات
-        start_x, start_y = map(int, start_cell.coordinates.split(","))
-        end_x, end_y = map(int, end_cell.coordinates.split(","))
-        
         # استخدام خوارزمية A* للبحث عن المسار
-        path = self._a_star_search(db, (start_x, start_y), (end_x, end_y))
+        path = self._a_star_search(db, (start_cell.x, start_cell.y), (end_cell.x, end_cell.y))
+        if not path:
+            return []
+        
+        # تحويل المسار إلى قائمة من الخلايا: خلايا المسار وبياناتها في استعلامين
+        cells = {(c.x, c.y): c for c in db.query(Cell).filter(Cell.hex_id.in_([pack_hex_id(x, y) for x, y in path]))}
+        data_by_cell = self._load_cell_data(db, [c.id for c in cells.values()])
         
-        # تحويل المسار إلى قائمة من الخلايا
         result = []
-        for i, (x, y) in enumerate(path):
-            cell = db.query(Cell).filter(Cell.coordinates == f"{x},{y}").first()
+        for i, coord in enumerate(path):
+            cell = cells.get(coord)
             if cell:
-                cell_data = db.query(CellData).filter(CellData.cell_id == cell.id).all()
-                data_dict = {}
-                for data in cell_data:
-                    if data.value_json:
-                        data_dict[data.key] = data.value_json
-                    else:
-                        data_dict[data.key] = data.value_text
-                        
                 result.append({
                     "cell_id": cell.cell_id,
                     "coordinates": cell.coordinates,
                     "data_type": cell.data_type,
-                    "data": data_dict,
+                    "data": data_by_cell.get(cell.id, {}),
                     "step": i
                 })
         
@@ -117,8 +128,6 @@ class HexagonalQueryEngine:
     
     def _a_star_search(self, db: Session, start: Tuple[int, int], end: Tuple[int, int]) -> List[Tuple[int, int]]:
         """خوارزمية A* للبحث عن أقصر مسار في الشبكة السداسية"""
-        import heapq
-        
         # دالة تقدير المسافة (heuristic) للشبكة السداسية
         def hex_distance(a, b):
             # مسافة مانهاتن المعدلة للشبكة السداسية
@@ -126,59 +135,70 @@ class HexagonalQueryEngine:
             dy = abs(a[1] - b[1])
             return dx + max(0, dy - dx)
         
-        # قائمة الأولوية للخلايا التي سيتم استكشافها
-        open_set = []
-        heapq.heappush(open_set, (0, start))
+        # تحميل الخلايا الموجودة في المنطقة المحيطة بالبداية والنهاية مرة واحدة، فيصبح التحقق من
+        # وجود الجار داخل الحلقة بحثًا في مجموعة بدل استعلام لكل جار.
+        # المعرفات المحزومة مرتبة حسب x ثم y، فمدى x هو مدى واحد في فهرس hex_id
+        buffer = hex_distance(start, end)
+        min_x, max_x = min(start[0], end[0]) - buffer, max(start[0], end[0]) + buffer
+        min_y, max_y = min(start[1], end[1]) - buffer, max(start[1], end[1]) + buffer
+        rows = db.query(type_coerce(Cell.hex_id, BigInteger)).filter(
+            Cell.hex_id.between(pack_hex_id(min_x, min_y), pack_hex_id(max_x, max_y)),
+            Cell.y.between(min_y, max_y)
+        )
+        # الخلايا ممثلة بمعرفاتها المحزومة (أعداد صحيحة) فتصبح القواميس والمقارنات على أعداد لا على صفوف tuple،
+        # وإزاحة كل جار في الفضاء المحزوم ثابتة فيُحسب الجار بعملية جمع واحدة
+        existing = {row[0] for row in rows}
         
-        # الخلايا التي تم زيارتها
-        came_from = {}
+        # البحث نفسه حساب صحيح خالص بعد تحميل الخلايا، فيُنفّذ بالنسخة المترجمة بـ Numba إن توفرت
+        if astar_hex is not None:
+            ids = np.fromiter(existing, dtype=np.int64, count=len(existing))
+            existing_xy = np.ascontiguousarray(np.column_stack((ids >> 32, (ids & 0xFFFFFFFF) - 2 ** 31)))
+            path = astar_hex(existing_xy, start[0], start[1], end[0], end[1])
+            return [(int(x), int(y)) for x, y in path]
         
-        # تكلفة الوصول إلى كل خلية
-        g_score = {start: 0}
+        start_id = pack_hex_id(*start)
+        end_id = pack_hex_id(*end)
+        
+        # قائمة الأولوية: (التقدير الكلي، عداد لكسر التعادل، معرف الخلية)
+        counter = itertools.count()
+        open_set = [(hex_distance(start, end), next(counter), start_id)]
         
-        # التقدير الكلي للمسافة
-        f_score = {start: hex_distance(start, end)}
+        # الخلايا التي تم زيارتها: معرف الخلية -> معرف الخلية السابقة
+        came_from: Dict[int, int] = {}
+        
+        # تكلفة الوصول إلى كل خلية
+        g_score: Dict[int, int] = {start_id: 0}
         
         while open_set:
             # الحصول على الخلية ذات الأولوية الأعلى
-            current_f, current = heapq.heappop(open_set)
+            _, _, current = heapq.heappop(open_set)
             
             # إذا وصلنا إلى الهدف
-            if current == end:
-                # إعادة بناء المسار
+            if current == end_id:
+                # إعادة بناء المسار وفك حزم المعرفات إلى إحداثيات
                 path = [current]
                 while current in came_from:
                     current = came_from[current]
                     path.append(current)
-                return path[::-1]
+                return [unpack_hex_id(cell) for cell in reversed(path)]
             
-            # إحداثيات الجيران
-            neighbors = [
-                (current[0], current[1]-1),      # شمال
-                (current[0]+1, current[1]-1),    # شمال شرق
-                (current[0]+1, current[1]),      # جنوب شرق
-                (current[0], current[1]+1),      # جنوب
-                (current[0]-1, current[1]+1),    # جنوب غرب
-                (current[0]-1, current[1])       # شمال غرب
-            ]
+            current_xy = unpack_hex_id(current)
+            tentative_g = g_score[current] + 1
             
-            for neighbor in neighbors:
+            for (dx, dy), delta in zip(HEX_OFFSETS, HEX_PACKED_OFFSETS):
+                neighbor = current + delta
                 # التحقق من وجود خلية في هذه الإحداثيات
-                cell = db.query(Cell).filter(Cell.coordinates == f"{neighbor[0]},{neighbor[1]}").first()
-                if not cell:
+                if neighbor not in existing:
                     continue
                 
-                # حساب التكلفة
-                tentative_g = g_score.get(current, float('inf')) + 1
-                
                 if tentative_g < g_score.get(neighbor, float('inf')):
                     # هذا مسار أفضل
                     came_from[neighbor] = current
                     g_score[neighbor] = tentative_g
-                    f_score[neighbor] = tentative_g + hex_distance(neighbor, end)
+                    f = tentative_g + hex_distance((current_xy[0] + dx, current_xy[1] + dy), end)
                     
                     # إضافة الجار إلى قائمة الاستكشاف
-                    heapq.heappush(open_set, (f_score[neighbor], neighbor))
+                    heapq.heappush(open_set, (f, next(counter), neighbor))
         
         # لم يتم العثور على مسار
         return []
@@ -187,27 +207,77 @@ class HexagonalQueryEngine:
         """البحث عن أنماط محددة في الشبكة السداسية"""
         # مثال للنمط: {"center": {"type": "user"}, "neighbors": [{"direction": "north", "type": "document"}]}
         
-        # البحث عن الخلايا المطابقة للنمط المركزي
-        center_cells = self._find_matching_cells(db, pattern.get("center", {}))
+        # عبارة واحدة: الخلايا المطابقة للنمط المركزي مع شرط EXISTS لكل اتجاه مطلوب يبحث عن الجار عبر
+        # معرفه المحزوم (فحص واحد في فهرس hex_id)، وشروط الجار تُطبّق على الاسم المستعار نفسه.
+        # الإحداثيات ليست فريدة، وEXISTS لا يكرر الخلية المركزية كما يفعل الربط مع كل جار مطابق.
+        # معرفات الخلايا المركزية تأتي من الذاكرة المؤقتة للمعايير المتكررة
+        center = pattern.get("center", {})
+        query = db.query(Cell)
+        if center:
+            query = query.filter(Cell.id.in_(self._find_matching_cell_ids(db, center)))
+        for direction, criteria_list in self._group_neighbor_criteria(pattern.get("neighbors", [])).items():
+            neighbor = aliased(Cell)
+            delta = HEX_PACKED_OFFSETS[self.directions.index(direction)]
+            neighbor_query = db.query(neighbor.id).filter(neighbor.hex_id == Cell.hex_id + delta)
+            for criteria in criteria_list:
+                neighbor_query = self._query_matching_cells(db, criteria, neighbor_query, neighbor)
+            query = query.filter(neighbor_query.exists())
+        
+        cells = query.all()
+        data_by_cell = self._load_cell_data(db, [cell.id for cell in cells])
+        return [
+            {
+                "cell_id": cell.cell_id,
+                "coordinates": cell.coordinates,
+                "data_type": cell.data_type,
+                "data": data_by_cell.get(cell.id, {})
+            }
+            for cell in cells
+        ]
+    
+    def invalidate_cache(self):
+        """إفراغ ذاكرة نتائج المطابقة بعد تغيّر الخلايا أو بياناتها"""
+        with self._cache_lock:
+            self.query_cache.clear()
+    
+    async def handle_cell_event(self, message: Dict[str, Any], key: Optional[str] = None):
+        """معالج أحداث موضوع الخلايا في Kafka: أي تغيير في الخلايا يُبطل النتائج المخزنة"""
+        self.invalidate_cache()
+    
+    def _criteria_key(self, criteria: Dict[str, Any]) -> bytes:
+        """بصمة ثابتة للمعايير لا تتأثر بترتيب المفاتيح"""
+        return hashlib.blake2b(
+            json.dumps(criteria, sort_keys=True, default=str).encode(), digest_size=16
+        ).digest()
+    
+    def _find_matching_cell_ids(self, db: Session, criteria: Dict[str, Any]) -> List[int]:
+        """معرفات الخلايا المطابقة للمعايير، مع إعادة استخدام النتائج للمعايير المتكررة"""
+        if not self.cache_enabled:
+            return [row.id for row in self._query_matching_cells(db, criteria).with_entities(Cell.id)]
         
-        results = []
-        for cell in center_cells:
-            # التحقق من الجيران
-            if "neighbors" in pattern:
-                if self._check_neighbors(db, cell, pattern["neighbors"]):
-                    results.append(self._cell_to_dict(db, cell))
-            else:
-                results.append(self._cell_to_dict(db, cell))
+        key = self._criteria_key(criteria)
+        with self._cache_lock:
+            entry = self.query_cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.query_cache.move_to_end(key)
+                return entry[1]
         
-        return results
+        ids = [row.id for row in self._query_matching_cells(db, criteria).with_entities(Cell.id)]
+        with self._cache_lock:
+            self.query_cache[key] = (time.monotonic() + self.cache_ttl, ids)
+            self.query_cache.move_to_end(key)
+            while len(self.query_cache) > self.cache_max_size:
+                self.query_cache.popitem(last=False)
+        return ids
     
-    def _find_matching_cells(self, db: Session, criteria: Dict[str, Any]) -> List[Cell]:
-        """البحث عن الخلايا المطابقة للمعايير"""
-        query = db.query(Cell)
+    def _query_matching_cells(self, db: Session, criteria: Dict[str, Any], query=None, target=Cell):
+        """بناء استعلام الخلايا المطابقة للمعايير، أو إضافة شروطها إلى استعلام قائم على الكيان target"""
+        if query is None:
+            query = db.query(Cell)
         
         for key, value in criteria.items():
             if key == "type":
-                query = query.filter(Cell.data_type == value)
+                query = query.filter(target.data_type == value)
             elif key == "data":
                 # البحث في بيانات الخلية
                 for data_key, data_value in value.items():
@@ -230,72 +300,24 @@ class HexagonalQueryEngine:
                         # مطابقة مباشرة
                         subquery = subquery.filter(
                             (CellData.value_text == str(data_value)) | 
-                            (CellData.value_json.cast(str) == json.dumps(data_value))
+                            (cast(CellData.value_json, Text) == json.dumps(data_value))
                         )
                     
-                    query = query.filter(Cell.id.in_(subquery))
+                    query = query.filter(target.id.in_(subquery))
         
-        return query.all()
+        return query
     
-    def _check_neighbors(self, db: Session, cell: Cell, neighbor_criteria: List[Dict[str, Any]]) -> bool:
-        """التحقق من مطابقة الجيران للمعايير"""
-        x, y = map(int, cell.coordinates.split(","))
-        
+    def _group_neighbor_criteria(self, neighbor_criteria: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """تجميع معايير الجيران حسب الاتجاه دون تعديل قاموس المستدعي"""
+        by_direction: Dict[str, List[Dict[str, Any]]] = {}
         for criteria in neighbor_criteria:
             direction = criteria.get("direction")
             if direction not in self.directions:
                 continue
-                
-            # الحصول على إحداثيات الجار
-            nx, ny = self._get_neighbor_coordinates(x, y, direction)
-            
-            # البحث عن الخلية المجاورة
-            neighbor = db.query(Cell).filter(Cell.coordinates == f"{nx},{ny}").first()
-            if not neighbor:
-                return False
-                
-            # التحقق من المعايير
-            del criteria["direction"]
-            matching_cells = self._find_matching_cells(db, criteria)
-            
-            if neighbor not in matching_cells:
-                return False
-        
-        return True
-    
-    def _get_neighbor_coordinates(self, x: int, y: int, direction: str) -> Tuple[int, int]:
-        """الحصول على إحداثيات الجار في اتجاه محدد"""
-        if direction == "north":
-            return (x, y-1)
-        elif direction == "northeast":
-            return (x+1, y-1)
-        elif direction == "southeast":
-            return (x+1, y)
-        elif direction == "south":
-            return (x, y+1)
-        elif direction == "southwest":
-            return (x-1, y+1)
-        elif direction == "northwest":
-            return (x-1, y)
-        else:
-            return (x, y)
-    
-    def _cell_to_dict(self, db: Session, cell: Cell) -> Dict[str, Any]:
-        """تحويل كائن الخلية إلى قاموس"""
-        cell_data = db.query(CellData).filter(CellData.cell_id == cell.id).all()
-        data_dict = {}
-        for data in cell_data:
-            if data.value_json:
-                data_dict[data.key] = data.value_json
-            else:
-                data_dict[data.key] = data.value_text
-                
-        return {
-            "cell_id": cell.cell_id,
-            "coordinates": cell.coordinates,
-            "data_type": cell.data_type,
-            "data": data_dict
-        }
+            by_direction.setdefault(direction, []).append(
+                {k: v for k, v in criteria.items() if k != "direction"}
+            )
+        return by_direction
 
 # إنشاء نسخة واحدة من محرك الاستعلام
 hexagonal_query_engine = HexagonalQueryEngine()
@@ -4,6 +4,7 @@ import logging
 from typing import Any, Dict
 import asyncio
 from aiokafka import AIOKafkaProducer
+from aiokafka.codec import has_lz4
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -15,6 +16,18 @@ KAFKA_TOPIC_CELLS = os.getenv("KAFKA_TOPIC_CELLS", "hivedb-cells")
 KAFKA_TOPIC_USERS = os.getenv("KAFKA_TOPIC_USERS", "hivedb-users")
 KAFKA_TOPIC_AUDIT = os.getenv("KAFKA_TOPIC_AUDIT", "hivedb-audit")
 
+# Producer batching: events are small and frequent, so trade a few ms of latency for fewer, larger requests
+KAFKA_LINGER_MS = int(os.getenv("KAFKA_LINGER_MS", "20"))
+KAFKA_MAX_BATCH_SIZE = int(os.getenv("KAFKA_MAX_BATCH_SIZE", "131072"))
+
+def _parse_acks(value: str):
+    """Kafka acks setting: "all" (same as -1) for durable writes, otherwise 0, 1 or -1"""
+    value = value.strip().lower()
+    return "all" if value in ("all", "-1") else int(value)
+
+KAFKA_ACKS = _parse_acks(os.getenv("KAFKA_ACKS", "1"))
+KAFKA_COMPRESSION = "lz4" if has_lz4() else "gzip"
+
 logger = logging.getLogger(__name__)
 
 class KafkaProducer:
@@ -29,7 +42,11 @@ class KafkaProducer:
         try:
             self.producer = AIOKafkaProducer(
                 bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
-                value_serializer=lambda v: json.dumps(v).encode('utf-8')
+                value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+                linger_ms=KAFKA_LINGER_MS,
+                max_batch_size=KAFKA_MAX_BATCH_SIZE,
+                compression_type=KAFKA_COMPRESSION,
+                acks=KAFKA_ACKS
             )
             await self.producer.start()
             self.is_ready = True
@@ -45,21 +62,35 @@ class KafkaProducer:
             self.is_ready = False
             logger.info("Kafka producer stopped")
     
-    async def send_message(self, topic: str, data: Dict[str, Any], key: str = None):
-        """Send a message to a Kafka topic."""
+    async def send_message(self, topic: str, data: Dict[str, Any], key: str = None, wait: bool = True):
+        """Send a message to a Kafka topic.
+        
+        With wait=False the message is only appended to the producer's batch
+        accumulator; delivery failures are logged from the delivery callback.
+        """
         if not self.is_ready:
             logger.warning("Kafka producer is not ready, message not sent")
             return False
         
         try:
             key_bytes = key.encode('utf-8') if key else None
-            await self.producer.send_and_wait(topic, data, key=key_bytes)
+            if wait:
+                await self.producer.send_and_wait(topic, data, key=key_bytes)
+            else:
+                delivery = await self.producer.send(topic, data, key=key_bytes)
+                delivery.add_done_callback(self._log_delivery_failure)
             logger.debug(f"Message sent to topic {topic}: {data}")
             return True
         except Exception as e:
             logger.error(f"Failed to send message to Kafka: {e}")
             return False
     
+    @staticmethod
+    def _log_delivery_failure(delivery: "asyncio.Future"):
+        """Report a failed fire-and-forget delivery."""
+        if not delivery.cancelled() and delivery.exception() is not None:
+            logger.error(f"Failed to deliver message to Kafka: {delivery.exception()}")
+    
     async def send_cell_event(self, cell_key: str, event_type: str, data: Dict[str, Any]):
         """Send a cell-related event to Kafka."""
         message = {
@@ -89,7 +120,8 @@ class KafkaProducer:
             "timestamp": asyncio.get_event_loop().time(),
             "details": details
         }
-        return await self.send_message(KAFKA_TOPIC_AUDIT, message)
+        # Audit events are not needed by anyone before the response, so don't wait for the broker ack
+        return await self.send_message(KAFKA_TOPIC_AUDIT, message, wait=False)
 
 # Singleton instance
 kafka_producer = KafkaProducer()
@@ -10,11 +10,18 @@ import time
 import json
 import logging
 import hashlib
-from typing import Dict, List, Any, Optional
+import functools
+import threading
+from typing import Dict, Iterable, List, Any, Optional, Set, Tuple
 from datetime import datetime
 from collections import defaultdict
 from dotenv import load_dotenv
 
+try:
+    import xxhash
+except ImportError:  # pragma: no cover - اختياري
+    xxhash = None
+
 # تحميل متغيرات البيئة
 load_dotenv()
 
@@ -26,6 +33,21 @@ LIQUID_CACHE_ENABLED = os.getenv("LIQUID_CACHE_ENABLED", "True").lower() in ("tr
 LIQUID_CACHE_SIZE = int(os.getenv("LIQUID_CACHE_SIZE", "500"))  # عدد العناصر الأقصى في الذاكرة - تم تقليله للتوافق مع Render
 LIQUID_CACHE_TTL = int(os.getenv("LIQUID_CACHE_TTL", "1800"))  # وقت انتهاء الصلاحية بالثواني - تم تقليله للتوافق مع Render
 LIQUID_CACHE_LAYERS = 2  # تم تقليل عدد الطبقات للتبسيط
+KEY_MEMO_SIZE = 65536  # عدد المفاتيح المحسوبة التي نحتفظ بها في الذاكرة
+
+def _freeze_value(value: Any) -> str:
+    """تمثيل نصي ثابت لقيمة معلمة (repr للقيم البسيطة لتمييز 1 عن "1")"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return repr(value)
+    return json.dumps(value, sort_keys=True, default=str)
+
+@functools.lru_cache(maxsize=KEY_MEMO_SIZE)
+def _generate_key_cached(query_type: str, items: Tuple[Tuple[str, str], ...]) -> str:
+    """حساب بصمة المفتاح مرة واحدة لكل مجموعة معلمات"""
+    raw = f"{query_type}:{items}".encode()
+    if xxhash is not None:
+        return xxhash.xxh3_64_hexdigest(raw)
+    return hashlib.md5(raw).hexdigest()
 
 class CacheItem:
     """عنصر في الذاكرة المؤقتة مع بيانات التعلم"""
@@ -143,6 +165,11 @@ class LiquidCache:
         self.last_patterns: List[str] = []  # آخر 10 أنماط
         self.last_cleanup = 0
         
+        # فهرس الوسوم: وسم (مثل cell_<key>) -> المفاتيح المخزنة تحته، لإبطالها دفعة واحدة
+        self.lock = threading.RLock()
+        self._tag_index: Dict[str, Set[str]] = defaultdict(set)
+        self._key_tags: Dict[str, Tuple[str, ...]] = {}
+        
         # تحميل أنماط الاستعلام المحفوظة إن وجدت
         self._load_patterns()
         
@@ -150,10 +177,9 @@ class LiquidCache:
     
     def _generate_key(self, query_type: str, params: Dict[str, Any]) -> str:
         """توليد مفتاح فريد للاستعلام"""
-        # ترتيب المعلمات للحصول على مفتاح متسق
-        sorted_params = json.dumps(params, sort_keys=True)
-        key = f"{query_type}:{sorted_params}"
-        return hashlib.md5(key.encode()).hexdigest()
+        # ترتيب المعلمات في صف ثابت للحصول على مفتاح متسق وقابل للتخزين في lru_cache
+        items = tuple(sorted((k, _freeze_value(v)) for k, v in params.items()))
+        return _generate_key_cached(query_type, items)
     
     def _extract_pattern(self, query_type: str, params: Dict[str, Any]) -> str:
         """استخراج نمط من الاستعلام (مبسط للمعلمات)"""
@@ -199,58 +225,107 @@ class LiquidCache:
         if not self.enabled:
             return None
         
-        # البحث في جميع الطبقات
-        for layer in range(self.num_layers):
-            if key in self.cache_layers[layer]:
-                item = self.cache_layers[layer][key]
-                
-                # التحقق من انتهاء الصلاحية
-                if item.is_expired():
-                    del self.cache_layers[layer][key]
-                    self.misses += 1
-                    return None
-                
-                # تحديث إحصائيات الوصول
-                item.access()
-                self.hits += 1
-                
-                return item.value
-        
-        self.misses += 1
-        return None
+        with self.lock:
+            # البحث في جميع الطبقات
+            for layer in range(self.num_layers):
+                if key in self.cache_layers[layer]:
+                    item = self.cache_layers[layer][key]
+                    
+                    # التحقق من انتهاء الصلاحية
+                    if item.is_expired():
+                        self._remove(key)
+                        self.misses += 1
+                        return None
+                    
+                    # تحديث إحصائيات الوصول
+                    item.access()
+                    self.hits += 1
+                    
+                    return item.value
+            
+            self.misses += 1
+            return None
     
-    def set(self, key: str, value: Any, ttl: int = None) -> None:
-        """تخزين عنصر في الذاكرة المؤقتة"""
+    def set(self, key: str, value: Any, ttl: int = None, tags: Optional[Iterable[str]] = None) -> None:
+        """تخزين عنصر في الذاكرة المؤقتة، مع وسوم اختيارية لإبطاله لاحقًا عبر invalidate_many"""
         if not self.enabled:
             return
         
-        # إنشاء عنصر جديد
-        item = CacheItem(key, value, ttl or self.default_ttl)
-        
-        # تخزين العنصر
-        self.cache_layers[0][key] = item
-        
-        # التحقق من حجم الذاكرة
-        total_size = sum(len(layer) for layer in self.cache_layers)
-        if total_size > self.max_size:
-            self._cleanup()
+        with self.lock:
+            # إزالة النسخة القديمة ووسومها قبل الاستبدال
+            self._remove(key)
+            
+            # إنشاء عنصر جديد وتخزينه
+            self.cache_layers[0][key] = CacheItem(key, value, ttl or self.default_ttl)
+            
+            if tags:
+                self._key_tags[key] = tuple(tags)
+                for tag in self._key_tags[key]:
+                    self._tag_index[tag].add(key)
+            
+            # التحقق من حجم الذاكرة
+            total_size = sum(len(layer) for layer in self.cache_layers)
+            if total_size > self.max_size:
+                self._cleanup()
+    
+    def _remove(self, key: str) -> bool:
+        """حذف مفتاح من طبقاته وفهرس الوسوم (يُستدعى والقفل مأخوذ)"""
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+        
+        for layer in self.cache_layers:
+            if layer.pop(key, None) is not None:
+                return True
+        return False
     
     def delete(self, key: str) -> bool:
         """حذف عنصر من الذاكرة المؤقتة"""
         if not self.enabled:
             return False
         
-        for layer in range(self.num_layers):
-            if key in self.cache_layers[layer]:
-                del self.cache_layers[layer][key]
-                return True
+        with self.lock:
+            return self._remove(key)
+    
+    def invalidate(self, key: str) -> bool:
+        """إبطال عنصر واحد"""
+        return self.delete(key)
+    
+    def invalidate_many(self, tag: str) -> int:
+        """إبطال كل المفاتيح المخزنة تحت وسم واحد بأخذ القفل مرة واحدة"""
+        if not self.enabled:
+            return 0
         
-        return False
+        with self.lock:
+            keys = self._tag_index.pop(tag, set())
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+    
+    @staticmethod
+    def cell_tag(cell_key: str) -> str:
+        """الوسم الذي تُخزن تحته كل القراءات المتعلقة بخلية"""
+        return f"cell_{cell_key}"
+    
+    def on_write(self, cell_key: str) -> int:
+        """إبطال كل ما خُزن لخلية بعد الكتابة فيها أو الحذف منها"""
+        return self.invalidate_many(self.cell_tag(cell_key))
+    
+    def find_related_keys(self, tag: str) -> List[str]:
+        """المفاتيح المخزنة حاليًا تحت وسم معين"""
+        with self.lock:
+            return list(self._tag_index.get(tag, ()))
     
     def clear(self) -> None:
         """مسح جميع العناصر من الذاكرة المؤقتة"""
-        for layer in range(self.num_layers):
-            self.cache_layers[layer].clear()
+        with self.lock:
+            for layer in range(self.num_layers):
+                self.cache_layers[layer].clear()
+            self._tag_index.clear()
+            self._key_tags.clear()
     
     def register_query(self, query_type: str, params: Dict[str, Any], result: Any = None) -> str:
         """تسجيل استعلام وتحديث أنماط التعلم"""
@@ -281,7 +356,9 @@ class LiquidCache:
         
         return {
             "enabled": self.enabled,
+            "size": total_items,
             "total_items": total_items,
+            "tags": len(self._tag_index),
             "max_size": self.max_size,
             "layer_stats": layer_stats,
             "hits": self.hits,
@@ -341,129 +418,44 @@ class LiquidCache:
     
     def _cleanup(self):
         """تنظيف العناصر منتهية الصلاحية وإدارة حجم الذاكرة"""
-        now = time.time()
-        
-        # إزالة العناصر منتهية الصلاحية
-        for layer in range(self.num_layers):
-            expired_keys = [k for k, v in self.cache_layers[layer].items() if v.is_expired()]
-            for key in expired_keys:
-                del self.cache_layers[layer][key]
-        
-        # التحقق من حجم الذاكرة
-        total_size = sum(len(layer) for layer in self.cache_layers)
-        if total_size <= self.max_size:
-                    # تحديث طبقة العنصر
-                    self._update_item_layer(item)
-                    
-                    return item.value
-            
-            self.misses += 1
-            return None
-    
-    def set(self, key: str, value: Any, ttl: int = None, predicted: bool = False) -> None:
-        """تخزين عنصر في الذاكرة المؤقتة"""
-        if not self.enabled:
-            return
-        
-        self._cleanup()
-        
         with self.lock:
-            # إنشاء عنصر جديد
-            item = CacheItem(key, value, ttl or self.default_ttl)
-            
-            # تعيين درجة التنبؤ إذا كان العنصر متوقعًا
-            if predicted:
-                item.predicted_score = 0.8
-            
-            # تحديد الطبقة المناسبة للعنصر الجديد
-            target_layer = 1 if predicted else min(2, self.num_layers - 1)
-            item.layer = target_layer
+            self.last_cleanup = time.time()
             
-            # تخزين العنصر
-            self.cache_layers[target_layer][key] = item
+            # إزالة العناصر منتهية الصلاحية
+            for layer in self.cache_layers:
+                for key in [k for k, v in layer.items() if v.is_expired()]:
+                    self._remove(key)
             
-            # التحقق من حجم الذاكرة
-            total_size = sum(len(layer) for layer in self.cache_layers)
-            if total_size > self.max_size:
-                self._cleanup(force=True)
+            # إخراج الأقل استخدامًا مؤخرًا حتى نعود ضمن الحجم الأقصى
+            items = [item for layer in self.cache_layers for item in layer.values()]
+            overflow = len(items) - self.max_size
+            if overflow > 0:
+                items.sort(key=lambda item: item.last_accessed)
+                for item in items[:overflow]:
+                    self._remove(item.key)
     
-    def delete(self, key: str) -> bool:
-        """حذف عنصر من الذاكرة المؤقتة"""
-        if not self.enabled:
-            return False
-        
-        with self.lock:
-            for layer in range(self.num_layers):
-                if key in self.cache_layers[layer]:
-                    del self.cache_layers[layer][key]
-                    return True
-            
-            return False
+    def get_preload_hints(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """تلميحات للتحميل المسبق مستخرجة من أكثر الأنماط تكرارًا"""
+        hints = []
+        for p in sorted(self.query_patterns.values(), key=lambda p: p.count, reverse=True)[:limit]:
+            query_type, _, params = p.pattern.partition(":")
+            try:
+                hint = json.loads(params) if params else {}
+            except ValueError:
+                continue
+            hint["type"] = query_type
+            hint["count"] = p.count
+            hints.append(hint)
+        return hints
     
-    def clear(self) -> None:
-        """مسح جميع العناصر من الذاكرة المؤقتة"""
-        with self.lock:
-            for layer in range(self.num_layers):
-                self.cache_layers[layer].clear()
+    def initialize(self) -> None:
+        """تهيئة الذاكرة عند بدء الخادم"""
+        logger.info(f"الذاكرة السائلة {'مفعلة' if self.enabled else 'معطلة'}: {len(self.query_patterns)} نمط محمل")
     
-    def register_query(self, query_type: str, params: Dict[str, Any], result: Any = None, load_func=None) -> str:
-        """تسجيل استعلام وتحديث أنماط التعلم"""
-        if not self.enabled:
-            return ""
-        
-        # توليد مفتاح ونمط للاستعلام
-        key = self._generate_key(query_type, params)
-        pattern = self._extract_pattern(query_type, params)
-        
-        # تحديث أنماط الاستعلام
-        self._update_patterns(pattern)
-        
-        # تخزين النتيجة إذا كانت متوفرة
-        if result is not None:
-            self.set(key, result)
-        
-        # تحميل مسبق للاستعلامات المتوقعة
-        if load_func:
-            self._preload_predicted_queries(pattern, load_func)
-        
-        return key
-    
-    def get_stats(self) -> Dict[str, Any]:
-        """الحصول على إحصائيات الذاكرة المؤقتة"""
-        with self.lock:
-            total_items = sum(len(layer) for layer in self.cache_layers)
-            layer_stats = [len(layer) for layer in self.cache_layers]
-            
-            hit_rate = 0
-            if self.hits + self.misses > 0:
-                hit_rate = self.hits / (self.hits + self.misses)
-            
-            prediction_rate = 0
-            if self.predictions > 0:
-                prediction_rate = self.successful_predictions / self.predictions
-            
-            return {
-                "enabled": self.enabled,
-                "total_items": total_items,
-                "max_size": self.max_size,
-                "layer_stats": layer_stats,
-                "hits": self.hits,
-                "misses": self.misses,
-                "hit_rate": hit_rate,
-                "predictions": self.predictions,
-                "successful_predictions": self.successful_predictions,
-                "prediction_rate": prediction_rate,
-                "patterns_count": len(self.query_patterns),
-                "last_cleanup": self.last_cleanup
-            }
-    
-    def get_hot_patterns(self, limit: int = 10) -> List[Dict[str, Any]]:
-        """الحصول على أكثر أنماط الاستعلام استخدامًا"""
-        with self.lock:
-            patterns = list(self.query_patterns.values())
-            patterns.sort(key=lambda p: p.count, reverse=True)
-            
-            return [p.to_dict() for p in patterns[:limit]]
+    def shutdown(self) -> None:
+        """حفظ الأنماط وتفريغ الذاكرة عند إيقاف الخادم"""
+        self._save_patterns()
+        self.clear()
 
 # إنشاء نسخة واحدة من الذاكرة السائلة
 liquid_cache = LiquidCache()
@@ -68,6 +68,14 @@ class QueryOptimizer:
             # Fallback to standard processing
             return self._execute_standard_query(query, data)
     
+    def execute_query(self, query: Dict[str, Any], data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Execute a query on the provided data without the result cache.
+        
+        optimize_query caches by the query alone, so use this when the same
+        query runs over different rows (e.g. the residual of a pushed-down query).
+        """
+        return self._execute_standard_query(query, data)
+    
     def _execute_standard_query(self, query: Dict[str, Any], data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Execute a query using standard Python processing."""
         result = data
@@ -6,6 +6,7 @@
 import logging
 import secrets
 import hashlib
+import hmac
 import json
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
@@ -326,7 +327,9 @@ class AdvancedSecurity:
     
     def verify_csrf_token(self, request_token: str, session_token: str) -> bool:
         """التحقق من رمز CSRF"""
-        return request_token == session_token
+        if not request_token or not session_token:
+            return False
+        return hmac.compare_digest(request_token.encode(), session_token.encode())
     
     def _log_suspicious_activity(self, db: Session, ip: str, activity_type: str):
         """تسجيل النشاط المشبوه"""
@@ -4,6 +4,7 @@ import ctypes
 import time
 import hashlib
 import hmac
+import threading
 from typing import Dict, Any, Optional, List, Tuple, Union
 import json
 import secrets
@@ -47,6 +48,8 @@ class SGXEnclave:
         self.simulation_mode = SGX_SIMULATION_MODE
         self.master_key = None
         self.key_cache = {}
+        # Guards key rotation and the key cache, so batches can be decrypted from several threads
+        self.key_lock = threading.RLock()
         self.last_rotation = 0
         self.rotation_interval = 86400  # 24 hours in seconds
     
@@ -201,6 +204,11 @@ class SGXEnclave:
         Returns:
             bytes: A 32-byte key derived from the master key and data ID
         """
+        with self.key_lock:
+            return self._derive_key_locked(data_id)
+    
+    def _derive_key_locked(self, data_id: str) -> bytes:
+        """Body of _derive_key_for_data; the caller holds key_lock."""
         # Check if we need to rotate keys
         self._rotate_keys_if_needed()
         
@@ -323,6 +331,66 @@ class SGXEnclave:
         
         return None
     
+    def encrypt_many(self, data_items: List[Dict[str, Any]],
+                     data_ids: Optional[List[Optional[str]]] = None) -> List[Optional[Dict[str, str]]]:
+        """Encrypt many items in a single call.
+        
+        In simulation mode the cipher import and the per-key AESGCM contexts are
+        set up once for the whole batch, so items sharing a data ID reuse one key
+        schedule. AESGCM runs on OpenSSL's EVP aes-256-gcm, which uses AES-NI when
+        the CPU has it. Hardware mode has no batch entry point in the enclave
+        library, so it encrypts item by item.
+        
+        Args:
+            data_items: The data to encrypt
+            data_ids: Optional identifiers aligned with data_items, used for key derivation
+            
+        Returns:
+            A list aligned with the input holding the encrypted payloads, or None for items that failed
+        """
+        if data_ids is None:
+            data_ids = [None] * len(data_items)
+        
+        if not self.is_initialized:
+            logger.warning("SGX enclave not initialized, encryption not available")
+            return [None] * len(data_items)
+        
+        if not self.simulation_mode:
+            return [self.encrypt_data(data, data_id) for data, data_id in zip(data_items, data_ids)]
+        
+        try:
+            from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        except ImportError:
+            logger.error("Cryptography library not available for simulation mode")
+            return [None] * len(data_items)
+        import base64
+        
+        ciphers: Dict[str, Any] = {}
+        results: List[Optional[Dict[str, str]]] = []
+        for data, data_id in zip(data_items, data_ids):
+            try:
+                if not data_id:
+                    data_id = secrets.token_hex(16)
+                
+                cipher = ciphers.get(data_id)
+                if cipher is None:
+                    cipher = ciphers[data_id] = AESGCM(self._derive_key_for_data(data_id))
+                
+                nonce = secrets.token_bytes(AES_GCM_IV_SIZE)
+                ciphertext = cipher.encrypt(nonce, json.dumps(data).encode('utf-8'), None)
+                results.append({
+                    "version": "1.0",
+                    "algorithm": "AES-GCM-256",
+                    "data_id": data_id,
+                    "nonce": base64.b64encode(nonce).decode('utf-8'),
+                    "ciphertext": base64.b64encode(ciphertext).decode('utf-8')
+                })
+            except Exception as e:
+                logger.error(f"Error encrypting data with SGX: {e}")
+                results.append(None)
+        
+        return results
+    
     def decrypt_data(self, encrypted_data: Dict[str, str]) -> Optional[Dict[str, Any]]:
         """Decrypt data using the SGX enclave or simulation.
         
@@ -413,6 +481,176 @@ class SGXEnclave:
         
         return None
     
+    def decrypt_batch(self, encrypted_items: List[Dict[str, str]]) -> List[Optional[Dict[str, Any]]]:
+        """Decrypt many items in a single call.
+        
+        In simulation mode the cipher import and the per-key AESGCM contexts are
+        set up once for the whole batch instead of once per item. Hardware mode
+        has no batch entry point in the enclave library, so it decrypts item by item.
+        
+        Args:
+            encrypted_items: Encrypted payloads as produced by encrypt_data
+            
+        Returns:
+            A list aligned with the input holding the decrypted data, or None for items that failed
+        """
+        if not self.is_initialized:
+            logger.warning("SGX enclave not initialized, decryption not available")
+            return [None] * len(encrypted_items)
+        
+        if not self.simulation_mode:
+            return [self.decrypt_data(item) for item in encrypted_items]
+        
+        try:
+            from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        except ImportError:
+            logger.error("Cryptography library not available for simulation mode")
+            return [None] * len(encrypted_items)
+        import base64
+        
+        ciphers: Dict[str, Any] = {}
+        results: List[Optional[Dict[str, Any]]] = []
+        for item in encrypted_items:
+            try:
+                if item.get("algorithm") != "AES-GCM-256" or "data_id" not in item:
+                    results.append(None)
+                    continue
+                
+                data_id = item["data_id"]
+                cipher = ciphers.get(data_id)
+                if cipher is None:
+                    cipher = ciphers[data_id] = AESGCM(self._derive_key_for_data(data_id))
+                
+                decrypted_bytes = cipher.decrypt(
+                    base64.b64decode(item["nonce"]),
+                    base64.b64decode(item["ciphertext"]),
+                    None
+                )
+                results.append(json.loads(decrypted_bytes))
+            except Exception as e:
+                logger.error(f"Decryption failed: {e}")
+                results.append(None)
+        
+        return results
+    
+    def encrypt_bytes(self, data: bytes, data_id: str) -> Optional[bytes]:
+        """Encrypt raw bytes into a compact binary envelope suitable for a BLOB column.
+        
+        Unlike encrypt_data there is no JSON or base64 wrapping: in simulation
+        mode the result is the nonce followed by the AES-GCM ciphertext and tag,
+        in hardware mode it is the enclave's sealed output. The data ID is not
+        stored in the envelope, so the caller must pass the same one to decrypt_bytes.
+        
+        Args:
+            data: The bytes to encrypt
+            data_id: Identifier for the data, used for key derivation
+            
+        Returns:
+            The encrypted envelope, or None on failure
+        """
+        if not self.is_initialized:
+            logger.warning("SGX enclave not initialized, encryption not available")
+            return None
+        
+        try:
+            if self.simulation_mode:
+                from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+                
+                nonce = secrets.token_bytes(AES_GCM_IV_SIZE)
+                return nonce + AESGCM(self._derive_key_for_data(data_id)).encrypt(nonce, data, None)
+            
+            if not hasattr(self.lib, 'enclave_encrypt_data'):
+                logger.error("SGX library does not have required encryption function")
+                return None
+            
+            encrypted_data = ctypes.create_string_buffer(len(data) + AES_GCM_TAG_SIZE + AES_GCM_IV_SIZE)
+            encrypted_len = ctypes.c_uint32(0)
+            result = self.lib.enclave_encrypt_data(
+                self.enclave_id,
+                data_id.encode('utf-8'),
+                len(data_id),
+                data,
+                len(data),
+                encrypted_data,
+                ctypes.byref(encrypted_len)
+            )
+            if result != 0:
+                logger.error(f"Encryption failed, error code: {result}")
+                return None
+            return encrypted_data.raw[:encrypted_len.value]
+        except Exception as e:
+            logger.error(f"Error encrypting data with SGX: {e}")
+        
+        return None
+    
+    def decrypt_bytes(self, envelope: bytes, data_id: str) -> Optional[bytes]:
+        """Decrypt an envelope produced by encrypt_bytes.
+        
+        Args:
+            envelope: The encrypted envelope
+            data_id: The identifier that was passed to encrypt_bytes
+            
+        Returns:
+            The decrypted bytes, or None on failure
+        """
+        return self.decrypt_bytes_batch([(envelope, data_id)])[0]
+    
+    def decrypt_bytes_batch(self, items: List[Tuple[bytes, str]]) -> List[Optional[bytes]]:
+        """Decrypt many (envelope, data_id) pairs produced by encrypt_bytes in a single call.
+        
+        Args:
+            items: Pairs of encrypted envelope and the data ID it was encrypted with
+            
+        Returns:
+            A list aligned with the input holding the decrypted bytes, or None for items that failed
+        """
+        if not self.is_initialized:
+            logger.warning("SGX enclave not initialized, decryption not available")
+            return [None] * len(items)
+        
+        if self.simulation_mode:
+            try:
+                from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+            except ImportError:
+                logger.error("Cryptography library not available for simulation mode")
+                return [None] * len(items)
+            ciphers: Dict[str, Any] = {}
+        elif not hasattr(self.lib, 'enclave_decrypt_data'):
+            logger.error("SGX library does not have required decryption function")
+            return [None] * len(items)
+        
+        results: List[Optional[bytes]] = []
+        for envelope, data_id in items:
+            try:
+                if self.simulation_mode:
+                    cipher = ciphers.get(data_id)
+                    if cipher is None:
+                        cipher = ciphers[data_id] = AESGCM(self._derive_key_for_data(data_id))
+                    results.append(cipher.decrypt(envelope[:AES_GCM_IV_SIZE], envelope[AES_GCM_IV_SIZE:], None))
+                    continue
+                
+                decrypted_data = ctypes.create_string_buffer(len(envelope))
+                decrypted_len = ctypes.c_uint32(0)
+                result = self.lib.enclave_decrypt_data(
+                    self.enclave_id,
+                    data_id.encode('utf-8'),
+                    len(data_id),
+                    envelope,
+                    len(envelope),
+                    decrypted_data,
+                    ctypes.byref(decrypted_len)
+                )
+                if result != 0:
+                    logger.error(f"Decryption failed, error code: {result}")
+                    results.append(None)
+                else:
+                    results.append(decrypted_data.raw[:decrypted_len.value])
+            except Exception as e:
+                logger.error(f"Decryption failed: {e}")
+                results.append(None)
+        
+        return results
+    
     def secure_hash(self, data: Union[str, bytes, Dict[str, Any]]) -> Optional[str]:
         """Generate a secure hash using the SGX enclave or simulation.
         
@@ -4,6 +4,7 @@
 """
 
 import os
+import uuid
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -11,6 +12,8 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from services.database import Base, get_db
+from services.auth.models import Base as AuthBase
+import main
 from main import app
 
 # إنشاء قاعدة بيانات اختبار في الذاكرة
@@ -25,7 +28,10 @@ def test_db_engine():
         poolclass=StaticPool,
     )
     Base.metadata.create_all(bind=engine)
+    # جداول المستخدمين والخلايا معرّفة على قاعدة نماذج المصادقة
+    AuthBase.metadata.create_all(bind=engine)
     yield engine
+    AuthBase.metadata.drop_all(bind=engine)
     Base.metadata.drop_all(bind=engine)
     if os.path.exists("./test.db"):
         os.remove("./test.db")
@@ -77,3 +83,26 @@ def auth_headers(client, test_user):
     assert response.status_code == 200
     token = response.json()["access_token"]
     return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture(scope="function")
+def api_headers(client):
+    """مستخدم جديد لكل اختبار عبر مسارات /auth ورؤوس المصادقة الخاصة به"""
+    suffix = uuid.uuid4().hex[:8]
+    user_data = {
+        "email": f"user_{suffix}@example.com",
+        "username": f"user_{suffix}",
+        "password": "TestPassword123"
+    }
+    response = client.post("/auth/register", json=user_data)
+    assert response.status_code == 200
+    response = client.post("/auth/login", json={"email": user_data["email"], "password": user_data["password"]})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture(scope="function")
+def api_cell(client, api_headers, tmp_path, monkeypatch):
+    """خلية جديدة يُخزَّن ملفها في مجلد مؤقت"""
+    monkeypatch.setattr(main, "CELLS_DIR", str(tmp_path))
+    response = client.post("/cells", json={"key": "api_cell", "password": "cell_password123"}, headers=api_headers)
+    assert response.status_code == 200
+    return response.json()["key"]
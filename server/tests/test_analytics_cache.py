@@ -0,0 +1,142 @@
+"""
+اختبارات الذاكرة المؤقتة لمحرك التحليلات
+"""
+
+import types
+
+import pytest
+
+from services.analytics import analytics_engine as engine_module
+from services.analytics.analytics_engine import AnalyticsEngine
+
+
+class FakeClock:
+    """ساعة يدوية تحل محل time.monotonic في محرك التحليلات"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class RedisDown(Exception):
+    """خطأ اتصال بـ Redis"""
+
+
+class BrokenRedis:
+    """عميل Redis تفشل كل عملياته"""
+
+    def get(self, key):
+        raise RedisDown("connection refused")
+
+    def setex(self, key, ttl, value):
+        raise RedisDown("connection refused")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """ساعة يدوية يتحكم بها الاختبار"""
+    clock = FakeClock()
+    monkeypatch.setattr(engine_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def engine(clock):
+    """محرك تحليلات جديد بذاكرة مؤقتة محلية فارغة"""
+    return AnalyticsEngine()
+
+
+def test_evicts_least_recently_used_at_max_size(engine):
+    """عند تجاوز cache_max_size يُطرد المفتاح الأقدم استخدامًا فقط"""
+    engine.cache_max_size = 2
+    engine._cache_set(("usage_patterns", 1), {"n": 1})
+    engine._cache_set(("usage_patterns", 2), {"n": 2})
+    # قراءة المفتاح الأول تجعله الأحدث استخدامًا فيُطرد الثاني بدلًا منه
+    assert engine._cache_get(("usage_patterns", 1)) == {"n": 1}
+    engine._cache_set(("usage_patterns", 3), {"n": 3})
+
+    assert list(engine.analytics_cache) == [("usage_patterns", 1), ("usage_patterns", 3)]
+    assert engine._cache_get(("usage_patterns", 2)) is None
+
+
+def test_entries_expire_after_their_own_ttl(engine, clock):
+    """كل نوع من التحليلات ينتهي بعد المدة المحددة له في ttls"""
+    engine._cache_set(("system_stats",), {"n": 1})
+    engine._cache_set(("growth_metrics", 30), {"n": 2})
+    engine._cache_set(("unknown",), {"n": 3})
+
+    clock.now += engine.ttls["system_stats"] - 1
+    assert engine._cache_get(("system_stats",)) == {"n": 1}
+
+    clock.now += 1
+    assert engine._cache_get(("system_stats",)) is None
+    assert ("system_stats",) not in engine.analytics_cache
+    assert engine._cache_get(("growth_metrics", 30)) == {"n": 2}
+
+    clock.now += engine.ttls["growth_metrics"]
+    assert engine._cache_get(("growth_metrics", 30)) is None
+    # المفاتيح التي ليس لها مدة خاصة تستخدم cache_ttl
+    assert engine._cache_get(("unknown",)) == {"n": 3}
+    clock.now = 1000.0 + engine.cache_ttl
+    assert engine._cache_get(("unknown",)) is None
+
+
+def test_empty_results_use_empty_ttl(engine, clock):
+    """النتيجة الفارغة تُخزَّن لمدة _empty_ttl بدل مدة نوعها"""
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"rows": []}
+
+    key = ("predictive_insights", 30)
+    is_empty = lambda data: not data["rows"]
+    assert engine._cached(key, compute, is_empty) == {"rows": []}
+    assert engine._cached(key, compute, is_empty) == {"rows": []}
+    assert len(calls) == 1
+
+    clock.now += engine._empty_ttl
+    engine._cached(key, compute, is_empty)
+    assert len(calls) == 2
+
+    # النتيجة غير الفارغة تبقى لمدة نوعها كاملة
+    engine._cache_set(key, {"rows": [1]}, None)
+    clock.now += engine._empty_ttl
+    assert engine._cached(key, compute, is_empty) == {"rows": [1]}
+    assert len(calls) == 2
+
+
+def test_cache_hit_ratio(engine):
+    """نسبة الإصابة تُحسب من عدد الإصابات والإخفاقات الفعلية"""
+    assert engine.get_cache_stats()["cache_hit_ratio"] == 0.0
+
+    compute = lambda: {"n": 1}
+    engine._cached(("system_stats",), compute)
+    engine._cached(("system_stats",), compute)
+    engine._cached(("system_stats",), compute)
+
+    stats = engine.get_cache_stats()
+    assert stats["cache_backend"] == "local"
+    assert (stats["cache_hits"], stats["cache_misses"], stats["cache_size"]) == (2, 1, 1)
+    assert stats["cache_hit_ratio"] == 0.6667
+
+
+def test_falls_back_to_local_cache_on_redis_error(engine, monkeypatch):
+    """فشل Redis لا يعطل التحليلات بل تُستخدم الذاكرة المحلية"""
+    monkeypatch.setattr(engine_module, "redis", types.SimpleNamespace(RedisError=RedisDown))
+    engine._redis = BrokenRedis()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"n": 1}
+
+    assert engine._cached(("system_stats",), compute) == {"n": 1}
+    assert engine._cached(("system_stats",), compute) == {"n": 1}
+    assert len(calls) == 1
+    assert ("system_stats",) in engine.analytics_cache
+
+    stats = engine.get_cache_stats()
+    assert (stats["cache_hits"], stats["cache_misses"]) == (1, 1)
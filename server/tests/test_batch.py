@@ -0,0 +1,44 @@
+"""
+اختبارات تخزين واسترجاع عدة عناصر من الخلية في طلب واحد
+"""
+
+from fastapi import status
+
+def test_batch_store_and_get(client, api_headers, api_cell):
+    """تخزين عدة عناصر ثم استرجاعها، والمفاتيح غير الموجودة لا تظهر في النتيجة"""
+    response = client.post(f"/cells/{api_cell}/data/batch/store",
+                           json={"items": {"a": "value-a", "b": "value-b"}}, headers=api_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["stored"] == 2
+    
+    response = client.post(f"/cells/{api_cell}/data/batch/get",
+                           json={"keys": ["a", "b", "missing"]}, headers=api_headers)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["items"] == {"a": "value-a", "b": "value-b"}
+    assert data["count"] == 2
+
+def test_batch_store_overwrites_and_bulk_alias(client, api_headers, api_cell):
+    """المسار /data/bulk مرادف للتخزين الجماعي ويستبدل القيم الموجودة"""
+    client.post(f"/cells/{api_cell}/data/batch/store", json={"items": {"a": "old"}}, headers=api_headers)
+    response = client.post(f"/cells/{api_cell}/data/bulk", json={"items": {"a": "new"}}, headers=api_headers)
+    assert response.status_code == status.HTTP_200_OK
+    
+    response = client.get(f"/cells/{api_cell}/data/a", headers=api_headers)
+    assert response.json()["value"] == "new"
+
+def test_batch_get_empty_keys(client, api_headers, api_cell):
+    """قائمة مفاتيح فارغة تعيد نتيجة فارغة"""
+    response = client.post(f"/cells/{api_cell}/data/batch/get", json={"keys": []}, headers=api_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"items": {}, "count": 0}
+
+def test_batch_missing_cell(client, api_headers):
+    """خلية غير موجودة تعيد 404 بتفاصيل تميزها عن مسار غير موجود"""
+    response = client.post("/cells/no_such_cell/data/batch/get", json={"keys": ["a"]}, headers=api_headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json()["detail"] != "Not Found"
+    
+    response = client.post("/cells/no_such_cell/data/batch/store", json={"items": {"a": "b"}}, headers=api_headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json()["detail"] != "Not Found"
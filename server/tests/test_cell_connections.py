@@ -0,0 +1,47 @@
+"""
+اختبارات ذاكرة اتصالات قواعد بيانات الخلايا في main_new
+"""
+
+import threading
+
+import pytest
+
+import main_new
+
+@pytest.fixture
+def conn_cache(tmp_path, monkeypatch):
+    """ذاكرة اتصالات فارغة تتسع لاتصال واحد في مجلد مؤقت"""
+    monkeypatch.setattr(main_new, "CELLS_DIR", str(tmp_path))
+    monkeypatch.setattr(main_new, "CELL_CONN_CACHE_SIZE", 1)
+    main_new.close_cell_conns()
+    yield
+    main_new.close_cell_conns()
+
+def test_eviction_waits_for_in_flight_statement(conn_cache):
+    """الاتصال المُخرج من الذاكرة لا يُغلق أثناء استخدامه في خيط آخر"""
+    first = main_new.get_cell_conn("cell_a")
+    locked = threading.Event()
+    release = threading.Event()
+    results = []
+    
+    def worker():
+        with first.lock:
+            locked.set()
+            release.wait(5)
+            results.append(first.execute("SELECT count(*) FROM data").fetchone()[0])
+    
+    thread = threading.Thread(target=worker)
+    thread.start()
+    locked.wait(5)
+    
+    evictor = threading.Thread(target=main_new.get_cell_conn, args=("cell_b",))
+    evictor.start()
+    evictor.join(0.2)
+    # الإخراج ينتظر انتهاء العبارة الجارية
+    assert evictor.is_alive()
+    
+    release.set()
+    thread.join(5)
+    evictor.join(5)
+    assert results == [0]
+    assert list(main_new._conn_cache) == ["cell_b"]
@@ -0,0 +1,39 @@
+"""
+اختبارات تصدير جميع قيم الخلية في طلب واحد
+"""
+
+from fastapi import status
+
+def test_export_all_and_prefix(client, api_headers, api_cell):
+    """التصدير يعيد جميع القيم، أو القيم التي تبدأ مفاتيحها بالبادئة فقط"""
+    items = {"entry_1": "one", "entry_2": "two", "other": "three"}
+    client.post(f"/cells/{api_cell}/data/batch/store", json={"items": items}, headers=api_headers)
+    
+    response = client.get(f"/cells/{api_cell}/export", headers=api_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"items": items, "count": 3}
+    
+    response = client.get(f"/cells/{api_cell}/export", params={"prefix": "entry_"}, headers=api_headers)
+    assert response.json() == {"items": {"entry_1": "one", "entry_2": "two"}, "count": 2}
+
+def test_export_prefix_is_literal(client, api_headers, api_cell):
+    """محارف GLOB في البادئة تُطابق حرفيًا"""
+    items = {"a*1": "star", "ab": "plain"}
+    client.post(f"/cells/{api_cell}/data/batch/store", json={"items": items}, headers=api_headers)
+    
+    response = client.get(f"/cells/{api_cell}/export", params={"prefix": "a*"}, headers=api_headers)
+    assert response.json()["items"] == {"a*1": "star"}
+
+def test_export_is_gzip_compressed(client, api_headers, api_cell):
+    """التصديرات الكبيرة تُضغط عندما يقبل العميل gzip"""
+    items = {f"key_{i}": "value " * 20 for i in range(50)}
+    client.post(f"/cells/{api_cell}/data/batch/store", json={"items": items}, headers=api_headers)
+    
+    response = client.get(f"/cells/{api_cell}/export", headers={**api_headers, "Accept-Encoding": "gzip"})
+    assert response.headers.get("content-encoding") == "gzip"
+    assert response.json()["count"] == 50
+
+def test_export_missing_cell(client, api_headers):
+    """تصدير خلية غير موجودة يعيد 404"""
+    response = client.get("/cells/no_such_cell/export", headers=api_headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,114 @@
+"""
+اختبارات بحث A* في الشبكة السداسية: نواة المصفوفات ونسخة Python في المحرك
+"""
+
+import random
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import services.hexagonal_query_engine as hex_module
+from services.database.models import Base as ModelsBase, Cell, pack_hex_id
+from services.hex_astar_numba import _astar_hex, astar_hex
+from services.hexagonal_query_engine import HEX_OFFSETS, HEX_PACKED_OFFSETS, HexagonalQueryEngine
+
+GRID_SIZE = 8
+
+def _grid(seed):
+    """شبكة GRID_SIZE×GRID_SIZE ينقصها نحو ربع خلاياها عشوائيًا"""
+    rng = random.Random(seed)
+    return {(x, y) for x in range(GRID_SIZE) for y in range(GRID_SIZE) if rng.random() > 0.25}
+
+def _kernel_path(existing, start, end, kernel=_astar_hex):
+    """تشغيل النواة على مجموعة إحداثيات وإعادة المسار كقائمة صفوف"""
+    existing_xy = np.array(sorted(existing), dtype=np.int64).reshape(-1, 2)
+    return [(int(x), int(y)) for x, y in kernel(existing_xy, start[0], start[1], end[0], end[1])]
+
+def _assert_valid_path(path, existing, start, end):
+    """المسار يبدأ وينتهي في المكان الصحيح ويمر بخلايا موجودة متجاورة"""
+    assert path[0] == start and path[-1] == end
+    assert all(cell in existing for cell in path)
+    for (x1, y1), (x2, y2) in zip(path, path[1:]):
+        assert (x2 - x1, y2 - y1) in HEX_OFFSETS
+
+@pytest.fixture
+def grid_db():
+    """قاعدة بيانات في الذاكرة تُملأ بخلايا شبكة معينة"""
+    engine = create_engine("sqlite://")
+    ModelsBase.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    
+    def fill(existing):
+        session.query(Cell).delete()
+        session.add_all(Cell(cell_id=f"{x},{y}", x=x, y=y) for x, y in existing)
+        session.commit()
+        return session
+    
+    yield fill
+    session.close()
+    engine.dispose()
+
+def test_packed_offsets_match_neighbors():
+    """إضافة إزاحة محزومة تعطي معرف الجار المقابل"""
+    for x, y in [(0, 0), (-5, 7), (123456, -654321)]:
+        for (dx, dy), delta in zip(HEX_OFFSETS, HEX_PACKED_OFFSETS):
+            assert pack_hex_id(x, y) + delta == pack_hex_id(x + dx, y + dy)
+
+def test_kernel_straight_line_and_single_cell():
+    """مسار مستقيم على شبكة كاملة، والبداية نفسها النهاية"""
+    existing = {(x, 0) for x in range(5)}
+    assert _kernel_path(existing, (0, 0), (4, 0)) == [(0, 0), (1, 0), (2, 0), (3, 0), (4, 0)]
+    assert _kernel_path(existing, (2, 0), (2, 0)) == [(2, 0)]
+
+def test_kernel_no_path():
+    """الخلايا المنفصلة لا يربطها مسار"""
+    assert _kernel_path({(0, 0), (5, 5)}, (0, 0), (5, 5)) == []
+
+def test_kernel_negative_coordinates():
+    """الإحداثيات السالبة تُحزم وتُفك بشكل صحيح"""
+    existing = {(0, 0), (-1, 0), (-2, 0), (-2, -1)}
+    path = _kernel_path(existing, (0, 0), (-2, -1))
+    _assert_valid_path(path, existing, (0, 0), (-2, -1))
+    assert len(path) == 4
+
+@pytest.mark.parametrize("seed", range(5))
+def test_kernel_matches_python_search(grid_db, monkeypatch, seed):
+    """النواة ونسخة Python في المحرك تجدان مسارات صحيحة بنفس الطول"""
+    existing = _grid(seed)
+    db = grid_db(existing)
+    monkeypatch.setattr(hex_module, "astar_hex", None)
+    engine = HexagonalQueryEngine()
+    
+    rng = random.Random(seed)
+    cells = sorted(existing)
+    for _ in range(10):
+        start, end = rng.sample(cells, 2)
+        expected = engine._a_star_search(db, start, end)
+        path = _kernel_path(existing, start, end)
+        assert len(path) == len(expected)
+        if path:
+            _assert_valid_path(path, existing, start, end)
+            _assert_valid_path(expected, existing, start, end)
+
+@pytest.mark.skipif(astar_hex is None, reason="Numba غير مثبت")
+def test_compiled_kernel_matches_python_kernel():
+    """النسخة المترجمة بـ Numba تعيد نفس المسارات"""
+    existing = _grid(0)
+    rng = random.Random(0)
+    cells = sorted(existing)
+    for _ in range(10):
+        start, end = rng.sample(cells, 2)
+        assert _kernel_path(existing, start, end, astar_hex) == _kernel_path(existing, start, end)
+
+@pytest.mark.parametrize("kernel", [None, _astar_hex], ids=["python", "kernel"])
+def test_engine_search_negative_region(grid_db, monkeypatch, kernel):
+    """تحميل المنطقة بمدى hex_id يشمل الإحداثيات السالبة في كلا فرعي البحث"""
+    existing = {(-3, -4), (-2, -5), (-1, -5), (-1, -4), (-3, -5)}
+    db = grid_db(existing | {(40, 40)})
+    monkeypatch.setattr(hex_module, "astar_hex", kernel)
+    
+    path = HexagonalQueryEngine()._a_star_search(db, (-3, -4), (-1, -4))
+    _assert_valid_path(path, existing, (-3, -4), (-1, -4))
+    assert len(path) == 4
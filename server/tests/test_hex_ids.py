@@ -0,0 +1,38 @@
+"""
+اختبارات حزم الإحداثيات السداسية في معرف صحيح واحد
+"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from services.database.models import Base as ModelsBase, Cell, pack_hex_id, unpack_hex_id
+
+COORDINATES = [(0, 0), (1, -1), (-1, 1), (-5, -7), (123456, -654321), (2 ** 31 - 1, -2 ** 31), (-2 ** 31, 2 ** 31 - 1)]
+
+@pytest.mark.parametrize("x, y", COORDINATES)
+def test_pack_round_trip(x, y):
+    """فك الحزم يعيد الإحداثيات الأصلية، بما فيها السالبة وحدود 32 بت"""
+    packed = pack_hex_id(x, y)
+    assert unpack_hex_id(packed) == (x, y)
+    assert -2 ** 63 <= packed < 2 ** 63
+
+def test_pack_is_unique_and_ordered_by_x_then_y():
+    """المعرفات المحزومة فريدة ومرتبة كترتيب (x, y)"""
+    packed = [pack_hex_id(x, y) for x, y in sorted(COORDINATES)]
+    assert packed == sorted(packed)
+    assert len(set(packed)) == len(packed)
+
+def test_cell_hex_id_column():
+    """عمود hex_id يُملأ من x وy عند الحفظ ويُقارن بالإحداثيات أو بالعدد المحزوم"""
+    engine = create_engine("sqlite://")
+    ModelsBase.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Cell(cell_id="c1", x=-3, y=4))
+    session.commit()
+    
+    cell = session.query(Cell).filter(Cell.hex_id == (-3, 4)).one()
+    assert cell.hex_id == (-3, 4)
+    assert session.query(Cell).filter(Cell.hex_id == pack_hex_id(-3, 4)).one() is cell
+    session.close()
+    engine.dispose()
@@ -0,0 +1,123 @@
+"""
+اختبارات استعلامات الأنماط في محرك الاستعلام السداسي
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from services.database.models import Base as ModelsBase, Cell, CellData
+from services.hexagonal_query_engine import HexagonalQueryEngine
+
+@pytest.fixture
+def hex_db():
+    """قاعدة بيانات في الذاكرة بخلايا حول (0, 0)"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    ModelsBase.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    cells = {
+        "center": (0, 0, "user"),
+        "north": (0, -1, "document"),
+        "south": (0, 1, "image"),
+        "lonely": (10, 10, "user"),
+        "lonely_south": (10, 11, "document"),
+    }
+    for cell_id, (x, y, data_type) in cells.items():
+        cell = Cell(cell_id=cell_id, x=x, y=y, data_type=data_type)
+        session.add(cell)
+        session.flush()
+        session.add(CellData(cell_id=cell.id, key="name", value_text=cell_id))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+@pytest.fixture
+def hex_engine():
+    """محرك استعلام مستقل بذاكرة مؤقتة فارغة"""
+    return HexagonalQueryEngine()
+
+def test_pattern_query_center_and_neighbors(hex_db, hex_engine):
+    """الخلية المركزية تُعاد فقط إذا طابق جيرانها كل الاتجاهات المطلوبة"""
+    pattern = {"center": {"type": "user"}, "neighbors": [{"direction": "north", "type": "document"}]}
+    result = hex_engine.pattern_query(hex_db, pattern)
+    assert [cell["cell_id"] for cell in result] == ["center"]
+    assert result[0]["data"] == {"name": "center"}
+    
+    pattern["neighbors"].append({"direction": "south", "type": "image"})
+    assert [cell["cell_id"] for cell in hex_engine.pattern_query(hex_db, pattern)] == ["center"]
+    
+    pattern = {"center": {"type": "user"}, "neighbors": [{"direction": "south", "type": "document"}]}
+    assert [cell["cell_id"] for cell in hex_engine.pattern_query(hex_db, pattern)] == ["lonely"]
+
+def test_pattern_query_does_not_mutate_pattern(hex_db, hex_engine):
+    """معايير الجيران تبقى كما مررها المستدعي"""
+    pattern = {"center": {"type": "user"}, "neighbors": [{"direction": "north", "type": "document"}]}
+    hex_engine.pattern_query(hex_db, pattern)
+    assert pattern["neighbors"] == [{"direction": "north", "type": "document"}]
+
+def test_pattern_query_center_data_and_empty_center(hex_db, hex_engine):
+    """المعايير على بيانات الخلية، ونمط بلا مركز يطابق كل خلية لها الجار المطلوب"""
+    result = hex_engine.pattern_query(hex_db, {"center": {"data": {"name": {"contains": "lone"}}}})
+    assert sorted(cell["cell_id"] for cell in result) == ["lonely", "lonely_south"]
+    
+    result = hex_engine.pattern_query(hex_db, {"neighbors": [{"direction": "north", "type": "user"}]})
+    assert sorted(cell["cell_id"] for cell in result) == ["lonely_south", "south"]
+
+def test_pattern_query_caches_center_matches(hex_db, hex_engine):
+    """الخلايا المركزية المطابقة تُعاد من الذاكرة المؤقتة حتى إبطالها"""
+    pattern = {"center": {"type": "user"}}
+    assert len(hex_engine.pattern_query(hex_db, pattern)) == 2
+    assert len(hex_engine.query_cache) == 1
+    
+    hex_db.add(Cell(cell_id="new_user", x=5, y=5, data_type="user"))
+    hex_db.commit()
+    assert len(hex_engine.pattern_query(hex_db, pattern)) == 2
+    
+    hex_engine.invalidate_cache()
+    assert len(hex_engine.pattern_query(hex_db, pattern)) == 3
+
+def test_cell_event_invalidates_cache(hex_db, hex_engine):
+    """أحداث موضوع الخلايا في Kafka تُفرغ الذاكرة المؤقتة للمطابقة"""
+    hex_engine.pattern_query(hex_db, {"center": {"type": "user"}})
+    assert hex_engine.query_cache
+    
+    asyncio.run(hex_engine.handle_cell_event({"event_type": "data_stored", "cell_key": "center"}, "center"))
+    assert not hex_engine.query_cache
+
+def test_get_neighbors_and_path_query(hex_db, hex_engine):
+    """الجيران حتى العمق المطلوب مع عمق كل منهم، والمسار بين خليتين بترتيب خطواته"""
+    result = hex_engine.get_neighbors(hex_db, "center", depth=1)
+    assert [(cell["cell_id"], cell["depth"]) for cell in result][0] == ("center", 0)
+    assert sorted((cell["cell_id"], cell["depth"]) for cell in result[1:]) == [("north", 1), ("south", 1)]
+    
+    path = hex_engine.path_query(hex_db, "north", "south")
+    assert [(cell["cell_id"], cell["step"]) for cell in path] == [("north", 0), ("center", 1), ("south", 2)]
+    assert hex_engine.path_query(hex_db, "north", "lonely") == []
+
+def test_pattern_query_returns_each_center_once(hex_db, hex_engine):
+    """خليتان على إحداثيات الجار نفسها لا تكرران الخلية المركزية، ولا حتى في صفوف SQL"""
+    hex_db.add(Cell(cell_id="north_other_hive", x=0, y=-1, data_type="document"))
+    hex_db.commit()
+    
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("SELECT cells.id"):
+            statements.append((statement, parameters))
+    event.listen(hex_db.get_bind(), "after_cursor_execute", capture)
+    try:
+        pattern = {"center": {"type": "user"}, "neighbors": [{"direction": "north", "type": "document"}]}
+        assert [cell["cell_id"] for cell in hex_engine.pattern_query(hex_db, pattern)] == ["center"]
+    finally:
+        event.remove(hex_db.get_bind(), "after_cursor_execute", capture)
+    
+    # Query يزيل التكرار من الكائنات، فيُعاد تنفيذ العبارة الأخيرة للتحقق من صفوفها
+    statement, parameters = statements[-1]
+    rows = hex_db.connection().exec_driver_sql(statement, parameters).all()
+    assert len(rows) == 1
+    
+    pattern = {"neighbors": [{"direction": "north"}, {"direction": "south"}]}
+    assert [cell["cell_id"] for cell in hex_engine.pattern_query(hex_db, pattern)] == ["center"]
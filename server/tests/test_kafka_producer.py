@@ -0,0 +1,12 @@
+"""
+اختبارات إعدادات منتج Kafka
+"""
+
+import pytest
+
+from services.kafka import producer
+
+@pytest.mark.parametrize("value, expected", [("1", 1), ("0", 0), ("all", "all"), ("ALL", "all"), ("-1", "all")])
+def test_parse_acks(value, expected):
+    """القيمة all (أو -1) تُقبل كما توثقها Kafka، والقيم الرقمية تُحوَّل إلى أعداد"""
+    assert producer._parse_acks(value) == expected
@@ -0,0 +1,74 @@
+"""
+اختبارات إبطال الذاكرة السائلة بالوسوم
+"""
+
+import pytest
+
+import main
+from services.liquid_cache import LiquidCache
+
+@pytest.fixture
+def cache():
+    """ذاكرة سائلة مفعلة ومستقلة عن النسخة العامة"""
+    cache = LiquidCache()
+    cache.enabled = True
+    return cache
+
+def test_invalidate_many_removes_tagged_keys(cache):
+    """إبطال وسم يحذف مفاتيحه فقط"""
+    cache.set("a", 1, tags=["cell_x"])
+    cache.set("b", 2, tags=["cell_x", "cell_y"])
+    cache.set("c", 3, tags=["cell_y"])
+    cache.set("d", 4)
+    
+    assert cache.invalidate_many("cell_x") == 2
+    assert cache.get("a") is None and cache.get("b") is None
+    assert cache.get("c") == 3 and cache.get("d") == 4
+    # المفتاح المحذوف لم يعد مسجلًا تحت وسومه الأخرى
+    assert cache.find_related_keys("cell_y") == ["c"]
+    assert cache.invalidate_many("cell_x") == 0
+
+def test_set_replaces_tags(cache):
+    """إعادة تخزين مفتاح تستبدل وسومه القديمة"""
+    cache.set("a", 1, tags=["cell_x"])
+    cache.set("a", 2, tags=["cell_y"])
+    
+    assert cache.find_related_keys("cell_x") == []
+    assert cache.on_write("x") == 0
+    assert cache.get("a") == 2
+    assert cache.on_write("y") == 1
+    assert cache.get("a") is None
+
+def test_delete_and_clear_drop_tags(cache):
+    """الحذف والمسح يزيلان المفاتيح من فهرس الوسوم"""
+    cache.set("a", 1, tags=["cell_x"])
+    cache.set("b", 2, tags=["cell_x"])
+    
+    assert cache.delete("a")
+    assert cache.find_related_keys("cell_x") == ["b"]
+    
+    cache.clear()
+    assert cache.find_related_keys("cell_x") == []
+    assert cache.get("b") is None
+
+def test_disabled_cache_is_noop(cache):
+    """الذاكرة المعطلة لا تخزن ولا تبطل شيئًا"""
+    cache.enabled = False
+    cache.set("a", 1, tags=["cell_x"])
+    assert cache.get("a") is None
+    assert cache.invalidate_many("cell_x") == 0
+
+def test_write_invalidates_cached_query(client, api_headers, api_cell, monkeypatch):
+    """الكتابة في الخلية تبطل نتائج الاستعلامات المخزنة لها"""
+    monkeypatch.setattr(main.liquid_cache, "enabled", True)
+    query = {"filter": {"key": {"in": ["a", "b"]}}}
+    
+    client.post(f"/cells/{api_cell}/data", json={"key": "a", "value": "one"}, headers=api_headers)
+    response = client.post(f"/cells/{api_cell}/query", json=query, headers=api_headers)
+    assert [item["key"] for item in response.json()["results"]] == ["a"]
+    assert main.liquid_cache.find_related_keys(main.liquid_cache.cell_tag(api_cell))
+    
+    client.post(f"/cells/{api_cell}/data", json={"key": "b", "value": "two"}, headers=api_headers)
+    assert main.liquid_cache.find_related_keys(main.liquid_cache.cell_tag(api_cell)) == []
+    response = client.post(f"/cells/{api_cell}/query", json=query, headers=api_headers)
+    assert sorted(item["key"] for item in response.json()["results"]) == ["a", "b"]
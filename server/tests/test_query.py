@@ -0,0 +1,77 @@
+"""
+اختبارات ترجمة استعلامات الخلايا إلى SQL وتنفيذ الجزء المتبقي منها
+"""
+
+from fastapi import status
+
+from main import build_sql
+
+def test_build_sql_pushes_filter_sort_and_limit():
+    """الحقول المعروفة والمعاملات البسيطة تُنفَّذ كلها في SQLite"""
+    sql, params, residual = build_sql({
+        "filter": {"key": {"in": ["a", "b"]}, "created_at": {"gte": "2024-01-01"}},
+        "sort": ["-updated_at"],
+        "limit": 5
+    })
+    assert sql == ("SELECT key, value, created_at, updated_at FROM data"
+                   " WHERE key IN (?,?) AND created_at >= ? ORDER BY updated_at DESC LIMIT ?")
+    assert params == ["a", "b", "2024-01-01", 5]
+    assert residual == {}
+
+def test_build_sql_leaves_unknown_fields_and_operands_in_residual():
+    """الحقول غير المعروفة والمعاملات غير البسيطة تبقى لمحسّن الاستعلامات"""
+    sql, params, residual = build_sql({
+        "filter": {"key": "x", "foo": 1, "value": {"eq": ["not", "scalar"]}},
+        "limit": 5
+    })
+    assert sql == "SELECT key, value, created_at, updated_at FROM data WHERE key = ?"
+    assert params == ["x"]
+    # الحد لا يُطبَّق في SQL قبل تصفية الجزء المتبقي
+    assert residual == {"filter": {"foo": 1, "value": {"eq": ["not", "scalar"]}}, "limit": 5}
+
+def test_build_sql_moves_whole_sort_to_residual():
+    """الترتيب على حقل غير معروف ينقل الترتيب كله والحد إلى الجزء المتبقي"""
+    sql, params, residual = build_sql({"sort": ["key", "foo"], "limit": 3})
+    assert "ORDER BY" not in sql and "LIMIT" not in sql
+    assert params == []
+    assert residual == {"sort": ["key", "foo"], "limit": 3}
+
+def test_build_sql_restricts_pushdown_to_given_columns():
+    """الأعمدة المشفرة لا تُرشَّح في SQL ويبقى البحث النصي في الجزء المتبقي"""
+    sql, params, residual = build_sql(
+        {"filter": {"value": "v", "search": "hello"}},
+        ("key", "created_at", "updated_at"),
+        full_text=False
+    )
+    assert "WHERE" not in sql
+    assert residual == {"filter": {"search": "hello", "value": "v"}}
+
+def test_build_sql_full_text_search_and_empty_in():
+    """البحث النصي يستخدم فهرس FTS وقائمة in الفارغة لا تطابق شيئًا"""
+    sql, params, residual = build_sql({"filter": {"search": 'say "hi"', "key": {"in": []}}})
+    assert "data_fts MATCH ?" in sql
+    assert sql.endswith("AND 0")
+    assert params == ['value : "say ""hi"""*']
+    assert residual == {}
+
+def test_query_residual_results_do_not_collide(client, api_headers, api_cell):
+    """استعلامان يختلفان في الشرط المنفَّذ في SQL ويتطابقان في الجزء المتبقي يعيدان صفوفًا مختلفة"""
+    for key in ("x", "y"):
+        response = client.post(f"/cells/{api_cell}/data", json={"key": key, "value": f"value-{key}"},
+                               headers=api_headers)
+        assert response.status_code == status.HTTP_200_OK
+    
+    def run(query):
+        response = client.post(f"/cells/{api_cell}/query", json=query, headers=api_headers)
+        assert response.status_code == status.HTTP_200_OK
+        return [item["key"] for item in response.json()["results"]]
+    
+    # الجزء المتبقي {"filter": {"foo": 1}, "limit": 5} نفسه في الاستعلامين
+    first = run({"filter": {"key": "x", "foo": 1}, "limit": 5})
+    second = run({"filter": {"key": "y", "foo": 1}, "limit": 5})
+    assert "x" not in second
+    assert "y" not in first
+    
+    # جزء متبقٍ يطابق كل الصفوف: كل استعلام يعيد صفه هو
+    assert run({"filter": {"key": "x", "value": {"contains": "value"}}, "limit": 5}) == ["x"]
+    assert run({"filter": {"key": "y", "value": {"contains": "value"}}, "limit": 5}) == ["y"]
@@ -0,0 +1,35 @@
+"""
+اختبارات تخزين القيم الثنائية واسترجاعها عبر الواجهة الخام
+"""
+
+import base64
+
+from fastapi import status
+
+def test_raw_store_and_get(client, api_headers, api_cell):
+    """البايتات المرسلة كجسم الطلب تُسترجع كما هي"""
+    body = bytes(range(256))
+    response = client.put(f"/cells/{api_cell}/raw/blob", content=body,
+                          headers={**api_headers, "Content-Type": "application/octet-stream"})
+    assert response.status_code == status.HTTP_200_OK
+    
+    response = client.get(f"/cells/{api_cell}/raw/blob", headers=api_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/octet-stream"
+    assert response.content == body
+    
+    # واجهة JSON تعيد نفس القيمة بترميز Base64
+    response = client.get(f"/cells/{api_cell}/data/blob", headers=api_headers)
+    assert base64.b64decode(response.json()["value"]) == body
+
+def test_raw_get_missing_key(client, api_headers, api_cell):
+    """مفتاح غير موجود يعيد 404 بتفاصيل تميزه عن مسار غير موجود"""
+    response = client.get(f"/cells/{api_cell}/raw/missing", headers=api_headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json()["detail"] == "البيانات غير موجودة"
+
+def test_raw_get_non_binary_value(client, api_headers, api_cell):
+    """قيمة نصية مخزنة عبر JSON ليست بيانات ثنائية"""
+    client.post(f"/cells/{api_cell}/data", json={"key": "text", "value": "not base64!"}, headers=api_headers)
+    response = client.get(f"/cells/{api_cell}/raw/text", headers=api_headers)
+    assert response.status_code == status.HTTP_409_CONFLICT
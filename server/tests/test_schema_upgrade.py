@@ -0,0 +1,81 @@
+"""
+اختبارات ترقية مخطط الجداول المنشأة قبل إضافة الأعمدة الجديدة
+"""
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from services.database.models import Cell, pack_hex_id, upgrade_schema
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """قاعدة SQLite فارغة في مجلد مؤقت"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    yield engine
+    engine.dispose()
+
+
+def test_legacy_coordinates_are_split_and_packed(engine):
+    """جدول cells بعمود coordinates النصي تُضاف إليه x وy وhex_id وتُملأ"""
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE cells (id INTEGER PRIMARY KEY, cell_id VARCHAR(50), "
+                                "hive_id INTEGER, coordinates VARCHAR(50), data_type VARCHAR(20), "
+                                "created_at DATETIME, updated_at DATETIME)"))
+        connection.execute(text("INSERT INTO cells (id, cell_id, coordinates) VALUES "
+                                "(1, 'a', '3,-4'), (2, 'b', '-7,2'), (3, 'c', NULL)"))
+
+    upgrade_schema(engine)
+
+    inspector = inspect(engine)
+    assert {"x", "y", "hex_id"} <= {column["name"] for column in inspector.get_columns("cells")}
+    assert {"ix_cells_hex_id", "ix_cell_xy"} <= {index["name"] for index in inspector.get_indexes("cells")}
+    with Session(bind=engine) as db:
+        cells = {cell.cell_id: cell for cell in db.query(Cell)}
+        assert (cells["a"].x, cells["a"].y, cells["a"].hex_id) == (3, -4, (3, -4))
+        assert cells["b"].hex_id == (-7, 2)
+        assert cells["c"].hex_id is None
+        assert db.query(Cell).filter(Cell.hex_id == pack_hex_id(-7, 2)).one().cell_id == "b"
+
+    # التشغيل الثاني عند كل بدء للخادم لا يغير شيئًا
+    upgrade_schema(engine)
+
+
+def test_cells_with_xy_get_hex_id(engine):
+    """الخلايا التي لها x وy قبل إضافة hex_id تحصل على المعرف المحزوم نفسه"""
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE cells (id INTEGER PRIMARY KEY, cell_id VARCHAR(50), x INTEGER, y INTEGER)"))
+        connection.execute(text("INSERT INTO cells (id, cell_id, x, y) VALUES (1, 'a', -5, -7), (2, 'b', 123456, -654321)"))
+
+    upgrade_schema(engine)
+
+    with engine.connect() as connection:
+        rows = dict(connection.execute(text("SELECT cell_id, hex_id FROM cells")).all())
+    assert rows == {"a": pack_hex_id(-5, -7), "b": pack_hex_id(123456, -654321)}
+
+
+def test_auth_cells_table_is_untouched(engine):
+    """جدول cells في نماذج المصادقة لا يحمل إحداثيات فلا تُضاف إليه أعمدة"""
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE cells (id INTEGER PRIMARY KEY, key VARCHAR, password_hash VARCHAR)"))
+
+    upgrade_schema(engine)
+
+    assert {column["name"] for column in inspect(engine).get_columns("cells")} == {"id", "key", "password_hash"}
+
+
+def test_cell_data_sizes_are_backfilled(engine):
+    """جدول cell_data بلا size_bytes يُضاف إليه العمود ويُحسب حجم الصفوف القديمة"""
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE cell_data (id INTEGER PRIMARY KEY, cell_id INTEGER, key VARCHAR(100), "
+                                "value_text TEXT, value_json JSON, created_at DATETIME, updated_at DATETIME)"))
+        connection.execute(text("INSERT INTO cell_data (id, key, value_text, value_json) VALUES "
+                                "(1, 'a', 'مرحبا', NULL), (2, 'b', NULL, '{\"n\": 1}'), (3, 'c', NULL, NULL)"))
+
+    upgrade_schema(engine)
+
+    assert "ix_cell_data_size_bytes" in {index["name"] for index in inspect(engine).get_indexes("cell_data")}
+    with engine.connect() as connection:
+        sizes = dict(connection.execute(text("SELECT key, size_bytes FROM cell_data")).all())
+    assert sizes == {"a": len("مرحبا".encode("utf-8")), "b": len(b'{"n": 1}'), "c": 0}